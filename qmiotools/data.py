@@ -14,3 +14,5 @@ QUBIT_POSITIONS=[(5, -7),(4, -7),(3, -7),(2, -7),(1, -7),
                  (6, -1),(5, -1),(4, -1),(3, -1),(2, -1),(1, -1)]
 QBIT_MAP=[2, 3, 4, 5, 6, 7, 8, 9, 11, 12, 13, 14, 15, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35]
 
+# Maximum number of shots of each request to the QPU. The jobs with more shots are executed in chunks by the backends
+MAX_SHOTS_PER_STEP=100000
@@ -0,0 +1,42 @@
+import os
+import time
+
+from qiskit import QuantumCircuit
+from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+from qmiotools.integrations.qiskitqmio import FakeQmio
+
+#
+# The pool of processes starts new interpreters that import this script, so it runs only in the main one
+#
+if __name__=="__main__":
+    #
+    # Create the FakeQmio with the noise of the last calibrations, simulating only the qubits of each circuit. The method is chosen
+    # automatically and the thermal relaxation is replaced by its Pauli twirl, so the Clifford circuits are simulated with the stabilizer method
+    #
+    backend=FakeQmio(gate_error=True, readout_error=True, restrict_qubits=True, auto_method=True, pauli_approximation=True)
+
+    #
+    # A GHZ state of 24 qubits, compiled to the native gates and the couplers of Qmio
+    #
+    n=24
+    circuit=QuantumCircuit(n)
+    circuit.h(0)
+    for i in range(n-1):
+        circuit.cx(i,i+1)
+    circuit.measure_all()
+    isa=generate_preset_pass_manager(1,backend=backend,seed_transpiler=1).run(circuit)
+
+    #
+    # Run 10^5 shots with 1 to N processes. The shards use seeds derived from the master seed, so each number of processes is reproducible
+    #
+    shots=100000
+    processes=[1]
+    while processes[-1]*2<=(os.cpu_count() or 1):
+        processes.append(processes[-1]*2)
+    for p in processes:
+        start=time.time()
+        result=backend.run(isa,shots=shots,seed_simulator=1234,processes=p).result()
+        elapsed=time.time()-start
+        print("%2d processes: %.2f s (%s), P(GHZ)=%.3f"%(p,elapsed,result.results[0].metadata.get("method"),
+                                                        (result.get_counts().get("0"*n,0)+result.get_counts().get("1"*n,0))/shots))
+    backend.shutdown()
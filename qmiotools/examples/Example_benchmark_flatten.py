@@ -0,0 +1,32 @@
+import time
+
+from qiskit import QuantumCircuit, ClassicalRegister, QuantumRegister
+from qmiotools.integrations.qiskitqmio.flattencircuit import FlattenCircuit, circuit_fingerprint
+
+#
+# Build a mirror-benchmark-like circuit of 32 qubits with 10^5 instructions and a classical register for each layer of measurements
+#
+qubits=32
+layers=20
+circuit=QuantumCircuit(QuantumRegister(qubits,"q"))
+for layer in range(layers):
+    for k in range(5000//qubits):
+        for q in range(qubits):
+            circuit.rz(0.1*(q+k),q)
+        for q in range(0,qubits-1,2):
+            circuit.ecr(q,q+1)
+    creg=ClassicalRegister(qubits,"layer%d"%layer)
+    circuit.add_register(creg)
+    circuit.measure(range(qubits),creg)
+print("%d instructions, %d classical registers"%(len(circuit.data),len(circuit.cregs)))
+
+#
+# The flatten composes the instructions in Qiskit without copying them. It is compared with the fingerprint that the caches of the
+# derived objects use to check that the circuit has not changed, which is why the flattened circuit is not cached itself
+#
+start=time.time()
+flat=FlattenCircuit(circuit)
+print("Flatten: %.3f s (%d clbits in a single register)"%(time.time()-start,flat.num_clbits))
+start=time.time()
+circuit_fingerprint(circuit)
+print("Fingerprint: %.3f s"%(time.time()-start))
@@ -0,0 +1,35 @@
+import time
+
+from qiskit.pulse import Schedule, Play, ShiftPhase, DriveChannel, Drag
+from qmiotools.integrations.qiskitqmio.opexporter import OPExporter
+
+#
+# Build randomized-like sequences of 10^3 to 10^6 instructions, alternating pulses and phase shifts on the 32 drive channels
+#
+def sequence(n):
+    sched=Schedule(name="sequence_%d"%n)
+    pulse=Drag(160,0.2,40,0.1)
+    t=0
+    for i in range(n//2):
+        channel=DriveChannel(i%32)
+        sched.insert(t,ShiftPhase(0.1*(i%7),channel),inplace=True)
+        sched.insert(t,Play(pulse,channel),inplace=True)
+        if i%32==31:
+            t+=160
+    return sched
+
+exporter=OPExporter()
+
+#
+# Time the minified program, as submitted to Qmio, and the program streamed to a file
+#
+for n in (10**3,10**4,10**5,10**6):
+    sched=sequence(n)
+    start=time.time()
+    program=exporter.dumps(sched,minify=True)
+    elapsed=time.time()-start
+    with open("/dev/null","w") as f:
+        start=time.time()
+        exporter.dump(sched,f)
+        streamed=time.time()-start
+    print("%8d instructions: dumps %.3f s (%.2f us/instruction, %d characters), dump to file %.3f s"%(n,elapsed,1e6*elapsed/n,len(program),streamed))
@@ -0,0 +1,37 @@
+import time
+
+from qiskit import transpile
+from qiskit.circuit.library import QFT, EfficientSU2
+from qiskit.circuit.random import random_circuit
+from qmiotools.integrations.qiskitqmio import QmioBackend
+
+#
+# Start the Qmiobackend. Loads the last calibration from the folder indicated in QMIO_CALIBRATIONS environ
+#
+backend=QmioBackend()
+
+#
+# Typical circuits: QFTs, ansatzes and random circuits, with measurements
+#
+circuits=[]
+for n in (4,8,12):
+    circuits.append(QFT(n).decompose())
+    ansatz=EfficientSU2(n,reps=2)
+    circuits.append(ansatz.assign_parameters([0.1]*ansatz.num_parameters))
+    circuits.append(random_circuit(n,10,max_operands=2,seed=n))
+for c in circuits:
+    c.measure_all()
+
+#
+# Compare the generic preset pass manager of transpile, rebuilt in each call, with the pass manager of Qmio, built once per level
+#
+for level in (1,2,3):
+    start=time.time()
+    for c in circuits:
+        transpile(c,backend,optimization_level=level,seed_transpiler=1)
+    generic=time.time()-start
+    start=time.time()
+    for c in circuits:
+        backend.get_pass_manager(level,seed_transpiler=1).run(c)
+    qmio=time.time()-start
+    print("Level %d, %d circuits: transpile %.2f s, get_pass_manager %.2f s (x%.1f)"%(level,len(circuits),generic,qmio,generic/qmio))
@@ -0,0 +1,55 @@
+import re
+import time
+
+from qiskit import QuantumCircuit, qasm2, qasm3
+from qmiotools.integrations.qiskitqmio import QmioBackend
+from qmiotools.integrations.qiskitqmio.qasmemitter import dumps_qasm2, dumps_qasm3
+from qmiotools.integrations.qiskitqmio.qmiobackend import QBIT_MAP2
+
+#
+# Start the Qmiobackend. Loads the last calibration from the folder indicated in QMIO_CALIBRATIONS environ
+#
+backend=QmioBackend()
+couplers=list(backend.coupling_map.get_edges())
+
+#
+# The conversion of qiskit.qasm3 and qiskit.qasm2, followed by the post-processing that QmioBackend applied before the emitter
+#
+def generic_qasm3(c):
+    basis_gates=[g for g in backend.operation_names if g not in ("measure","delay")]
+    qasm=qasm3.dumps(c,includes=[],basis_gates=basis_gates).replace("\n","")
+    for i in range(backend.num_qubits-1,-1,-1):
+        qasm=qasm.replace("$%d;"%i,"$%d;"%QBIT_MAP2[i])
+        qasm=qasm.replace("$%d,"%i,"$%d,"%QBIT_MAP2[i])
+        qasm=qasm.replace("$%d "%i,"$%d "%QBIT_MAP2[i])
+    return qasm
+
+def generic_qasm2(c):
+    qasm=qasm2.dumps(c)
+    qasm=re.sub("\\ngate rzx.*\\n","\\n",qasm)
+    qasm=re.sub("\\ngate ecr.*\\n","\\ngate ecr q0, q1 {};\\n",qasm)
+    return qasm.replace("\n","")
+
+#
+# Circuits of 10^4 and 10^5 native gates on the couplers of Qmio, compiled without optimisation to get their layout
+#
+for gates in (10**4,10**5):
+    circuit=QuantumCircuit(backend.num_qubits,backend.num_qubits)
+    for k in range(gates//3):
+        control,target=couplers[k%len(couplers)]
+        circuit.rz(0.001*k,control)
+        circuit.sx(target)
+        circuit.ecr(control,target)
+    circuit.measure(range(backend.num_qubits),range(backend.num_qubits))
+    isa=backend.get_pass_manager(0).run(circuit)
+
+    for name,emitter,generic in (("OpenQASM 3.0",lambda c: dumps_qasm3(c,QBIT_MAP2[:backend.num_qubits]),generic_qasm3),
+                                 ("OpenQASM 2.0",dumps_qasm2,generic_qasm2)):
+        start=time.time()
+        fast=emitter(isa)
+        fast_time=time.time()-start
+        start=time.time()
+        reference=generic(isa)
+        generic_time=time.time()-start
+        print("%6d gates, %s: emitter %.3f s, qiskit dumps %.3f s (x%.1f), same output: %s"%(len(isa.data),name,fast_time,generic_time,
+                                                                                         generic_time/fast_time,fast==reference))
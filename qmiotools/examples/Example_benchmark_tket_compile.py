@@ -0,0 +1,40 @@
+import os
+import random
+import time
+
+from pytket.circuit import Circuit
+from qmiotools.integrations.tkbackend import Qmio
+
+#
+# The pool of processes starts new interpreters that import this script, so it runs only in the main one
+#
+if __name__=="__main__":
+    #
+    # Create 1000 random circuits of 3 to 6 qubits
+    #
+    rng=random.Random(1)
+    circuits=[]
+    for k in range(1000):
+        n=rng.randint(3,6)
+        circuit=Circuit(n,n)
+        for _ in range(4*n):
+            a,b=rng.sample(range(n),2)
+            circuit.H(a)
+            circuit.Rz(rng.random(),b)
+            circuit.CX(a,b)
+        for q in range(n):
+            circuit.Measure(q,q)
+        circuits.append(circuit)
+
+    #
+    # Compile them with the optimisation level 2 in 1 to N worker processes. The pass is built once in each worker
+    #
+    Q=Qmio()
+    workers=[1]
+    while workers[-1]*2<=(os.cpu_count() or 1):
+        workers.append(workers[-1]*2)
+    for w in workers:
+        start=time.time()
+        Q.get_compiled_circuits(circuits,2,workers=w)
+        print("%2d workers: %.2f s"%(w,time.time()-start))
+    Q.shutdown()
@@ -0,0 +1,42 @@
+import time
+import numpy as np
+
+from qiskit.circuit.library import EfficientSU2
+from qiskit.primitives import BackendSamplerV2
+from qiskit.quantum_info import SparsePauliOp
+from qmiotools.integrations.qiskitqmio import QmioBackend, QmioSamplerV2, QmioEstimatorV2
+
+#
+# Start the Qmiobackend. Loads the last calibration from the folder indicated in QMIO_CALIBRATIONS environ
+#
+backend=QmioBackend()
+
+#
+# Transpile the ansatz once. The primitives need circuits in the native basis of the backend
+#
+ansatz=EfficientSU2(4,reps=2)
+isa=backend.get_pass_manager(2).run(ansatz)
+hamiltonian=SparsePauliOp.from_list([("ZZII",1.0),("IZZI",1.0),("IIZZ",1.0),("XXXX",0.5)])
+
+#
+# Estimate the energy of 10 points for 5 iterations of a variational loop
+#
+estimator=QmioEstimatorV2(backend, options={"default_precision": 0.02})
+rng=np.random.default_rng(1)
+for iteration in range(5):
+    values=rng.uniform(-np.pi,np.pi,(10,ansatz.num_parameters))
+    result=estimator.run([(isa,hamiltonian.apply_layout(isa.layout),values)]).result()
+    print("Iteration %d, best energy %f"%(iteration,result[0].data.evs.min()))
+
+#
+# Compare the time of the sampler with the generic BackendSamplerV2 of Qiskit in the same loop
+#
+measured=ansatz.measure_all(inplace=False)
+isa=backend.get_pass_manager(2).run(measured)
+for name,sampler in (("BackendSamplerV2",BackendSamplerV2(backend=backend)),("QmioSamplerV2",QmioSamplerV2(backend))):
+    start=time.time()
+    for iteration in range(5):
+        values=rng.uniform(-np.pi,np.pi,(10,ansatz.num_parameters))
+        result=sampler.run([(isa,values)],shots=1000).result()
+    print("%s: %.2f s"%(name,time.time()-start))
+print(result[0].data.meas.get_counts(0))
@@ -11,8 +11,19 @@ Qiskit
    QmioBackend
    QasmCircuit
    FakeQmio
+   QmioAerSimulator
    QmioJob
    FlattenCircuit
+   ShotMemory
+   JobJournal
+   QmioLayout
+   TargetValidator
+   Diagnostic
+   QmioSamplerV2
+   QmioEstimatorV2
+   MeasurementGroup
+   measurement_groups
+   group_paulis
 
 """
 
@@ -20,5 +31,11 @@ Qiskit
 from .qasmcircuit import QasmCircuit
 from .qmiobackend import QmioBackend
 from .qmiojob import QmioJob
-from .fakeqmio import FakeQmio
+from .fakeqmio import FakeQmio, QmioAerSimulator
 from .flattencircuit import FlattenCircuit
+from .shotmemory import ShotMemory
+from .jobjournal import JobJournal
+from .qmiolayout import QmioLayout
+from .qmiovalidator import TargetValidator, Diagnostic
+from .qmioprimitives import QmioSamplerV2, QmioEstimatorV2
+from .paulimeasurement import MeasurementGroup, measurement_groups, group_paulis
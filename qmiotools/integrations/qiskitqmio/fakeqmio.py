@@ -8,11 +8,608 @@ import logging
 logger=logging.getLogger('FakeQmio/'+VERSION)
 
 
+import qiskit_aer
 from qiskit_aer import AerSimulator
-from qiskit_aer.noise import NoiseModel
-from .qmiobackend import QmioBackend
+from qiskit_aer.noise import NoiseModel, QuantumError, pauli_error
+from qiskit_aer.utils import transform_noise_model
+from qiskit.quantum_info import Kraus, Pauli
+from qiskit.providers import BackendV2, Options, JobStatus
+from qiskit.transpiler import Target
+from qiskit.result import Result
+from typing import Optional
+from qiskit.circuit import QuantumCircuit, ParameterExpression
 
-def FakeQmio(calibration_file: str=None, thermal_relaxation: bool = True, temperature: float = 0 , gate_error: bool=False, readout_error: bool=False, logging_level: int=logging.NOTSET, logging_filename: str=None,  **kwargs) -> AerSimulator:
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+import itertools
+import hashlib
+import math
+import pickle
+import atexit
+import uuid
+import time
+import os
+
+from ...exceptions import QmioException
+from ..utils import Calibrations, ResultCache
+from .qmiobackend import build_target
+from .qmiojob import QmioJob
+
+CACHE_DIR=os.getenv("QMIO_CACHE_DIR",os.path.join(os.path.expanduser("~"),".cache","qmiotools"))
+MAX_CACHED_NOISE_MODELS=16
+MAX_DISK_NOISE_MODELS=16
+
+_targets=OrderedDict()
+_noise_models=OrderedDict()
+_clifford_noise=OrderedDict()
+
+CLIFFORD_GATES={"id","x","y","z","h","s","sdg","sx","sxdg","cx","cy","cz","ecr","swap","measure","barrier","delay","reset"}
+CLIFFORD_ERRORS={"id","x","y","z","pauli","reset","barrier"}
+MPS_MIN_QUBITS=20
+MPS_MAX_CUT=6
+DENSITY_MATRIX_MAX_QUBITS=12
+
+
+class _QmioTargetBackend(BackendV2):
+    """
+        Minimal backend around the Target of Qmio, used to derive the noise model and the AerSimulator without the QPU client state of :class:`QmioBackend`.
+    """
+
+    def __init__(self, target: Target):
+        super().__init__(name="Qmio", description="CESGA Qmio", backend_version=VERSION)
+        self._target=target
+
+    @property
+    def target(self) -> Target:
+        return self._target
+
+    @property
+    def max_circuits(self):
+        return 1000
+
+    @classmethod
+    def _default_options(cls):
+        return Options()
+
+    def run(self, run_input, **options):
+        raise QmioException("The target of Qmio can not execute circuits. Use QmioBackend or FakeQmio")
+
+
+_shard_simulator=None
+
+
+def _init_shard_worker(simulator: AerSimulator):
+    global _shard_simulator
+    _shard_simulator=simulator
+
+
+def _run_shard(circuits, parameter_binds, shots: int, seed: int, options: dict):
+    """
+        Runs one shard in a worker process and returns its result as a dictionary.
+    """
+    result=AerSimulator.run(_shard_simulator,circuits,parameter_binds=parameter_binds,shots=shots,seed_simulator=seed,**options).result()
+    return result.to_dict()
+
+
+def _merge_counts(counts: list) -> dict:
+    """
+        Sums the histograms of several shards with a single vectorized reduction.
+    """
+    keys=np.concatenate([np.array(list(c.keys()),dtype=object) for c in counts])
+    values=np.concatenate([np.fromiter(c.values(),dtype=np.int64,count=len(c)) for c in counts])
+    if len(keys)==0:
+        return {}
+    unique,inverse=np.unique(keys.astype(str),return_inverse=True)
+    totals=np.bincount(inverse.ravel(),weights=values,minlength=len(unique)).astype(np.int64)
+    return dict(zip(unique.tolist(),totals.tolist()))
+
+
+def _active_qubits(circuit: QuantumCircuit):
+    """
+        Returns the sorted indices of the qubits used by the instructions of a circuit, other than barriers, or None if the circuit
+        has control flow and can not be compacted.
+    """
+    active=set()
+    for i in circuit.data:
+        if i.operation.name=="barrier":
+            continue
+        if getattr(i.operation,"blocks",()):
+            return None
+        active.update(circuit.find_bit(q).index for q in i.qubits)
+    return tuple(sorted(active))
+
+
+def _compact_circuit(circuit: QuantumCircuit, active: tuple) -> QuantumCircuit:
+    """
+        Returns a copy of the circuit only with the active qubits, in the same order, and all its classical bits and registers,
+        so the counts of the copy are the same as the counts of the original circuit.
+    """
+    qubits=[circuit.qubits[q] for q in active]
+    kept=set(qubits)
+    d=QuantumCircuit(qubits,circuit.clbits,*circuit.cregs,name=circuit.name,global_phase=circuit.global_phase,metadata=circuit.metadata)
+    for i in circuit.data:
+        if i.operation.name=="barrier":
+            qargs=[q for q in i.qubits if q in kept]
+            if not qargs:
+                continue
+            if len(qargs)!=len(i.qubits):
+                d.barrier(qargs)
+                continue
+        d._append(i)
+    return d
+
+
+def _restrict_target(target: Target, active: tuple) -> Target:
+    """
+        Returns the target restricted to the active physical qubits, renumbered from 0, and the couplers between them.
+    """
+    index={q:i for i,q in enumerate(active)}
+    properties=None
+    if target.qubit_properties is not None:
+        properties=[target.qubit_properties[q] for q in active]
+    sub=Target(description=target.description, num_qubits=len(active), dt=target.dt, granularity=target.granularity,
+               min_length=target.min_length, pulse_alignment=target.pulse_alignment, acquire_alignment=target.acquire_alignment,
+               qubit_properties=properties, concurrent_measurements=None)
+    for name in target.operation_names:
+        inst={}
+        for qargs,props in target[name].items():
+            if qargs is not None and all(q in index for q in qargs):
+                inst[tuple(index[q] for q in qargs)]=props
+        if inst:
+            sub.add_instruction(target.operation_from_name(name),inst,name=name)
+    return sub
+
+
+def _circuit_key(circuit: QuantumCircuit) -> Optional[str]:
+    """
+        Returns a canonical representation of the content of a circuit, or None if it has control flow or conditions.
+    """
+    parts=[repr((circuit.name,circuit.num_qubits,circuit.num_clbits,[(r.name,r.size) for r in circuit.cregs],str(circuit.global_phase)))]
+    for i in circuit.data:
+        op=i.operation
+        if i.is_control_flow() or getattr(i,"condition",None) is not None:
+            return None
+        params=[str(p) if isinstance(p,ParameterExpression) else p for p in op.params]
+        parts.append(repr((op.name,params,[circuit.find_bit(q).index for q in i.qubits],[circuit.find_bit(c).index for c in i.clbits])))
+    return ";".join(parts)
+
+
+def _is_clifford_circuit(circuit: QuantumCircuit) -> bool:
+    for i in circuit.data:
+        name=i.operation.name
+        if name=="rz":
+            angle=i.operation.params[0]
+            if isinstance(angle,ParameterExpression):
+                if angle.parameters:
+                    return False
+                angle=float(angle)
+            if not math.isclose(math.remainder(angle,math.pi/2),0.0,abs_tol=1e-9):
+                return False
+        elif name not in CLIFFORD_GATES:
+            return False
+    return True
+
+
+def _quantum_errors(noise_model: NoiseModel) -> list:
+    """
+        Returns the quantum errors of a noise model, collected with :py:func:`qiskit_aer.utils.transform_noise_model`.
+    """
+    errors=[]
+
+    def _collect(error: QuantumError) -> QuantumError:
+        errors.append(error)
+        return error
+
+    transform_noise_model(noise_model,_collect)
+    return errors
+
+
+def _is_clifford_noise(noise_model: NoiseModel, key: tuple) -> bool:
+    if key is not None and key in _clifford_noise:
+        return _clifford_noise[key]
+    clifford=all(i.operation.name in CLIFFORD_ERRORS for error in _quantum_errors(noise_model) for circ in error.circuits for i in circ.data)
+    if key is not None:
+        _lru_put(_clifford_noise,key,clifford)
+    return clifford
+
+
+def _max_cut(circuit: QuantumCircuit) -> int:
+    """
+        Returns the maximum number of two-qubit gates that cross a cut between consecutive qubits, a bound of the entanglement.
+    """
+    crossings=np.zeros(circuit.num_qubits+2,dtype=np.int64)
+    for i in circuit.data:
+        if len(i.qubits)==2:
+            a,b=sorted(circuit.find_bit(q).index for q in i.qubits)
+            crossings[a+1]+=1
+            crossings[b+1]-=1
+    return int(np.cumsum(crossings).max())
+
+
+def _measured_at_end(circuit: QuantumCircuit) -> bool:
+    measured=set()
+    for i in circuit.data:
+        name=i.operation.name
+        # The condition is read from the CircuitInstruction, as Instruction.condition is deprecated
+        if name=="reset" or i.is_control_flow() or getattr(i,"condition",None) is not None:
+            return False
+        if name=="measure":
+            measured.update(i.qubits)
+        elif name!="barrier" and measured.intersection(i.qubits):
+            return False
+    return True
+
+
+def _select_method(circuit: QuantumCircuit, num_qubits: int, noise_model: NoiseModel, noise_key: tuple, shots: int, pauli: bool):
+    """
+        Returns the simulation method for a circuit and if the noise must be replaced by its Pauli approximation.
+    """
+    noisy=noise_model is not None and not noise_model.is_ideal()
+    # As in Aer, a single density matrix shot is faster than many noisy shots for few qubits
+    if noisy and num_qubits<=DENSITY_MATRIX_MAX_QUBITS and shots>2**num_qubits and _measured_at_end(circuit):
+        return "density_matrix",False
+    if _is_clifford_circuit(circuit):
+        if not noisy or _is_clifford_noise(noise_model,noise_key):
+            return "stabilizer",False
+        if pauli:
+            return "stabilizer",True
+    if num_qubits>=MPS_MIN_QUBITS and _max_cut(circuit)<=MPS_MAX_CUT:
+        return "matrix_product_state",False
+    return "statevector",False
+
+
+def _pauli_twirl(error: QuantumError) -> QuantumError:
+    """
+        Returns the Pauli twirl of a quantum error: the Pauli channel with the probabilities :math:`\\sum_i |tr(P K_i)|^2/d^2`.
+    """
+    kraus=Kraus(error.to_quantumchannel()).data
+    d=2**error.num_qubits
+    labels=["".join(p) for p in itertools.product("IXYZ",repeat=error.num_qubits)]
+    probabilities=[sum(abs(np.trace(Pauli(label).to_matrix().conj().T@k))**2 for k in kraus)/d**2 for label in labels]
+    return pauli_error([(label,p) for label,p in zip(labels,probabilities) if p>1e-12])
+
+
+def _get_pauli_noise_model(noise_model: NoiseModel, key: tuple, cache: bool) -> NoiseModel:
+    if cache and key is not None and key in _noise_models:
+        _noise_models.move_to_end(key)
+        return _noise_models[key]
+    pauli_model=transform_noise_model(noise_model,_pauli_twirl)
+    if cache and key is not None:
+        _lru_put(_noise_models,key,pauli_model)
+    return pauli_model
+
+
+class QmioAerSimulator(AerSimulator):
+    """
+    :class:`qiskit_aer.AerSimulator` returned by :func:`FakeQmio`. It adds a sharded execution mode: if the option ``processes``
+    of :meth:`run` (or of :func:`FakeQmio`) is greater than 1, the shots are split across a pool of processes, each shard runs with
+    an independent seed derived from the master seed ``seed_simulator`` with :py:class:`numpy.random.SeedSequence`, and the counts and
+    memory of the shards are merged. The results are reproducible for the same master seed and number of processes.
+
+    The method :meth:`run` waits for the simulation and always returns a :class:`QmioJob` with the result.
+
+    The pool is created on the first sharded run and reused by the next ones. Each worker uses ``max_parallel_threads`` equal to the
+    number of CPUs divided by the number of processes, unless it is set.
+
+    If the option ``restrict_qubits`` is True (False by default in :func:`FakeQmio`), each circuit is compacted to the physical qubits that it uses
+    and simulated with the noise model of only those qubits and their couplers, cached by the set of qubits. The classical bits are not
+    changed, so the counts and memory are the same as for the full circuit, but the cost does not depend on the 32 qubits of Qmio.
+    It is only applied while the noise model is the one created by :func:`FakeQmio`.
+
+    If the option ``auto_method`` is True (False by default in :func:`FakeQmio`) and the option ``method`` is "automatic", the simulation method
+    of each circuit is chosen from its gates, width and entanglement and the noise model:
+
+    * ``density_matrix`` for noisy circuits with 12 qubits or less, measured at the end, and more shots than :math:`2^n`.
+    * ``stabilizer`` for Clifford circuits (``rz`` with multiples of :math:`\\pi/2`) if the noise is Clifford too. If the option
+      ``pauli_approximation`` is True, the noise is replaced by its Pauli twirl to use ``stabilizer`` also with non-Clifford noise.
+    * ``matrix_product_state`` for circuits with 20 or more qubits where no cut of the qubits is crossed by more than 6 two-qubit gates.
+    * ``statevector`` otherwise.
+
+    The chosen method is in the field ``method`` of the metadata of each experiment of the result.
+
+    If the option ``result_cache`` is a :class:`qmiotools.integrations.utils.ResultCache` (or True, to use :meth:`ResultCache.default`),
+    the results are cached by the content of the circuits, the parameters and the options of the run and the calibrations and noise flags,
+    so a repeated run returns the cached result, with the field ``cached`` equal to True in the metadata of its experiments. Only the runs
+    with the option ``seed_simulator`` are cached, as the others are not reproducible.
+    """
+
+    _processes=None
+    _restrict_qubits=False
+    _auto_method=False
+    _pauli_approximation=False
+    _result_cache=None
+    _noise_key=None
+    _noise_model=None
+    _cache=True
+    _pool=None
+    _pool_size=0
+
+    def run(self, circuits, parameter_binds=None, **run_options):
+        processes=run_options.pop("processes",self._processes)
+        restrict=run_options.pop("restrict_qubits",self._restrict_qubits)
+        auto=run_options.pop("auto_method",self._auto_method)
+        pauli=run_options.pop("pauli_approximation",self._pauli_approximation)
+        result_cache=run_options.pop("result_cache",self._result_cache)
+        if result_cache is True:
+            result_cache=ResultCache.default()
+        key=None
+        if result_cache is not None:
+            key=self._result_key(circuits,parameter_binds,run_options,(processes,restrict,auto,pauli))
+        if key is not None:
+            result=result_cache.get(key)
+            if result is not None:
+                logger.info("Results read from the cache")
+                result=Result.from_dict(result)
+                for experiment in result.results:
+                    if getattr(experiment,"metadata",None) is None:
+                        experiment.metadata={}
+                    experiment.metadata["cached"]=True
+                return QmioJob(backend=self,job_id=result.job_id,jobstatus=JobStatus.DONE,result=result)
+            job=self._run(circuits,parameter_binds,run_options,processes,restrict,auto,pauli)
+            # The cache stores JSON, so the result is stored as its dict
+            result_cache.put(key,job.result().to_dict())
+            return job
+        return self._run(circuits,parameter_binds,run_options,processes,restrict,auto,pauli)
+
+    def _result_key(self, circuits, parameter_binds, options: dict, flags: tuple) -> Optional[str]:
+        """
+            Returns the key of a run in the result cache, or None if it can not be cached.
+        """
+        if "noise_model" in options:
+            return None
+        # Without a seed each run is meant to give other samples
+        if options.get("seed_simulator",getattr(self.options,"seed_simulator",None)) is None:
+            return None
+        if self.options.noise_model is self._noise_model and self._noise_key is not None:
+            noise=self._noise_key
+        elif self.options.noise_model is None:
+            noise=None
+        else:
+            return None
+        if isinstance(circuits,QuantumCircuit):
+            circuits=[circuits]
+        keys=[]
+        for c in circuits:
+            if not isinstance(c,QuantumCircuit):
+                return None
+            k=_circuit_key(c)
+            if k is None:
+                return None
+            keys.append(k)
+        binds=None
+        if parameter_binds is not None:
+            binds=[sorted((str(p),list(v)) for p,v in b.items()) for b in parameter_binds]
+        settings=(self.options.shots,self.options.seed_simulator if hasattr(self.options,"seed_simulator") else None,
+                  self.options.method,self.options.memory)
+        return ResultCache.key(self.name,noise,settings,flags,sorted(options.items()),binds,*keys)
+
+    def _run(self, circuits, parameter_binds, run_options: dict, processes: int, restrict: bool, auto: bool, pauli: bool):
+        single=isinstance(circuits,QuantumCircuit)
+        if single:
+            circuits=[circuits]
+        if all(isinstance(c,QuantumCircuit) for c in circuits):
+            own_noise=("noise_model" not in run_options and self._noise_model is not None and self.options.noise_model is self._noise_model)
+            auto=auto and "method" not in run_options and self.options.method=="automatic"
+            actives=[_active_qubits(c) for c in circuits]
+            restrict=restrict and own_noise and all(a for a in actives)
+            if restrict or auto:
+                return self._run_groups(circuits,parameter_binds,processes,run_options,actives,restrict,auto,pauli,own_noise)
+        return self._execute(circuits[0] if single else circuits,parameter_binds,processes,run_options)
+
+    def _execute(self, circuits, parameter_binds, processes: int, options: dict) -> QmioJob:
+        if processes is None or processes<=1:
+            # The job of Aer is waited for, so all the runs return a QmioJob with the result
+            result=super().run(circuits,parameter_binds=parameter_binds,**options).result()
+            return QmioJob(backend=self,job_id=result.job_id,jobstatus=JobStatus.DONE,result=result)
+        return self._run_sharded(circuits,parameter_binds,processes,options)
+
+    def _run_groups(self, circuits, parameter_binds, processes: int, options: dict, actives: list, restrict: bool, auto: bool, pauli: bool, own_noise: bool):
+        """
+            Runs the circuits grouped by their active qubits (if they are restricted) and by the simulation method (if it is selected
+            automatically), each group with its noise model and method.
+        """
+        shots=options.get("shots",self.options.shots)
+        groups=OrderedDict()
+        for k,c in enumerate(circuits):
+            active=actives[k] if restrict else None
+            if restrict:
+                noise_key=self._noise_key+(active,)
+                # The restricted models are only cached in memory, as there is one for each set of active qubits
+                noise_model=_get_noise_model(_QmioTargetBackend(_restrict_target(self.target,active)),noise_key,self._cache,False)
+            elif own_noise:
+                noise_key,noise_model=self._noise_key,self._noise_model
+            else:
+                noise_key,noise_model=None,options.get("noise_model",self.options.noise_model)
+
+            method,approximate=None,False
+            if auto:
+                num_qubits=len(actives[k]) if actives[k] is not None else c.num_qubits
+                method,approximate=_select_method(c,num_qubits,noise_model,noise_key,shots,pauli)
+                if approximate:
+                    noise_key=None if noise_key is None else noise_key+("pauli",)
+                    noise_model=_get_pauli_noise_model(noise_model,noise_key,self._cache)
+
+            key=(active,method,noise_key if noise_key is not None else id(noise_model))
+            if key not in groups:
+                groups[key]=(active,method,noise_model if (restrict or approximate) else None,[])
+            groups[key][3].append(k)
+
+        jobs=[]
+        for active,method,noise_model,indices in groups.values():
+            logger.debug("Running %d circuits with qubits %s and method %s"%(len(indices),active,method))
+            opts=dict(options)
+            if noise_model is not None:
+                opts["noise_model"]=noise_model
+            if method is not None:
+                opts["method"]=method
+            binds=None if parameter_binds is None else [parameter_binds[k] for k in indices]
+            if active is not None:
+                group=[_compact_circuit(circuits[k],active) for k in indices]
+            else:
+                group=[circuits[k] for k in indices]
+            jobs.append(self._execute(group,binds,processes,opts))
+        if len(jobs)==1:
+            return jobs[0]
+
+        results=[None]*len(circuits)
+        for job,(_,_,_,indices) in zip(jobs,groups.values()):
+            result=job.result()
+            for k,experiment in zip(indices,result.results):
+                results[k]=experiment
+        result=Result(backend_name=result.backend_name,backend_version=result.backend_version,qobj_id=result.qobj_id,
+                      job_id=str(uuid.uuid4()),success=all(r.success for r in results),results=results,
+                      status=result.status,date=result.date,header=result.header)
+        return QmioJob(backend=self,job_id=result.job_id,jobstatus=JobStatus.DONE,result=result)
+
+    def _get_pool(self, processes: int) -> ProcessPoolExecutor:
+        if self._pool is None or self._pool_size!=processes:
+            self.shutdown()
+            # spawn instead of fork: OpenMP of Aer could hang in children forked after a simulation
+            self._pool=ProcessPoolExecutor(max_workers=processes,mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=_init_shard_worker,initargs=(self,))
+            self._pool_size=processes
+            atexit.register(self.shutdown)
+        return self._pool
+
+    def shutdown(self):
+        """
+            Closes the pool of processes used by the sharded runs.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool=None
+            self._pool_size=0
+            atexit.unregister(self.shutdown)
+
+    def __getstate__(self):
+        state=self.__dict__.copy()
+        state.pop("_pool",None)
+        state.pop("_pool_size",None)
+        return state
+
+    def _run_sharded(self, circuits, parameter_binds, processes: int, options: dict) -> QmioJob:
+        start=time.time()
+        shots=options.pop("shots",None)
+        if shots is None:
+            shots=self.options.shots
+        seed=options.pop("seed_simulator",None)
+        if seed is None:
+            seed=getattr(self.options,"seed_simulator",None)
+        if seed is None:
+            seed=int(np.random.SeedSequence().generate_state(1)[0])
+        if "max_parallel_threads" not in options:
+            options["max_parallel_threads"]=max(1,(os.cpu_count() or 1)//processes)
+
+        sizes=[len(s) for s in np.array_split(np.arange(shots),processes) if len(s)>0]
+        seeds=[int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(len(sizes))]
+        logger.info("Running %d shots in %d shards with master seed %d"%(shots,len(sizes),seed))
+
+        pool=self._get_pool(processes)
+        futures=[pool.submit(_run_shard,circuits,parameter_binds,n,s,options) for n,s in zip(sizes,seeds)]
+        shards=[f.result() for f in futures]
+
+        merged=shards[0]
+        for k,experiment in enumerate(merged["results"]):
+            data=experiment["data"]
+            if "counts" in data:
+                data["counts"]=_merge_counts([shard["results"][k]["data"]["counts"] for shard in shards])
+            if "memory" in data:
+                data["memory"]=[m for shard in shards for m in shard["results"][k]["data"]["memory"]]
+            experiment["shots"]=shots
+            experiment["seed_simulator"]=seed
+            experiment.setdefault("metadata",{})
+            experiment["metadata"]["shards"]=sizes
+            experiment["metadata"]["shard_seeds"]=seeds
+            experiment["time_taken"]=sum(shard["results"][k].get("time_taken",0.0) for shard in shards)
+        merged["time_taken"]=time.time()-start
+        merged["job_id"]=str(uuid.uuid4())
+        result=Result.from_dict(merged)
+        return QmioJob(backend=self,job_id=result.job_id,jobstatus=JobStatus.DONE,result=result)
+
+
+def _lru_put(cache: OrderedDict, key, value):
+    cache[key]=value
+    if len(cache)>MAX_CACHED_NOISE_MODELS:
+        cache.popitem(last=False)
+
+
+def _get_target(calibrations: Calibrations, calibration_hash: str) -> Target:
+    if calibration_hash in _targets:
+        _targets.move_to_end(calibration_hash)
+        return _targets[calibration_hash]
+    target=build_target(calibrations,logger)
+    _lru_put(_targets,calibration_hash,target)
+    return target
+
+
+def _evict_disk():
+    """
+        Removes the least recently used noise models of the disk cache beyond :data:`MAX_DISK_NOISE_MODELS`.
+    """
+    try:
+        files=[os.path.join(CACHE_DIR,f) for f in os.listdir(CACHE_DIR) if f.startswith("noise_model_") and f.endswith(".pkl")]
+    except OSError:
+        return
+    if len(files)<=MAX_DISK_NOISE_MODELS:
+        return
+    files.sort(key=lambda f: os.path.getatime(f) if os.path.exists(f) else 0.0)
+    for f in files[:len(files)-MAX_DISK_NOISE_MODELS]:
+        try:
+            os.remove(f)
+        except OSError:
+            pass
+
+
+def _get_noise_model(backend: BackendV2, key: tuple, cache: bool, disk_cache: bool=False) -> NoiseModel:
+    """
+        Returns the noise model of the backend for the flags of the key, from the memory cache, from the disk cache (if ``disk_cache``) or deriving it.
+    """
+    if cache and key in _noise_models:
+        _noise_models.move_to_end(key)
+        logger.debug("Noise model found in memory")
+        return _noise_models[key]
+
+    thermal_relaxation,temperature,gate_error,readout_error=key[1:5]
+    filename=None
+    if cache and disk_cache:
+        name=hashlib.sha256(repr(key+(qiskit_aer.__version__,)).encode()).hexdigest()
+        filename=os.path.join(CACHE_DIR,"noise_model_%s.pkl"%name)
+        try:
+            with open(filename,"rb") as f:
+                noise_model=pickle.load(f)
+            logger.debug("Noise model read from %s"%filename)
+            _lru_put(_noise_models,key,noise_model)
+            return noise_model
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Error reading the noise model from %s: %s"%(filename,e))
+
+    noise_model = NoiseModel.from_backend(
+        backend, thermal_relaxation=thermal_relaxation,
+        temperature=temperature,
+        gate_error=gate_error,
+        readout_error=readout_error)
+
+    if cache:
+        _lru_put(_noise_models,key,noise_model)
+    if filename is not None:
+        try:
+            os.makedirs(CACHE_DIR,exist_ok=True)
+            tmp="%s.%d.tmp"%(filename,os.getpid())
+            with open(tmp,"wb") as f:
+                pickle.dump(noise_model,f,protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp,filename)
+            logger.debug("Noise model stored in %s"%filename)
+            _evict_disk()
+        except OSError as e:
+            logger.warning("Error storing the noise model in %s: %s"%(filename,e))
+    return noise_model
+
+
+def FakeQmio(calibration_file: str=None, thermal_relaxation: bool = True, temperature: float = 0 , gate_error: bool=False, readout_error: bool=False, logging_level: int=logging.NOTSET, logging_filename: str=None, cache: bool=True, disk_cache: bool=False, processes: int=None, restrict_qubits: bool=False, auto_method: bool=False, pauli_approximation: bool=False, result_cache: ResultCache=None, **kwargs) -> QmioAerSimulator:
     r"""
     
     Create a Fake backend for Qmio that uses the last calibrations and AerSimulator. 
@@ -25,10 +622,17 @@ def FakeQmio(calibration_file: str=None, thermal_relaxation: bool = True, temper
         readout_error (bool): Flag to include (True) or not (False. Default) the readout error from the calibrations file.
         logging_level (int): flag to indicate the logging level. Better if use the logging package levels. Default logging.NOTSET
         logging_filename (str):  Path to store the logging messages. Default *None*, i.e., output in stdout
+        cache (bool): If True (default), the noise model is cached in memory, keyed by the hash of the content of the calibrations and the noise flags, so creating again a FakeQmio with the same calibrations takes milliseconds. The cached noise model is shared by the simulators, so do not modify it.
+        disk_cache (bool): If True, the noise model is also cached on disk, in the directory set by the environment variable QMIO_CACHE_DIR (by default ~/.cache/qmiotools), so other processes with the same calibrations do not derive it again. The directory keeps the last MAX_DISK_NOISE_MODELS models. Default *False*.
+        processes (int): number of processes used to split the shots of each run (see :class:`QmioAerSimulator`). It can be changed in each call to ``run``. Default *None*, i.e., a single process.
+        restrict_qubits (bool): If True, each circuit is simulated only with its active qubits and the noise model restricted to them (see :class:`QmioAerSimulator`). It can be changed in each call to ``run``. Default *False*.
+        auto_method (bool): If True, the simulation method of each circuit is chosen automatically, unless the option ``method`` is set (see :class:`QmioAerSimulator`). It changes the method, and so the samples for a given seed, of the runs with the default method of Aer. Default *False*.
+        pauli_approximation (bool): If True, the Clifford circuits are simulated with the stabilizer method replacing the noise by its Pauli twirl. Default *False*.
+        result_cache (ResultCache): cache of the results of the runs, or True to use :meth:`qmiotools.integrations.utils.ResultCache.default`. It can be changed in each call to ``run``. Default *None*, i.e., without cache.
         **kwargs: other parameters to pass directly to :class:`qiskit_aer.AerSimulator`
 
     Returns:
-        AerSimulator: A valid backend including the defined noise model.
+        QmioAerSimulator: A valid AerSimulator backend including the defined noise model.
 
     Raises:
         QmioException: if the configuration file could not be found. 
@@ -49,21 +653,27 @@ def FakeQmio(calibration_file: str=None, thermal_relaxation: bool = True, temper
 
     logger.info("Logging FakeQmio started:")
     handler.flush()
-    logger.info("Reading QmioBackend data")
-    qmio=QmioBackend(calibration_file,logging_level=logging_level, logging_filename=logging_filename)
-    noise_model = NoiseModel.from_backend(
-        qmio, thermal_relaxation=thermal_relaxation,
-        temperature=temperature,
-        gate_error=gate_error,
-        readout_error=readout_error)
-    
+    logger.info("Reading Qmio calibrations")
+    calibrations=Calibrations.import_last_calibration(calibration_file)
+    calibration_hash=calibrations.get_hash()
+    qmio=_QmioTargetBackend(_get_target(calibrations,calibration_hash))
+    noise_key=(calibration_hash,thermal_relaxation,temperature,gate_error,readout_error)
+    noise_model=_get_noise_model(qmio,noise_key,cache,disk_cache)
     
-    cls= AerSimulator.from_backend(qmio, noise_model=noise_model, **kwargs)
+    cls= QmioAerSimulator.from_backend(qmio, noise_model=noise_model, **kwargs)
+    cls._processes=processes
+    cls._restrict_qubits=restrict_qubits
+    cls._auto_method=auto_method
+    cls._pauli_approximation=pauli_approximation
+    cls._result_cache=result_cache
+    cls._noise_key=noise_key
+    cls._noise_model=noise_model
+    cls._cache=cache
     
     cls.name = "FakeQmio"
     cls.description ="Fake backend for Qmio that uses the last calibrations and AerSimulator"
     #cls.version=VERSION
-    logger.info("Created AerSimulator for Qmio with calibration_file:%s, thermal_relaxation: %s, temperature: %.2fmK , gate_error:%s, readout_error: %s "%(qmio._calibration_file, thermal_relaxation, temperature, gate_error, readout_error))
+    logger.info("Created AerSimulator for Qmio with calibration_file:%s, thermal_relaxation: %s, temperature: %.2fmK , gate_error:%s, readout_error: %s "%(calibrations.get_filename(), thermal_relaxation, temperature, gate_error, readout_error))
     return cls
         
     
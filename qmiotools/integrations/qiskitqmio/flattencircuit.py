@@ -1,38 +1,62 @@
 from qiskit.circuit import QuantumCircuit, ClassicalRegister
+import numpy as np
+
+
+def _param_key(param):
+    if isinstance(param,QuantumCircuit):
+        return circuit_fingerprint(param)
+    if isinstance(param,np.ndarray):
+        return (param.shape,param.tobytes())
+    return param
+
+
+def circuit_fingerprint(circ: QuantumCircuit) -> tuple:
+    """
+    Returns a hashable fingerprint of the content of a circuit: the name, parameters, qubits, classical bits and condition of
+    each instruction, the registers, the global phase and the name of the circuit. It changes with any in-place modification
+    of the circuit, like :py:meth:`qiskit.circuit.QuantumCircuit.assign_parameters` with ``inplace=True``, so the caches of
+    derived objects keyed by the circuit use it to detect stale entries. It walks all the instructions in Python, so it is
+    only worth for objects more expensive to build than the walk, like exported programs.
+
+    Args:
+        circ: A QuantumCircuit
+
+    Returns:
+        A tuple with the hash of the instructions and the sizes and names of the circuit
+    """
+    # The name, parameters and condition are read from the CircuitInstruction, which does not build the Python object of the standard
+    # gates nor warns as the deprecated Instruction.condition (and it has no condition in the versions of Qiskit without conditions).
+    # The bits are hashed themselves, as the copies of a circuit share them
+    instructions=hash(tuple((i.name,tuple(map(_param_key,i.params)),i.qubits,i.clbits,getattr(i,"condition",None)) for i in circ.data))
+    return (instructions,len(circ.data),tuple((r.name,r.size) for r in circ.qregs),tuple((r.name,r.size) for r in circ.cregs),
+            str(circ.global_phase),circ.name)
+
 
 def FlattenCircuit(circ: QuantumCircuit) -> QuantumCircuit:
     """
     Method to convert a Qiskit circuit with several ClassicalRegisters in a single ClassicalRegister
-    
+
+    The new ClassicalRegister is built with the same classical bits of the circuit, in the order of its registers,
+    so the instructions are composed without copying nor remapping their bits, and a physical circuit keeps its layout.
+    The result is not cached: the composition is done by Qiskit in Rust and it is several times faster than checking
+    that a circuit has not changed with :func:`circuit_fingerprint`. The callers that derive expensive objects from the
+    flattened circuit, like the programs exported by :py:class:`QmioBackend`, cache them with the flattened circuit.
+
     Args:
         circ: A QuantumCircuit
-        
-    Returns: 
+
+    Returns:
         A new QuantumCircuit with a single ClassicalRegister
     """
-    d=QuantumCircuit()
-    [d.add_register(i) for i in circ.qregs]
-    j=0
-
-    registers={}
+    bits=[]
     for i in circ.cregs:
-        registers[i.name]=j
-        j=j+i.size
-        #print(i)
-        #print(j)
-    #print(registers)
-    ag=ClassicalRegister(j,"C")
-    d.add_register(ag)
-    #print(j) # Probar a hacerlo en vectorial
-    for i in circ.data:
-        if i.operation.name == "measure":
-            j=i.clbits[0]
-
-            d.measure(i.qubits[0],ag[registers[j._register.name]+j._index])
-            #print(i.clbits[0])
-
-        else:
-            d.data.append(i)
-    d.name=circ.name
-    return d
+        bits.extend(i)
+    ag=ClassicalRegister(name="C",bits=bits)
 
+    # compose adds the global phase of the circuit
+    d=QuantumCircuit(*circ.qregs,ag,name=circ.name,metadata=circ.metadata)
+    d.compose(circ,inplace=True,copy=False)
+    # QuantumCircuit.copy_empty_like would keep the layout, but also the old registers, and the layout has no public setter, so it is
+    # set as the transpiler does
+    d._layout=circ.layout
+    return d
@@ -0,0 +1,118 @@
+from typing import Dict, List, Optional
+import hashlib
+import json
+import os
+
+from ...exceptions import QmioException
+
+
+def _to_json(value):
+    # The complex values (e.g. the IQ points of raw results) are stored as [re, im], tagged to be decoded by _from_json
+    if isinstance(value,complex):
+        return {"__complex__":[value.real,value.imag]}
+    if hasattr(value,"tolist"):
+        return value.tolist()
+    raise TypeError("Object of type %s is not JSON serializable"%type(value).__name__)
+
+
+def _from_json(record: Dict):
+    if len(record)==1 and "__complex__" in record:
+        return complex(*record["__complex__"])
+    return record
+
+
+class JobJournal:
+    """
+    Append-only journal of the chunks of a job executed by :class:`QmioBackend`, used to resume the job after a crash.
+
+    The journal is a file ``<job id>.journal`` with one JSON line per record. The first line describes the job (the hash of each program
+    and the options that change the results) and the next ones store the results returned by the QPU for each completed chunk of shots,
+    written and synced to disk as soon as they arrive. A line truncated by a crash is ignored when the journal is read again.
+
+    Args:
+        directory (str): the directory of the journals.
+        job_id (str): the id of the job.
+    """
+
+    def __init__(self, directory: str, job_id: str):
+        self._job_id=str(job_id)
+        self._filename=os.path.join(directory,"%s.journal"%self._job_id)
+        self._header=None
+        self._chunks={}
+        if os.path.exists(self._filename):
+            self._read()
+
+    @property
+    def job_id(self) -> str:
+        return self._job_id
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    @property
+    def header(self) -> Optional[Dict]:
+        return self._header
+
+    @staticmethod
+    def program_hash(program: str) -> str:
+        return hashlib.sha256(program.encode()).hexdigest()
+
+    def _read(self):
+        valid=0
+        with open(self._filename,"rb+") as f:
+            for line in f:
+                try:
+                    record=json.loads(line,object_hook=_from_json)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid+=len(line)
+                if self._header is None:
+                    self._header=record
+                else:
+                    self._chunks[(record["program"],record["chunk"])]=record["results"]
+            # Removes the line truncated by a crash, so the next records are appended after the last valid one
+            f.truncate(valid)
+
+    def _append(self, record: Dict):
+        with open(self._filename,"a") as f:
+            f.write(json.dumps(record,default=_to_json)+"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def start(self, programs: List[str], **options):
+        """
+        Writes the header of a new journal or, if it already exists, checks that it was written for the same programs and options.
+
+        Args:
+            programs (list): the programs of the job, in order.
+            options: the options of the job that change its results.
+
+        Raises:
+            QmioException: if the journal exists and the programs or the options do not match.
+        """
+        header={"job_id":self._job_id,"programs":[self.program_hash(p) for p in programs],"options":options}
+        if self._header is None:
+            os.makedirs(os.path.dirname(self._filename) or ".",exist_ok=True)
+            self._append(header)
+            self._header=header
+        elif self._header["programs"]!=header["programs"] or self._header["options"]!=json.loads(json.dumps(options)):
+            raise QmioException("The journal %s was written for other programs or options"%self._filename)
+
+    def get(self, program: int, chunk: int) -> Optional[Dict]:
+        """
+            Returns the results stored for a chunk of a program, or None if the chunk was not completed.
+        """
+        return self._chunks.get((program,chunk))
+
+    def record(self, program: int, chunk: int, results: Dict):
+        """
+            Appends the results of a completed chunk of a program.
+        """
+        self._append({"program":program,"chunk":chunk,"results":results})
+        self._chunks[(program,chunk)]=results
+
+    def __len__(self) -> int:
+        return len(self._chunks)
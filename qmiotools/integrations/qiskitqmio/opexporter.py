@@ -1,14 +1,78 @@
 from qiskit.pulse import Schedule, ScheduleBlock
+from qiskit.pulse.exceptions import PulseError
+from qiskit.circuit import Parameter, ParameterExpression
 from qiskit.version import get_version_info
-from typing import Union
+from typing import Union, Dict, List, Sequence
+from collections import OrderedDict
 from .qpbuilder import QPBuilder
 from ...version import VERSION
 import warnings
 import logging
+import weakref
 import io
 
 logger=logging.getLogger("OPExporter/%s"%VERSION)
- 
+
+MAX_TEMPLATES=32
+
+class OPTemplate:
+    """
+    An OpenPulse program compiled once from a :py:class:`qiskit.pulse.Schedule` with unbound parameters.
+    
+    The numeric literals of the waveform, phase and frequency statements that depend on the parameters are
+    kept as placeholders, that are substituted by :py:meth:`bind` without rebuilding the program.
+    
+    Args:
+            template (str): the OpenPulse program with named ``%`` placeholders.
+            slots (dict): a dictionary between each parameter expression and the name of its placeholder.
+    """
+    
+    def __init__(self, template: str, slots: Dict[ParameterExpression,str]):
+        self._template=template
+        self._slots=slots
+        self.parameters=set()
+        for expr in slots:
+            self.parameters.update(expr.parameters)
+    
+    def bind(self, values: Dict[Parameter,float]) -> str:
+        """
+        Returns the OpenPulse program for one point of the sweep.
+        
+        Args:
+            values (dict): a dictionary between each :py:class:`qiskit.circuit.Parameter` of the schedule and its value.
+        
+        Raised:
+            :py:class:`ValueError`: if a parameter of the schedule has no value.
+        """
+        if not self._slots:
+            return self._template
+        missing=self.parameters.difference(values)
+        if missing:
+            raise ValueError("Parameters without value: %s"%sorted(str(p) for p in missing))
+        literals={}
+        for expr,name in self._slots.items():
+            if isinstance(expr,Parameter):
+                literals[name]=str(float(values[expr]))
+            else:
+                literals[name]=str(float(expr.bind({p: values[p] for p in expr.parameters})))
+        return self._template % literals
+    
+    def bind_all(self, parameter_values: Dict[Parameter,Sequence[float]]) -> List[str]:
+        """
+        Returns the OpenPulse programs for a table of values, one per point of the sweep.
+        
+        Args:
+            parameter_values (dict): a dictionary between each :py:class:`qiskit.circuit.Parameter` of the schedule and the sequence of its values. All the sequences must have the same length.
+        
+        Raised:
+            :py:class:`ValueError`: if the sequences have different lengths.
+        """
+        lengths=set(len(v) for v in parameter_values.values())
+        if len(lengths)>1:
+            raise ValueError("All the parameters must have the same number of values")
+        points=lengths.pop() if lengths else 0
+        return [self.bind({p: v[i] for p,v in parameter_values.items()}) for i in range(points)]
+
 class OPExporter:
     """
     OpenPulse exporter main class.
@@ -22,13 +86,21 @@ class OPExporter:
         qiskitversion= get_version_info().split(".")
         if int(qiskitversion[0])>=2:
             warnings.Warning("Qiskit version %s could not be compatible with Schedule")
-            
-    def dumps(self, schedule:  Union[Schedule,ScheduleBlock]):
+        self._builder=None
+        self._templates=OrderedDict()
+
+    def _get_builder(self) -> QPBuilder:
+        if self._builder is None:
+            self._builder = QPBuilder(logging_level=logger.level)
+        return self._builder
+
+    def dumps(self, schedule:  Union[Schedule,ScheduleBlock], minify: bool=False):
         """
         Convert the schedule to `OpenPulse <https://openqasm.com/language/openpulse.html>`_, returning the result as a string.
         
         Args:
             schedule (Schedule or ScheduleBlock): a valid :py:class:`qiskit.pulse.Schedule` to translate to OpenPulse grammar.
+            minify (bool): if True, the sentences are not separated by newlines, i.e., the program is ready to be submitted to Qmio. Default *False*
         
         Returns:
             str: a string with the OpenPulse program
@@ -41,14 +113,21 @@ class OPExporter:
             raise ValueError("schedule must be a valid Qiskit Schedule or ScheduleBlock")
             
         with io.StringIO() as stream:
-            self.dump(schedule, stream)
+            self.dump(schedule, stream, minify)
             return stream.getvalue()
     
-    def dump(self, schedule: Union[Schedule,ScheduleBlock], program: io.IOBase):
+    def dump(self, schedule: Union[Schedule,ScheduleBlock], program: io.IOBase, minify: bool=False):
         """
         
         Convert the schedule to `OpenPulse <https://openqasm.com/language/openpulse.html>`_, dumping the result to a stream.
         
+        The schedule is traversed only once and the sentences are written to the stream as they are generated.
+        
+        Args:
+            schedule (Schedule or ScheduleBlock): a valid :py:class:`qiskit.pulse.Schedule` to translate to OpenPulse grammar.
+            program (io.IOBase): the stream where the program is written.
+            minify (bool): if True, the sentences are not separated by newlines. Default *False*
+        
         """
         
         if not isinstance(schedule,Schedule) and not isinstance(schedule,ScheduleBlock):
@@ -57,10 +136,68 @@ class OPExporter:
         if not isinstance(program,io.IOBase):
             raise ValueError("program must be a valid IO stream")
             
-        builder = QPBuilder(logging_level=logger.level)
-        sentences=builder.build_program(schedule)
-        head=builder.build_header()
-        program.write(head)
+        self._get_builder().write_program(schedule, program, minify)
 
-        for piece in sentences:
-            program.write(piece+'\n')
+    def compile(self, schedule: Union[Schedule,ScheduleBlock], minify: bool=False) -> OPTemplate:
+        """
+        Convert a schedule with unbound parameters to an :py:class:`OPTemplate`.
+        
+        The last compiled templates are cached by schedule, so compiling again the same schedule does not rebuild the program. 
+        The cache checks the number of children (or blocks of a :py:class:`qiskit.pulse.ScheduleBlock`), the duration and the parameters of the schedule, so other in-place modifications of a compiled schedule are not detected.
+        
+        Args:
+            schedule (Schedule or ScheduleBlock): a valid :py:class:`qiskit.pulse.Schedule` to translate to OpenPulse grammar.
+            minify (bool): if True, the sentences are not separated by newlines. Default *False*
+        
+        Returns:
+            OPTemplate: the compiled template
+        
+        Raised:
+            :py:class:`ValueError`: if an invalid :py:class:`qiskit.pulse.Schedule` was passed as arguments, or a duration, sigma or width of the schedule is a parameter
+        """
+        if not isinstance(schedule,Schedule) and not isinstance(schedule,ScheduleBlock):
+            raise ValueError("schedule must be a valid Qiskit Schedule or ScheduleBlock")
+        
+        key=(id(schedule),minify)
+        size=len(schedule.blocks) if isinstance(schedule,ScheduleBlock) else len(schedule.children)
+        try:
+            fingerprint=(size,schedule.duration,frozenset(schedule.parameters))
+        except PulseError as e:
+            raise ValueError("The durations of the schedule can not be parameters: %s"%e)
+        if key in self._templates:
+            ref,cached_fingerprint,template=self._templates[key]
+            if ref() is schedule and cached_fingerprint==fingerprint:
+                logger.debug("Using cached template for %s"%schedule.name)
+                self._templates.move_to_end(key)
+                return template
+        
+        slots={}
+        with io.StringIO() as stream:
+            self._get_builder().write_program(schedule, stream, minify, slots)
+            template=OPTemplate(stream.getvalue(), slots)
+        
+        try:
+            ref=weakref.ref(schedule)
+        except TypeError:
+            # ScheduleBlock does not support weak references, so it is kept alive while it is in the cache
+            ref=lambda: schedule
+        self._templates[key]=(ref,fingerprint,template)
+        self._templates.move_to_end(key)
+        if len(self._templates)>MAX_TEMPLATES:
+            self._templates.popitem(last=False)
+        return template
+    
+    def dumps_sweep(self, schedule: Union[Schedule,ScheduleBlock], parameter_values: Dict[Parameter,Sequence[float]], minify: bool=False) -> List[str]:
+        """
+        Convert a schedule with parameters to one `OpenPulse <https://openqasm.com/language/openpulse.html>`_ program per point of a sweep. 
+        The program is built once and only the values of the parameters are substituted for each point.
+        
+        Args:
+            schedule (Schedule or ScheduleBlock): a valid :py:class:`qiskit.pulse.Schedule` to translate to OpenPulse grammar.
+            parameter_values (dict): a dictionary between each :py:class:`qiskit.circuit.Parameter` of the schedule and the sequence of its values.
+            minify (bool): if True, the sentences are not separated by newlines. Default *False*
+        
+        Returns:
+            list(str): the OpenPulse programs, one per point.
+        """
+        return self.compile(schedule, minify).bind_all(parameter_values)
@@ -0,0 +1,190 @@
+from qiskit.circuit import QuantumCircuit, ClassicalRegister
+from qiskit.quantum_info import PauliList
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Union
+import numpy as np
+
+# Parity of each byte
+_PARITY=np.array([bin(i).count("1")&1 for i in range(256)],dtype=np.uint8)
+
+# Code of each Pauli on a qubit: 0 I, 1 Z, 2 X, 3 Y
+_LETTERS="IZXY"
+
+
+def _codes(paulis: PauliList) -> np.ndarray:
+    return paulis.z.astype(np.uint8)|(paulis.x.astype(np.uint8)<<1)
+
+
+def group_paulis(paulis: PauliList, qubit_wise: bool=True) -> List[np.ndarray]:
+    """
+    Groups the Pauli terms in sets of commuting terms, with a greedy colouring of the graph of the terms that do not commute.
+
+    The terms are visited from the largest to the smallest number of non-identity qubits and each one is added to the first group
+    where it commutes with all the terms. For qubit-wise commuting groups, each group keeps the Pauli of each of its qubits, so a term
+    is checked against all the groups at once with a vectorized comparison. For general commuting groups, the symplectic products of
+    the term with all the terms already grouped are computed at once.
+
+    Args:
+        paulis (PauliList): the Pauli terms, without phases.
+        qubit_wise (bool): if the terms of each group must commute on each qubit (they can be measured at once with one-qubit rotations)
+            or only as operators. Default True
+
+    Returns:
+        list: the indices of the terms of each group, in the order of the groups.
+    """
+    m=len(paulis)
+    if m==0:
+        return []
+    codes=_codes(paulis)
+    weights=(codes!=0).sum(axis=1)
+    order=np.argsort(-weights,kind="stable")
+    colors=np.full(m,-1,dtype=np.int64)
+    if qubit_wise:
+        # The Pauli of each qubit in each group, 0 if no term of the group acts on it
+        bases=np.zeros((m,paulis.num_qubits),dtype=np.uint8)
+        count=0
+        for v in order:
+            code=codes[v]
+            fits=((bases[:count]==0)|(code==0)|(bases[:count]==code)).all(axis=1)
+            g=int(np.argmax(fits)) if fits.any() else count
+            if g==count:
+                count+=1
+            bases[g]|=code
+            colors[v]=g
+    else:
+        x=paulis.x.astype(np.uint8)
+        z=paulis.z.astype(np.uint8)
+        count=0
+        for k,v in enumerate(order):
+            placed=order[:k]
+            anticommute=((x[placed]@z[v]+z[placed]@x[v])&1).astype(bool)
+            blocked=np.zeros(count+1,dtype=bool)
+            blocked[colors[placed][anticommute]]=True
+            g=int(np.argmin(blocked))
+            if g==count:
+                count+=1
+            colors[v]=g
+    return [np.flatnonzero(colors==g) for g in range(count)]
+
+
+@dataclass
+class MeasurementGroup:
+    """
+    A set of qubit-wise commuting Pauli terms measured with the same circuit, returned by :func:`measurement_groups`.
+    """
+    indices: np.ndarray
+    """The indices of the terms in the list given to :func:`measurement_groups`."""
+    paulis: PauliList
+    """The terms of the group."""
+    qubits: Tuple[int,...]
+    """The measured qubits. The qubit ``qubits[k]`` is measured in the classical bit *k* of the register of the group."""
+    basis: str
+    """The Pauli measured on each qubit of :attr:`qubits`, ``X``, ``Y`` or ``Z``."""
+    masks: np.ndarray
+    """The bit-packed (little-endian) mask of the bits of the register of the group of each term, with shape (terms, bytes)."""
+
+    def measurement_circuit(self, circuit: QuantumCircuit, name: str="pauli") -> QuantumCircuit:
+        """
+        Returns a copy of a circuit that measures the terms of the group.
+
+        The basis of each qubit is changed with native gates (``rz(pi/2) sx rz(pi/2)`` for X and ``sx`` for Y) and the qubits are
+        measured in a new classical register, so a circuit already transpiled for the backend does not need to be transpiled again.
+
+        Args:
+            circuit (QuantumCircuit): the circuit, with its qubits as the qubits of the terms.
+            name (str): the name of the new classical register. Default "pauli"
+
+        Returns:
+            QuantumCircuit: the copy of the circuit with the measurements.
+        """
+        measured=circuit.copy()
+        creg=ClassicalRegister(len(self.qubits),name=name)
+        measured.add_register(creg)
+        for q,p,c in zip(self.qubits,self.basis,creg):
+            if p=="X":
+                measured.rz(np.pi/2,q)
+                measured.sx(q)
+                measured.rz(np.pi/2,q)
+            elif p=="Y":
+                measured.sx(q)
+        measured.measure(list(self.qubits),list(creg))
+        return measured
+
+    def _samples(self, samples: Union[np.ndarray,Dict[str,int]]):
+        if not isinstance(samples,dict):
+            return np.asarray(samples,dtype=np.uint8),None
+        nbytes=self.masks.shape[1]
+        outcomes=[int(k,0) if k.startswith("0x") else int(k.replace(" ",""),2) for k in samples]
+        packed=np.frombuffer(b"".join(o.to_bytes(nbytes,"little") for o in outcomes),dtype=np.uint8).reshape(len(outcomes),nbytes)
+        return packed,np.array(list(samples.values()),dtype=float)
+
+    def expectation_values(self, samples: Union[np.ndarray,Dict[str,int]]) -> Tuple[np.ndarray,np.ndarray]:
+        """
+        Computes the expectation value of each term of the group from the shared shots, with the parity of the bits of each term
+        evaluated for all the shots and terms at once.
+
+        Args:
+            samples (numpy.ndarray or dict): the bit-packed (little-endian) shots of the register of the group with shape (shots, bytes),
+                as :py:class:`qmiotools.integrations.qiskitqmio.ShotMemory`, or its counts.
+
+        Returns:
+            tuple: the expectation value of each term and the covariance matrix of the terms for one shot. The variance of a linear
+            combination of the terms with coefficients c estimated with s shots is c^T C c / s.
+        """
+        packed,weights=self._samples(samples)
+        nbytes=self.masks.shape[1]
+        if packed.shape[1]>nbytes:
+            packed=packed[:,:nbytes]
+        parities=_PARITY[np.bitwise_xor.reduce(packed[:,None,:]&self.masks[None,:,:],axis=2)]
+        signs=1.0-2.0*parities
+        if weights is None:
+            weights=np.ones(signs.shape[0])
+        weights=weights/weights.sum()
+        evs=weights@signs
+        covariance=(signs*weights[:,None]).T@signs-np.outer(evs,evs)
+        return evs,covariance
+
+
+def measurement_groups(paulis: Union[PauliList,List[str]]) -> List[MeasurementGroup]:
+    """
+    Groups Pauli terms in qubit-wise commuting sets with :func:`group_paulis` and returns how to measure each set.
+
+    Only the qubit-wise commuting sets are returned: the general commuting sets need entangling gates to be measured, which would have
+    to be routed on the couplers of the backend, so the circuit should be transpiled again.
+
+    Args:
+        paulis (PauliList or list): the Pauli terms or their labels.
+
+    Returns:
+        list: the :class:`MeasurementGroup` of each set.
+
+    **Example**::
+
+        from qiskit.quantum_info import SparsePauliOp
+        from qmiotools.integrations.qiskitqmio import QmioBackend, measurement_groups
+
+        backend=QmioBackend()
+        isa=backend.get_pass_manager(2).run(ansatz)
+        hamiltonian=hamiltonian.apply_layout(isa.layout)
+        groups=measurement_groups(hamiltonian.paulis)
+        circuits=[group.measurement_circuit(isa) for group in groups]
+        result=backend.run(circuits, shots=4000).result()
+        energy=0
+        for k,group in enumerate(groups):
+            evs,_=group.expectation_values(result.get_counts(k))
+            energy+=hamiltonian.coeffs[group.indices].real@evs
+    """
+    paulis=PauliList(paulis)
+    # The phases are dropped in a new list, so the list given is not modified
+    paulis=PauliList.from_symplectic(paulis.z,paulis.x)
+    codes=_codes(paulis)
+    groups=[]
+    for indices in group_paulis(paulis,qubit_wise=True):
+        support=np.bitwise_or.reduce(codes[indices],axis=0)
+        qubits=np.flatnonzero(support)
+        masks=np.packbits(codes[indices][:,qubits]!=0,axis=1,bitorder="little").reshape(len(indices),-1)
+        if masks.shape[1]==0:
+            masks=np.zeros((len(indices),1),dtype=np.uint8)
+        groups.append(MeasurementGroup(indices,paulis[indices],tuple(int(q) for q in qubits),"".join(_LETTERS[c] for c in support[qubits]),masks))
+    return groups
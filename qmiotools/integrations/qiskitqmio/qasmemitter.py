@@ -0,0 +1,338 @@
+from qiskit.circuit import QuantumCircuit, Barrier, Delay, Measure, Parameter, ParameterExpression
+from qiskit.circuit.tools import pi_check
+
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence
+import numpy as np
+import re
+
+
+STANDARD_GATES=frozenset(["sx","x","rz","ecr"])
+NATIVE_OPERATIONS={"measure":Measure,"delay":Delay,"barrier":Barrier}
+
+QASM2_HEADER='OPENQASM 2.0;include "qelib1.inc";'
+QASM2_ECR="gate ecr q0, q1 {};"
+
+# Largest numerator and denominator of the fractions of pi written by pi_check
+MAX_FRAC=16
+CHECK_TOLERANCE=1e-6
+# Tolerances of pi_check used by qasm3.dumps and qasm2.dumps
+QASM3_EPS=1e-9
+QASM2_EPS=1e-12
+
+# Names that the exporters of Qiskit would escape, so the registers with them are left to the generic path
+KEYWORDS=frozenset(["angle","array","barrier","bit","bool","box","break","cal","complex","const","continue","cos","creg","ctrl","def",
+                    "defcal","defcalgrammar","delay","duration","durationof","ecr","else","end","euler","exp","extern","float","for","gate",
+                    "gphase","if","im","in","include","input","int","inv","let","ln","measure","mutable","negctrl","opaque","output","pi",
+                    "pow","qreg","qubit","reset","return","rz","sin","sizeof","sqrt","stretch","switch","sx","tan","tau","u","uint","void",
+                    "while","x"])
+
+_IDENTIFIER=re.compile("[a-z][a-z0-9_]*")
+
+MAX_CACHED_FUNCTIONS=1024
+
+_functions=OrderedDict()
+
+
+def _valid_name(name: str) -> bool:
+    return _IDENTIFIER.fullmatch(name) is not None and name not in KEYWORDS
+
+
+def _conditioned(instruction) -> bool:
+    # The condition is read from the CircuitInstruction, which does not warn as the deprecated Instruction.condition, and it does not
+    # exist in the versions of Qiskit without conditions
+    return getattr(instruction,"condition",None) is not None
+
+
+def _native_operation(instruction, allow_delay: bool, allow_parameters: bool=False) -> bool:
+    if _conditioned(instruction):
+        return False
+    if instruction.is_standard_gate():
+        if instruction.name not in STANDARD_GATES:
+            return False
+        return not instruction.is_parameterized() or (allow_parameters and instruction.name=="rz")
+    base=NATIVE_OPERATIONS.get(instruction.name)
+    if base is None or instruction.operation.base_class is not base:
+        return False
+    return allow_delay or base is not Delay
+
+
+def _format_angles(values: list, eps: float) -> dict:
+    """
+        Returns the string of each angle, the same as :py:func:`qiskit.circuit.tools.pi_check` with output "qasm". Only the angles
+        close to a multiple, a fraction or a power of pi (with a tolerance much larger than eps) are checked one by one, the rest are
+        written as floats with decimal point.
+    """
+    values=list(set(values))
+    if not values:
+        return {}
+    x=np.abs(np.array(values,dtype=float))
+    d=np.arange(1,MAX_FRAC+1)
+    with np.errstate(divide="ignore",invalid="ignore"):
+        scaled=np.concatenate((x[:,None]*d/np.pi,x[:,None]*d*np.pi,(np.pi/x)[:,None]),axis=1)
+        near=(np.abs(scaled-np.round(scaled))<CHECK_TOLERANCE).any(axis=1)
+        near|=(np.abs(x[:,None]-np.pi**np.arange(2,5))<CHECK_TOLERANCE).any(axis=1)
+    check=near|(x<CHECK_TOLERANCE)|(x>=MAX_FRAC*np.pi-CHECK_TOLERANCE)|~np.isfinite(x)
+    return {v:pi_check(v,output="qasm",eps=eps) if c else format(float(v),"#") for v,c in zip(values,check.tolist())}
+
+
+def _clbit_labels(circuit: QuantumCircuit, bit_labels: dict) -> Optional[list]:
+    """
+        Adds the labels of the classical bits, returning the declared registers, or None if there are loose or shared bits.
+    """
+    if any(len(circuit.find_bit(b).registers)!=1 for b in circuit.clbits):
+        return None
+    for register in circuit.cregs:
+        if not _valid_name(register.name):
+            return None
+        for i,bit in enumerate(register):
+            bit_labels[bit]="%s[%d]"%(register.name,i)
+    return circuit.cregs
+
+
+def _emit_qasm3(circuit: QuantumCircuit, qubit_map: Sequence[int], allow_parameters: bool):
+    """
+        Returns the statements of the OpenQASM 3.0 program and the positions of the ``rz`` statements, stored as (angle, qubits) to be
+        formatted later, or None if the circuit can not be written by the emitter.
+    """
+    if circuit.layout is None or circuit.num_qubits>len(qubit_map) or circuit.num_vars>0:
+        return None
+    bit_labels={q:"$%d"%qubit_map[i] for i,q in enumerate(circuit.qubits)}
+    cregs=_clbit_labels(circuit,bit_labels)
+    if cregs is None:
+        return None
+
+    out=["OPENQASM 3.0;"]
+    out.extend("bit[%d] %s;"%(r.size,r.name) for r in cregs)
+    pending=[]
+    for instruction in circuit.data:
+        if not _native_operation(instruction,True,allow_parameters):
+            return None
+        name=instruction.name
+        qubits=", ".join([bit_labels[q] for q in instruction.qubits])
+        if name=="measure":
+            out.append("%s = measure %s;"%(bit_labels[instruction.clbits[0]],qubits))
+        elif name=="delay":
+            operation=instruction.operation
+            if operation.unit=="ps":
+                out.append("delay[%sns] %s;"%(operation.duration/1000,qubits))
+            else:
+                out.append("delay[%s%s] %s;"%(operation.duration,operation.unit,qubits))
+        elif name=="rz":
+            pending.append(len(out))
+            out.append((instruction.params[0],qubits))
+        else:
+            out.append("%s %s;"%(name,qubits))
+    return out,pending
+
+
+def _emit_qasm2(circuit: QuantumCircuit, allow_parameters: bool):
+    """
+        Returns the statements of the OpenQASM 2.0 program and the positions of the ``rz`` statements, stored as (angle, qubits) to be
+        formatted later, or None if the circuit can not be written by the emitter.
+    """
+    if circuit.num_vars>0 or any(len(circuit.find_bit(q).registers)!=1 for q in circuit.qubits):
+        return None
+    bit_labels={}
+    for register in circuit.qregs:
+        if not _valid_name(register.name):
+            return None
+        for i,bit in enumerate(register):
+            bit_labels[bit]="%s[%d]"%(register.name,i)
+    cregs=_clbit_labels(circuit,bit_labels)
+    if cregs is None or len({r.name for r in circuit.qregs}|{r.name for r in cregs})<len(circuit.qregs)+len(cregs):
+        return None
+
+    out=[]
+    pending=[]
+    ecr=False
+    for instruction in circuit.data:
+        if not _native_operation(instruction,False,allow_parameters):
+            return None
+        name=instruction.name
+        qubits=",".join([bit_labels[q] for q in instruction.qubits])
+        if name=="measure":
+            out.append("measure %s -> %s;"%(qubits,bit_labels[instruction.clbits[0]]))
+        elif name=="barrier":
+            if qubits:
+                out.append("barrier %s;"%qubits)
+        elif name=="rz":
+            pending.append(len(out))
+            out.append((instruction.params[0],qubits))
+        else:
+            ecr=ecr or name=="ecr"
+            out.append("%s %s;"%(name,qubits))
+
+    header=[QASM2_HEADER]
+    if ecr:
+        header.append(QASM2_ECR)
+    header.extend("qreg %s[%d];"%(r.name,r.size) for r in circuit.qregs)
+    header.extend("creg %s[%d];"%(r.name,r.size) for r in cregs)
+    return header+out,[i+len(header) for i in pending]
+
+
+def _join(out: list, pending: List[int], eps: float) -> str:
+    formatted=_format_angles([out[i][0] for i in pending],eps)
+    for i in pending:
+        angle,qubits=out[i]
+        out[i]="rz(%s) %s;"%(formatted[angle],qubits)
+    return "".join(out)
+
+
+def dumps_qasm3(circuit: QuantumCircuit, qubit_map: Sequence[int]) -> Optional[str]:
+    """
+    Returns the minified OpenQASM 3.0 program of a circuit in the native basis of Qmio (``sx``, ``x``, ``rz``, ``ecr``, ``measure``,
+    ``delay`` and ``barrier``) with a layout, writing the physical qubit ``i`` as ``$qubit_map[i]``.
+
+    The program is written in a single pass over the instructions and is the same as the output of :py:func:`qiskit.qasm3.dumps`
+    without includes and with the native gates as basis gates, without new lines and with the physical qubits mapped.
+
+    Args:
+        circuit (QuantumCircuit): the circuit.
+        qubit_map (list): the hardware qubit of each physical qubit of the circuit.
+
+    Returns:
+        str: the program, or None if the circuit has no layout, other instructions, unbound parameters or registers that need to be
+        escaped, so it must be converted with :py:func:`qiskit.qasm3.dumps`.
+    """
+    emitted=_emit_qasm3(circuit,qubit_map,False)
+    if emitted is None:
+        return None
+    return _join(*emitted,QASM3_EPS)
+
+
+def dumps_qasm2(circuit: QuantumCircuit) -> Optional[str]:
+    """
+    Returns the minified OpenQASM 2.0 program of a circuit in the native basis of Qmio (``sx``, ``x``, ``rz``, ``ecr``, ``measure`` and
+    ``barrier``), with ``ecr`` declared as an opaque gate of the QPU.
+
+    The program is written in a single pass over the instructions and is the same as the output of :py:func:`qiskit.qasm2.dumps`
+    without new lines and with the definition of ``ecr`` replaced by an empty one.
+
+    Args:
+        circuit (QuantumCircuit): the circuit.
+
+    Returns:
+        str: the program, or None if the circuit has other instructions or registers that need to be escaped, so it must be converted
+        with :py:func:`qiskit.qasm2.dumps`.
+    """
+    emitted=_emit_qasm2(circuit,False)
+    if emitted is None:
+        return None
+    return _join(*emitted,QASM2_EPS)
+
+
+def _compile_angle(expression: ParameterExpression, columns: dict) -> Callable[[np.ndarray],np.ndarray]:
+    """
+        Returns a function that evaluates the expression for an array of parameter values, with one row per binding and the
+        parameters in the columns given by ``columns``.
+    """
+    if isinstance(expression,Parameter):
+        j=columns[expression]
+        return lambda values: values[:,j]
+    # The compiled functions are shared by the templates of the circuits with the same expressions
+    if expression in _functions:
+        _functions.move_to_end(expression)
+        parameters,function=_functions[expression]
+    else:
+        parameters=list(expression.parameters)
+        try:
+            import symengine
+            function=symengine.Lambdify([expression._parameter_symbols[p] for p in parameters],[expression._symbol_expr])
+        except Exception:
+            function=None
+        _functions[expression]=(parameters,function)
+        if len(_functions)>MAX_CACHED_FUNCTIONS:
+            _functions.popitem(last=False)
+    cols=[columns[p] for p in parameters]
+    if function is not None:
+        return lambda values: np.asarray(function(values[:,cols]),dtype=float).reshape(values.shape[0])
+    return lambda values: np.array([float(expression.bind(dict(zip(parameters,row)))) for row in values[:,cols].tolist()])
+
+
+class QasmTemplate:
+    """
+    Program of a parametrized circuit in the native basis of Qmio, exported once and bound to many parameter values.
+
+    The statements without parameters are written when the template is built, and the angles of the ``rz`` gates with parameters are
+    left as slots. :meth:`bind` evaluates the angle of each slot for all the bindings at once and joins the statements, so the
+    programs are the same as exporting each bound circuit with :func:`dumps_qasm3` or :func:`dumps_qasm2`. Build it with
+    :func:`build_template`.
+    """
+
+    def __init__(self, out: list, pending: List[int], eps: float, parameters: Sequence[Parameter]):
+        self._eps=eps
+        self._parameters=list(parameters)
+        columns={p:j for j,p in enumerate(self._parameters)}
+        formatted=_format_angles([out[i][0] for i in pending if not isinstance(out[i][0],ParameterExpression)],eps)
+        expressions={}
+        self._segments=[]
+        self._slots=[]
+        current=[]
+        for item in out:
+            if not isinstance(item,tuple):
+                current.append(item)
+                continue
+            angle,qubits=item
+            if not isinstance(angle,ParameterExpression):
+                current.append("rz(%s) %s;"%(formatted[angle],qubits))
+                continue
+            current.append("rz(")
+            self._segments.append("".join(current))
+            self._slots.append(expressions.setdefault(angle,len(expressions)))
+            current=[") %s;"%qubits]
+        self._segments.append("".join(current))
+        self._functions=[_compile_angle(e,columns) for e in expressions]
+
+    @property
+    def parameters(self) -> List[Parameter]:
+        """
+            The parameters of the circuit, in the order of the columns of the values given to :meth:`bind`.
+        """
+        return self._parameters
+
+    def bind(self, values: np.ndarray) -> List[str]:
+        """
+        Returns the program for each binding of the parameters.
+
+        Args:
+            values (numpy.ndarray): the values of the parameters, with shape (bindings, parameters) and the parameters in the order of :attr:`parameters`.
+
+        Returns:
+            list: the programs.
+        """
+        values=np.atleast_2d(np.asarray(values,dtype=float))
+        if not self._functions:
+            return [self._segments[0]]*values.shape[0]
+        angles=np.stack([f(values) for f in self._functions],axis=1).tolist()
+        formatted=_format_angles([a for row in angles for a in row],self._eps)
+        segments=self._segments
+        slots=self._slots
+        parts=[None]*(2*len(slots)+1)
+        parts[0::2]=segments
+        programs=[]
+        for row in angles:
+            parts[1::2]=[formatted[row[s]] for s in slots]
+            programs.append("".join(parts))
+        return programs
+
+
+def build_template(circuit: QuantumCircuit, qubit_map: Sequence[int]=None, qasm3: bool=True) -> Optional[QasmTemplate]:
+    """
+    Builds the :class:`QasmTemplate` of a circuit in the native basis of Qmio, whose ``rz`` gates can have parameters.
+
+    Args:
+        circuit (QuantumCircuit): the circuit.
+        qubit_map (list): the hardware qubit of each physical qubit, for OpenQASM 3.0.
+        qasm3 (bool): if the programs are OpenQASM 3.0 (as :func:`dumps_qasm3`) or 2.0 (as :func:`dumps_qasm2`). Default True
+
+    Returns:
+        QasmTemplate: the template, or None if the circuit can not be written by the emitter.
+    """
+    if qasm3:
+        emitted=_emit_qasm3(circuit,qubit_map,True)
+    else:
+        emitted=_emit_qasm2(circuit,True)
+    if emitted is None:
+        return None
+    return QasmTemplate(*emitted,QASM3_EPS if qasm3 else QASM2_EPS,circuit.parameters)
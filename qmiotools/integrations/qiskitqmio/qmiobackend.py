@@ -20,15 +20,19 @@ except:
     class ScheduleBlock():
         {}
 from qiskit.result.models import ExperimentResult, ExperimentResultData
-from qiskit.result import Result, Counts  
+from qiskit.result import Result, Counts, QuasiDistribution
 #Removed for integration with Qiskint 2.0
-#from qiskit.qobj import QobjExperimentHeader
+try:
+    from qiskit.qobj import QobjExperimentHeader
+except ImportError:
+    QobjExperimentHeader=None
 from qiskit import qasm2, qasm3, transpile
 #Removed for integration with Qiskint 2.0
 #from qiskit.qobj.utils import MeasLevel
 
 import numpy as np
 import math
+import os
 import uuid
 import atexit
 #import datetime
@@ -38,13 +42,19 @@ from typing import Union, List, Optional, Dict,  Any, TYPE_CHECKING, Union, cast
 
 import warnings
 import re
+import weakref
 
 from ...exceptions import QPUException, QmioException
-from ..utils import Calibrations 
+from ..utils import Calibrations, ReadoutMitigator, ResultCache, draw_coupling_map
 from ...version import VERSION
-from ...data import QBIT_MAP, QUBIT_POSITIONS
+from ...data import QBIT_MAP, QUBIT_POSITIONS, MAX_SHOTS_PER_STEP
 from .qmiojob import QmioJob
-from .flattencircuit import FlattenCircuit
+from .flattencircuit import FlattenCircuit, circuit_fingerprint
+from .shotmemory import ShotMemory
+from .jobjournal import JobJournal
+from .qmiopassmanager import get_pass_manager
+from .qasmemitter import dumps_qasm2, dumps_qasm3, build_template
+from .qmiovalidator import TargetValidator, Diagnostic
 
 
 
@@ -61,10 +71,137 @@ QBIT_MAP=[i for i in range(32)]
 import logging
 
 
-DEFAULT_OPTIONS=Options(shots=10000,memory=False,repetition_period=None,res_format="binary_count",output_qasm3=False)
+MAX_DIAGNOSTICS=10
+MAX_CACHED_TEMPLATES=256
+
+_templates=OrderedDict()
+
+DEFAULT_OPTIONS=Options(shots=10000,memory=False,repetition_period=None,res_format="binary_count",output_qasm3=False,parameter_binds=None,memory_dir=None,readout_mitigation=False,deduplicate=False,journal_dir=None,resume=None,result_cache=None,validate=False)
 FORMATS=["binary_count","raw","binary","squash_binary_result_arrays"]
 DT=0.5*1e-9 #0.5ns
 
+def _experiment_header(**kwargs):
+    """
+        Returns the header of an :py:class:`qiskit.result.models.ExperimentResult`: a dict since Qiskit 2.0 or a QobjExperimentHeader before.
+    """
+    if QobjExperimentHeader is None:
+        return kwargs
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=DeprecationWarning)
+        return QobjExperimentHeader(**kwargs)
+
+def _measured_qubits(c: QuantumCircuit) -> List[Optional[int]]:
+    """
+        Returns the physical qubit measured in each classical bit of the executed circuit (None for the classical bits that are not measured).
+        A compiled circuit is expanded to the qubits of the target, so the index of each qubit is already its physical qubit, also after the
+        routing. The virtual qubits of the circuit before the compilation are not the measured ones, so the circuit must be the compiled one.
+    """
+    qubits=[None]*c.num_clbits
+    for i in c.data:
+        if i.operation.name == "measure":
+            qubits[c.find_bit(i.clbits[0]).index]=c.find_bit(i.qubits[0]).index
+    return qubits
+
+def build_target(calibrations: Calibrations, logger: logging.Logger=None) -> Target:
+    """
+        Builds the :py:class:`qiskit.transpiler.Target` of Qmio from the calibrations: the qubit properties and the durations and errors of
+        the native instructions ``sx``, ``x``, ``rz``, ``ecr``, ``measure`` and ``delay``. It does not need a connection with the QPU.
+
+        Args:
+            calibrations (Calibrations): the calibrations of Qmio.
+            logger (logging.Logger): the logger for the debug messages. Default *None*, i.e., the logger of QmioBackend.
+    """
+    if logger is None:
+        logger=logging.getLogger("QmioBackend/%s"%VERSION)
+    properties=[]
+    qubits=calibrations.get_qubits()
+    
+    #
+    # Load Qubits Properties
+    #
+    
+    
+    keys=list(qubits.keys())
+    num_qubits=len(keys)
+    
+    j=0
+    for i in range(max(QBIT_MAP)+1):
+        if i in QBIT_MAP:
+            key=keys[j]
+            properties.append(QubitProperties(t1=qubits[key]["T1 (s)"],t2=qubits[key]["T2 (s)"],frequency=qubits[key]["Drive Frequency (Hz)"]))
+            j=j+1
+            logger.debug("Qubit:%s, T1=%.9f, T2=%.9f, Drive Freq:%f"%(key,qubits[key]["T1 (s)"],qubits[key]["T2 (s)"],qubits[key]["Drive Frequency (Hz)"]))
+        else:
+            properties.append(None)
+            
+    logger.info("Number of loaded qubits %d"%len(properties))
+    
+    
+    target = Target(description="qmio", num_qubits=len(properties), dt=DT, granularity=1, 
+                    min_length=1, pulse_alignment=1, acquire_alignment=1, 
+                    qubit_properties=properties, concurrent_measurements=None)
+    
+    
+    theta = Parameter('theta')
+    
+    errors=calibrations.get_1Q_errors()
+    durations=calibrations.get_1Q_durations()
+   
+    sx_inst=OrderedDict()
+    x_inst=OrderedDict()
+    for i in errors:
+        sx_inst[(QBIT_MAP[i[0]],)]=InstructionProperties(duration=durations[i], error=errors[i])
+        logger.debug("Added SX[%d]- Duration %.10fs - error %f"%(QBIT_MAP[i[0]],durations[i],errors[i]))
+    for i in errors:
+        x_inst[(QBIT_MAP[i[0]],)]=InstructionProperties(duration=durations[i]*2, error=errors[i])
+        logger.debug("Added X[%d]- Duration %.10fs - error %f"%(QBIT_MAP[i[0]],durations[i]*2,errors[i]))
+    
+    target.add_instruction(SXGate(), sx_inst)
+    target.add_instruction(XGate(), x_inst)
+    
+    rz_inst=OrderedDict()
+    for i in durations:
+        rz_inst[(QBIT_MAP[i[0]],)]=InstructionProperties(duration=0.0)
+        logger.debug("Added rz[%d]- Duration %.10fs - error %f"%(QBIT_MAP[i[0]],0.0,0.0))
+            
+    target.add_instruction(RZGate(theta), rz_inst)
+    
+    #q2_inst=calibrations.get_2Q_errors()
+    #target.add_instruction(ECRGate(), q2_inst)   
+    errors=calibrations.get_2Q_errors()
+    durations=calibrations.get_2Q_durations()
+    
+    #logger.debug(durations)
+    
+    ecr_inst=OrderedDict()
+    for i in errors:
+        logger.debug("Added ecr_inst[(%d,%d) - duration %.10fs - error %f]"%(QBIT_MAP[i[0]],QBIT_MAP[i[1]],durations[i],errors[i]))
+        ecr_inst[(QBIT_MAP[i[0]],QBIT_MAP[i[1]])]=InstructionProperties(duration=durations[i], error=errors[i])
+        
+    
+    target.add_instruction(ECRGate(), ecr_inst)
+    #target.add_instruction(RZXGate(math.pi/4), ecr_inst, name="rzx(pi/4)")
+    
+    measures=OrderedDict()
+
+    errors=calibrations.get_measuring_errors()
+    durations=calibrations.get_measuring_durations()
+
+    #for i in qubits:
+    j=0
+    for i in errors:
+        measures[(QBIT_MAP[i[0]],)]=InstructionProperties(duration=durations[i], error=errors[i])
+        logger.debug("measures[%d] - duration %.10fs - error %f"%(QBIT_MAP[i[0]],durations[i],errors[i]))
+        
+    target.add_instruction(Measure(),measures)
+    
+    delays=OrderedDict()
+    for i in qubits:
+        delays[(QBIT_MAP[int(i[2:-1])],)]=None
+    
+    target.add_instruction(Delay(Parameter("t")),delays)
+    return target
+
 class QmioBackend(BackendV2):
     """
     Backend to execute Jobs in Qmio QPU.
@@ -116,6 +253,9 @@ class QmioBackend(BackendV2):
 
         #Transpile the circuit using the optimization_level equal to 2
         c=transpile(c,backend,optimization_level=2)
+
+        #or reusing the pass manager of the backend, faster for many circuits
+        c=backend.get_pass_manager(2).run(c)
    
         #Execute the circuit with 1000 shots. Must be executed from a node with a QPU.
         job=backend.run(c,shots=1000)
@@ -139,6 +279,9 @@ class QmioBackend(BackendV2):
         self._QPUBackend=None
         self._calibration_file=None
         self._exporter=None
+        self._mitigator=None
+        self._calibration_hash=None
+        self._validator=None
         self._reservation_name=reservation_name
         self._tunnel_time_limit=tunnel_time_limit
         #
@@ -178,95 +321,8 @@ class QmioBackend(BackendV2):
         
         calibrations=Calibrations.import_last_calibration(calibration_file)
         self._calibration_file=calibrations.get_filename()
-        properties=[]
-        qubits=calibrations.get_qubits()
-        
-        #
-        # Load Qubits Properties
-        #
-        
-        
-        keys=list(qubits.keys())
-        num_qubits=len(keys)
-        
-        j=0
-        for i in range(max(QBIT_MAP)+1):
-            if i in QBIT_MAP:
-                key=keys[j]
-                properties.append(QubitProperties(t1=qubits[key]["T1 (s)"],t2=qubits[key]["T2 (s)"],frequency=qubits[key]["Drive Frequency (Hz)"]))
-                j=j+1
-                self._logger.debug("Qubit:%s, T1=%.9f, T2=%.9f, Drive Freq:%f"%(key,qubits[key]["T1 (s)"],qubits[key]["T2 (s)"],qubits[key]["Drive Frequency (Hz)"]))
-            else:
-                properties.append(None)
-                
-        self._logger.info("Number of loaded qubits %d"%len(properties))
-        
-        
-        target = Target(description="qmio", num_qubits=len(properties), dt=DT, granularity=1, 
-                        min_length=1, pulse_alignment=1, acquire_alignment=1, 
-                        qubit_properties=properties, concurrent_measurements=None)
-        
-        
-        theta = Parameter('theta')
-        
-        errors=calibrations.get_1Q_errors()
-        durations=calibrations.get_1Q_durations()
-       
-        sx_inst=OrderedDict()
-        x_inst=OrderedDict()
-        for i in errors:
-            sx_inst[(QBIT_MAP[i[0]],)]=InstructionProperties(duration=durations[i], error=errors[i])
-            self._logger.debug("Added SX[%d]- Duration %.10fs - error %f"%(QBIT_MAP[i[0]],durations[i],errors[i]))
-        for i in errors:
-            x_inst[(QBIT_MAP[i[0]],)]=InstructionProperties(duration=durations[i]*2, error=errors[i])
-            self._logger.debug("Added X[%d]- Duration %.10fs - error %f"%(QBIT_MAP[i[0]],durations[i]*2,errors[i]))
-        
-        target.add_instruction(SXGate(), sx_inst)
-        target.add_instruction(XGate(), x_inst)
-        
-        rz_inst=OrderedDict()
-        for i in durations:
-            rz_inst[(QBIT_MAP[i[0]],)]=InstructionProperties(duration=0.0)
-            self._logger.debug("Added rz[%d]- Duration %.10fs - error %f"%(QBIT_MAP[i[0]],0.0,0.0))
-                
-        target.add_instruction(RZGate(theta), rz_inst)
-        
-        #q2_inst=calibrations.get_2Q_errors()
-        #target.add_instruction(ECRGate(), q2_inst)   
-        errors=calibrations.get_2Q_errors()
-        durations=calibrations.get_2Q_durations()
-        
-        #self._logger.debug(durations)
-        
-        ecr_inst=OrderedDict()
-        for i in errors:
-            self._logger.debug("Added ecr_inst[(%d,%d) - duration %.10fs - error %f]"%(QBIT_MAP[i[0]],QBIT_MAP[i[1]],durations[i],errors[i]))
-            ecr_inst[(QBIT_MAP[i[0]],QBIT_MAP[i[1]])]=InstructionProperties(duration=durations[i], error=errors[i])
-            
-        
-        target.add_instruction(ECRGate(), ecr_inst)
-        #target.add_instruction(RZXGate(math.pi/4), ecr_inst, name="rzx(pi/4)")
-        
-        measures=OrderedDict()
-
-        errors=calibrations.get_measuring_errors()
-        durations=calibrations.get_measuring_durations()
-
-        #for i in qubits:
-        j=0
-        for i in errors:
-            measures[(QBIT_MAP[i[0]],)]=InstructionProperties(duration=durations[i], error=errors[i])
-            self._logger.debug("measures[%d] - duration %.10fs - error %f"%(QBIT_MAP[i[0]],durations[i],errors[i]))
-            
-        target.add_instruction(Measure(),measures)
-        
-        delays=OrderedDict()
-        for i in qubits:
-            delays[(QBIT_MAP[int(i[2:-1])],)]=None
-        
-        target.add_instruction(Delay(Parameter("t")),delays)
-                               
-        self._target = target
+        self._calibrations=calibrations
+        self._target = build_target(calibrations,self._logger)
         
         self._options = DEFAULT_OPTIONS
         self._logger.info("Default options %s"%DEFAULT_OPTIONS)
@@ -277,7 +333,7 @@ class QmioBackend(BackendV2):
         self._max_circuits=1000
         self._logger.info("MAX CIRCUITS %d"%self._max_circuits)
         
-        self._max_shots=self._options.get("shots")*10
+        self._max_shots=MAX_SHOTS_PER_STEP
         self._logger.info("MAX SHOTS PER STEP %d"%self._max_shots)
         
         self.max_shots=self._max_circuits*self._max_shots
@@ -303,6 +359,71 @@ class QmioBackend(BackendV2):
     def max_circuits(self):
         return self._max_circuits
     
+    @property
+    def readout_mitigator(self) -> ReadoutMitigator:
+        """
+            The :py:class:`qmiotools.integrations.utils.ReadoutMitigator` built from the readout fidelities of the loaded calibrations. 
+            It can be replaced by one built from an on-device calibration run.
+        """
+        if self._mitigator is None:
+            self._mitigator=ReadoutMitigator.from_calibrations(self._calibrations)
+        return self._mitigator
+    
+    @readout_mitigator.setter
+    def readout_mitigator(self, mitigator: ReadoutMitigator):
+        self._mitigator=mitigator
+    
+    def get_pass_manager(self, optimization_level: int=2, seed_transpiler: int=None, layout_method: str=None):
+        """
+            Returns the preset pass manager of Qmio for an optimization level. It is built once and reused, so it is faster than calling
+            :py:func:`qiskit.transpile` for each circuit. See :py:func:`qmiotools.integrations.qiskitqmio.qmiopassmanager.get_pass_manager`.
+
+            Args:
+                optimization_level (int): the optimization level, from 0 to 3. Default 2
+                seed_transpiler (int): the seed for the stochastic passes. Default *None*
+                layout_method (str): the layout stage plugin, for example "qmio". Default *None*, i.e., the Qiskit default.
+        """
+        return get_pass_manager(self._target,optimization_level,seed_transpiler=seed_transpiler,layout_method=layout_method)
+    
+    def draw_graph(self, qubit_metric: Optional[str]="readout", edge_metric: Optional[str]="ecr", output: str="svg", filename: str=None) -> Union[str,bytes]:
+        """
+            Draws the coupling map of the backend with heatmaps of its calibrations, with :py:func:`qmiotools.integrations.utils.draw_coupling_map`.
+
+            Args:
+                qubit_metric (str): the metric of the qubits, ``t1``, ``t2``, ``readout`` or ``sx``. Default "readout". *None* draws the qubits without colors.
+                edge_metric (str): the metric of the couplers, ``ecr``. Default "ecr". *None* draws the couplers without colors.
+                output (str): the format, ``svg`` or ``png``. Default "svg"
+                filename (str): if not *None*, the file where the drawing is also written. Default *None*
+
+            Returns:
+                str or bytes: the SVG document or the PNG image.
+        """
+        return draw_coupling_map(self._calibrations,qubit_metric,edge_metric,output,filename)
+
+    def validate(self, run_input: Union[QuantumCircuit,List[QuantumCircuit]], output_qasm3: bool=False) -> List[Diagnostic]:
+        """
+            Checks the instructions of the circuits against the target before submitting them, with a
+            :py:class:`qmiotools.integrations.qiskitqmio.qmiovalidator.TargetValidator`: non-native operations, qubits outside of Qmio
+            and one or two-qubit operations on qubits or couplers (including their direction) not calibrated.
+
+            Args:
+                run_input (QuantumCircuit or list): a circuit or a list of them. Other inputs (schedules or QASM programs) are not checked.
+                output_qasm3 (bool): if the circuits will be converted to OpenQASM 3.0. In that case, the circuits without layout are not checked because they are transpiled before. Default False
+
+            Returns:
+                list: the :py:class:`qmiotools.integrations.qiskitqmio.qmiovalidator.Diagnostic` of each invalid instruction, with the index of its circuit in the input. Empty if all the circuits are valid.
+        """
+        if self._validator is None:
+            self._validator=TargetValidator(self._target)
+        if isinstance(run_input,QuantumCircuit):
+            run_input=[run_input]
+        diagnostics=[]
+        for i,c in enumerate(run_input):
+            if not isinstance(c,QuantumCircuit) or (output_qasm3 and c.layout is None):
+                continue
+            diagnostics.extend(self._validator.validate(c,i))
+        return diagnostics
+    
     def connect(self):
         """
             This method connect to the QPU. You do not need to connect, but you can if you want. If a connection exits, it is closed and the class is reconnected again
@@ -358,13 +479,16 @@ class QmioBackend(BackendV2):
     
     def _to_qasm3(self,c):
         self._logger.debug("Converting to OPENQASM 3.0")
+        qasm=dumps_qasm3(c,QBIT_MAP2[:self.num_qubits])
+        if qasm is not None:
+            return qasm
         basis_gates=self.operation_names.copy()
         basis_gates.remove('measure')
         basis_gates.remove('delay')
         qasm=qasm3.dumps(c, includes=[], basis_gates=basis_gates).replace("\n","")
         self._logger.debug("Obtainded QASM from circuit:%s"%qasm.replace("\n",""))
         if "qubit[" in qasm:
-            c=transpile(c,self,optimization_level=0)
+            c=self.get_pass_manager(0).run(c)
             qasm=qasm3.dumps(c, includes=[], basis_gates=basis_gates).replace("\n","")
         
         for i in range(self.num_qubits-1,-1,-1):
@@ -379,6 +503,9 @@ class QmioBackend(BackendV2):
             
     def _to_qasm2(self,c):
         self._logger.debug("Converting to OPENQASM 2.0")
+        qasm=dumps_qasm2(c)
+        if qasm is not None:
+            return qasm
         qasm=qasm2.dumps(c)
         self._logger.debug("Circuit to transform:\n%s"%qasm )
         qasm=re.sub("\\ngate rzx.*\\n","\\n",qasm)
@@ -393,7 +520,176 @@ class QmioBackend(BackendV2):
     def _to_openpulse(self,c):
         if self._exporter==None:
             self._exporter=OPExporter(logging_level=self._logger.level)
-        return self._exporter.dumps(c).replace("\n","")
+        return self._exporter.dumps(c, minify=True)
+    
+    def _to_openpulse_sweep(self,c,parameter_values):
+        if self._exporter==None:
+            self._exporter=OPExporter(logging_level=self._logger.level)
+        return self._exporter.dumps_sweep(c, parameter_values, minify=True)
+    
+    def _to_template(self, circuit: QuantumCircuit, output_qasm3: bool):
+        """
+            Returns the circuit to execute, after flattening the classical registers if needed, and its :py:class:`qmiotools.integrations.qiskitqmio.qasmemitter.QasmTemplate`,
+            or None if it can not be built. The last templates are cached, so running again the same circuit with other parameters does not export it again.
+        """
+        key=(id(circuit),output_qasm3,self._name)
+        fingerprint=circuit_fingerprint(circuit)
+        if key in _templates:
+            ref,cached_fingerprint,c,template=_templates[key]
+            if ref() is circuit and cached_fingerprint==fingerprint:
+                _templates.move_to_end(key)
+                return c,template
+
+        c=FlattenCircuit(circuit) if len(circuit.cregs)>1 else circuit
+        if output_qasm3:
+            template=build_template(c,QBIT_MAP2[:self.num_qubits],True)
+        else:
+            template=build_template(c,qasm3=False)
+
+        _templates[key]=(weakref.ref(circuit),fingerprint,c,template)
+        if len(_templates)>MAX_CACHED_TEMPLATES:
+            _templates.popitem(last=False)
+        return c,template
+
+    def _to_program(self, circuit, output_qasm3):
+        """
+            Converts one input of :meth:`run` to the program to submit. Returns the circuit to execute, after flattening the classical registers if needed, and the program.
+        """
+        if isinstance(circuit,QuantumCircuit):
+            if len(circuit.cregs)>1:
+                c=FlattenCircuit(circuit)
+            else:
+                c=circuit
+        else:
+            c=circuit
+
+        #print("Metadata",c.metadata)
+        if isinstance(c,QuantumCircuit):
+            try:
+                if output_qasm3:
+                    if c.layout is None and c.num_qubits>0:
+                        # OpenQASM 3.0 needs the physical qubits, so the circuit is compiled here and returned to read the measured qubits from it
+                        c=self.get_pass_manager(0).run(c)
+                    qasm=self._to_qasm3(c)
+                else:
+                    qasm=self._to_qasm2(c)
+            except:
+                try:
+                    qasm=self._to_openpulse(c)
+                except:
+                    raise QmioException("Error converting circuit: %s"%c.name)
+            #print(qasm)
+        elif isinstance(c,Schedule) or isinstance(c,ScheduleBlock):
+            qasm=self._to_openpulse(c)
+            
+        else:
+            qasm=c
+        return c, qasm
+    
+    def _execute_program(self, qasm, shots, memory, res_format, repetition_period, filename, journal=None, index=0):
+        """
+            Executes one program in the QPU, in chunks of at most the maximum number of shots per step. Returns the counts, the memory 
+            (a :class:`ShotMemory` or a :class:`numpy.ndarray` with the shots in the last axis) and the results of the last chunk.
+            If there is a journal, the chunks already stored for the program with this index are not executed again and the new ones are recorded.
+        """
+
+        # parche
+        #self._logger.info("Replacing SC gate by RX(pi/2) as a temporal fix")
+        #qasm=qasm.replace("SX ","rx(pi/2) ").replace("sx ","rx(pi/2) ")
+        #self._logger.debug("Final submitted circuit %s"%qasm)
+        
+        remain_shots=shots
+        ExpDict={}
+        ExpList=[]
+        ExpMemory=None
+        ExpArray=None
+        offset=0
+        self._logger.info("QASM to execute %s", qasm)
+        chunk=0
+        while (remain_shots > 0):
+            results=None
+            if journal is not None:
+                results=journal.get(index,chunk)
+            if results is not None:
+                self._logger.info("Chunk %d of program %d read from the journal"%(chunk,index))
+            else:
+                self._logger.info("Requesting SHOTS=%d"%min(self._max_shots,remain_shots))
+                if memory:
+                    _res_format="raw"
+                else:
+                    _res_format= res_format
+                if self._QPUBackend is None:
+                    self._logger.debug("Starting backend")
+                    self.connect()
+                results = self._QPUBackend.run(circuit=qasm, shots=min(self._max_shots,remain_shots),repetition_period=repetition_period,res_format=_res_format)
+
+                self._logger.debug("Results:%s", results)
+                if "Exception" in results:
+                    raise QPUException(results["Exception"])
+                if journal is not None:
+                    journal.record(index,chunk,results)
+            
+            try:
+                r=results["results"][list(results["results"].keys())[0]]
+            except:
+                if res_format == "raw":
+                    r=results["results"]
+                else:
+                    raise QPUException("QPU does not return results")
+            
+            if res_format== "binary_count":
+                if not memory:
+                    for k in r:
+                        key=hex(int(k[::-1],base=2))
+                        ExpDict[key]=ExpDict[key]+r[k] if key in ExpDict else r[k]
+                else:
+                    self._logger.debug("Output of type %s in memory register"%res_format)
+                    bits=np.atleast_2d(np.asarray(r))<0
+                    if ExpMemory is None:
+                        ExpMemory=ShotMemory(bits.shape[0],shots,filename)
+                    ExpMemory.append(bits.T)
+            else:
+                self._logger.debug("Output of type %s in memory register"%res_format)
+                data=np.asarray(r)
+                if ExpArray is None:
+                    dtype=object if data.dtype.kind in "USO" else data.dtype
+                    ExpArray=np.empty(data.shape[:-1]+(shots,),dtype=dtype)
+                ExpArray[...,offset:offset+data.shape[-1]]=data
+                offset+=data.shape[-1]
+                
+            remain_shots=remain_shots-self._max_shots
+            chunk+=1
+        
+        if ExpMemory is not None:
+            ExpDict=ExpMemory.get_counts()
+            ExpList=ExpMemory
+        elif ExpArray is not None:
+            ExpList=ExpArray[...,:offset]
+        return ExpDict,ExpList,results
+    
+    def _cached_execute_program(self, result_cache, qasm, shots, memory, res_format, repetition_period, filename, journal=None, index=0):
+        """
+            Calls :meth:`_execute_program` if the results of the program are not in the cache. Returns the output and if it was read from the cache.
+        """
+        if result_cache is None or filename is not None:
+            return self._execute_program(qasm,shots,memory,res_format,repetition_period,filename,journal,index),False
+        if self._calibration_hash is None:
+            self._calibration_hash=self._calibrations.get_hash()
+        key=ResultCache.key(self._name,qasm,shots,memory,res_format,repetition_period,self._calibration_hash)
+        output=result_cache.get(key)
+        if output is not None:
+            self._logger.info("Results of program %d read from the cache"%index)
+            ExpDict,ExpList,results=output
+            if isinstance(ExpList,dict):
+                ExpList=ShotMemory.from_packed(ExpList["num_bits"],ExpList["packed"])
+            return (ExpDict,ExpList,results),True
+        output=self._execute_program(qasm,shots,memory,res_format,repetition_period,filename,journal,index)
+        ExpDict,ExpList,results=output
+        # The cache stores JSON, so the memory is stored as its bit-packed array
+        if isinstance(ExpList,ShotMemory):
+            ExpList={"num_bits":ExpList.num_bits,"packed":ExpList.packed}
+        result_cache.put(key,(ExpDict,ExpList,results))
+        return output,False
     
     def run(self, run_input: Union[Union[QuantumCircuit,Schedule,ScheduleBlock, str],List[Union[QuantumCircuit,Schedule,str]]], **options) -> QmioJob:
         """Run on QMIO QPU. This method is Synchronous, so it will wait for the results from the QPU
@@ -414,8 +710,16 @@ class QmioBackend(BackendV2):
                 
                 * memory: if format is binary_counts (the defualt format), returns also all the sequence.
                 * repetition_period, slot of time between shot starts (default, **None**. Uses the default that it is calibrated)
-                * res_format, format for the output (default, 'binary_count'. You can get the possible formats with :meth:`formats`)
+                * res_format, format for the output (default, 'binary_count'. You can get the possible formats with :meth:`formats`). For formats other than 'binary_count', the data returned by the QPU for all the chunks of shots is accumulated in a :class:`numpy.ndarray` with the shots in the last axis, returned as the memory of the experiment
                 * output_qasm3, if convert the QuantumCircuit to OpenQASM 3.0 instead of OpenQASM 2.0 - default-)
+                * memory_dir, directory where the memory of each experiment is stored as a memory-mapped ``.npy`` file named ``<job id>_<experiment>.npy``, instead of in RAM (default, **None**). The files are not removed
+                * readout_mitigation, if True, the counts of each QuantumCircuit are mitigated with :attr:`readout_mitigator` and the quasi-probabilities are returned in the field ``quasi_dists`` of the experiment data, as a :class:`~qiskit.result.QuasiDistribution` (default, **False**)
+                * parameter_binds, a dictionary between the :class:`~qiskit.circuit.Parameter` of a :class:`~qiskit.pulse.Schedule` and a sequence of values, or a list of them (one per input). Each input is run once per point of the sweep, returning one experiment per point. A Schedule is exported only once and the values are substituted in the program (default, **None**)
+                * deduplicate, if True, the identical programs of the inputs are executed only once. For counts without memory, all the copies share the counts of one execution with the requested shots, so they are the same histogram and not independent samples: statistics that combine the copies (e.g. averaging them) are fully correlated and do not reduce the variance. Otherwise, one execution runs the shots of all the copies and they are split back in the original order, so each copy gets its own shots. The experiments of the copies have the index of the first one in the field ``duplicate_of`` of their metadata (default, **False**)
+                * journal_dir, directory of the journals of the jobs (default, **None**, without journal). The results of each chunk of shots are appended to the file ``<job id>.journal`` as soon as they are received, so an interrupted job can be resumed. See :class:`JobJournal`
+                * resume, id of an interrupted job to resume from its journal in journal_dir. The inputs and options must be the same, and only the chunks not completed are sent to the QPU (default, **None**)
+                * result_cache, a :class:`qmiotools.integrations.utils.ResultCache` (or True to use :meth:`ResultCache.default`) to reuse the results of the programs already executed with the same shots, memory, res_format, repetition_period and calibrations. The experiments read from the cache have the field ``cached`` equal to True in their metadata. It is not used with memory_dir (default, **None**)
+                * validate, if check the circuits with :meth:`validate` before submitting any of them, raising a QmioException with the invalid instructions (default, **False**)
                 
                 
         .. attention::
@@ -436,6 +740,14 @@ class QmioBackend(BackendV2):
             repetition_period=options.get("repetition_period",default=self._options.get("repetition_period"))
             res_format=options.get("res_format",default=self._options.get("res_format"))
             output_qasm3=options.get("output_qasm3",default=self._options.get("output_qasm3"))
+            parameter_binds=options.get("parameter_binds",default=self._options.get("parameter_binds"))
+            memory_dir=options.get("memory_dir",default=self._options.get("memory_dir"))
+            readout_mitigation=options.get("readout_mitigation",default=self._options.get("readout_mitigation"))
+            deduplicate=options.get("deduplicate",default=self._options.get("deduplicate"))
+            journal_dir=options.get("journal_dir",default=self._options.get("journal_dir"))
+            resume=options.get("resume",default=self._options.get("resume"))
+            result_cache=options.get("result_cache",default=self._options.get("result_cache"))
+            validate=options.get("validate",default=self._options.get("validate"))
         else:
             if "shots" in options:
                 shots=options["shots"]
@@ -462,6 +774,45 @@ class QmioBackend(BackendV2):
             else:
                 output_qasm3=self._options.get("output_qasm3")
             
+            if "parameter_binds" in options:
+                parameter_binds=options["parameter_binds"]
+            else:
+                parameter_binds=self._options.get("parameter_binds")
+
+            if "memory_dir" in options:
+                memory_dir=options["memory_dir"]
+            else:
+                memory_dir=self._options.get("memory_dir")
+
+            if "readout_mitigation" in options:
+                readout_mitigation=options["readout_mitigation"]
+            else:
+                readout_mitigation=self._options.get("readout_mitigation")
+
+            if "deduplicate" in options:
+                deduplicate=options["deduplicate"]
+            else:
+                deduplicate=self._options.get("deduplicate")
+
+            if "journal_dir" in options:
+                journal_dir=options["journal_dir"]
+            else:
+                journal_dir=self._options.get("journal_dir")
+
+            if "resume" in options:
+                resume=options["resume"]
+            else:
+                resume=self._options.get("resume")
+
+            if "result_cache" in options:
+                result_cache=options["result_cache"]
+            else:
+                result_cache=self._options.get("result_cache")
+
+            if "validate" in options:
+                validate=options["validate"]
+            else:
+                validate=self._options.get("validate")
 
         
         self._logger.info("Requested parameters: Shots %d - memory %s - Repetition_period %s - Res_format %s"%(shots, memory, str(repetition_period), res_format))
@@ -477,122 +828,105 @@ class QmioBackend(BackendV2):
         else:
             circuits=run_input
 
-        if shots*len(circuits) > self.max_shots:
+        if validate:
+            diagnostics=self.validate(circuits,output_qasm3)
+            if len(diagnostics)>0:
+                for d in diagnostics:
+                    self._logger.error(str(d))
+                raise QmioException("%d invalid instructions for Qmio:\n%s"%(len(diagnostics),"\n".join(str(d) for d in diagnostics[:MAX_DIAGNOSTICS])
+                                    +("\n..." if len(diagnostics)>MAX_DIAGNOSTICS else "")))
+
+        if parameter_binds is not None:
+            if isinstance(parameter_binds,dict):
+                parameter_binds=[parameter_binds]*len(circuits)
+            if len(parameter_binds)!=len(circuits):
+                raise QmioException("lengths of inputs (%d) and parameter_binds (%d) do not match"%(len(circuits),len(parameter_binds)))
+
+        programs=[]
+        for i,circuit in enumerate(circuits):
+            binds=parameter_binds[i] if parameter_binds is not None else None
+            if binds and (isinstance(circuit,Schedule) or isinstance(circuit,ScheduleBlock)):
+                try:
+                    sweep=self._to_openpulse_sweep(circuit,binds)
+                except ValueError as e:
+                    raise QmioException("Error binding parameters of %s: %s"%(circuit.name,e))
+                for j,qasm in enumerate(sweep):
+                    programs.append((circuit,circuit,qasm,{str(p):v[j] for p,v in binds.items()}))
+            elif binds and isinstance(circuit,QuantumCircuit):
+                n=len(next(iter(binds.values())))
+                c,template=self._to_template(circuit,output_qasm3)
+                columns=None
+                if template is not None:
+                    columns=[binds.get(p,binds.get(p.name)) for p in template.parameters]
+                if columns is not None and all(v is not None and len(v)==n for v in columns):
+                    # The circuit is exported once and each binding only formats its angles
+                    values=np.array(columns,dtype=float).reshape(len(columns),n).T
+                    for j,qasm in enumerate(template.bind(values)):
+                        programs.append((circuit,c,qasm,{str(p):v[j] for p,v in binds.items()}))
+                else:
+                    for j in range(n):
+                        point={p:v[j] for p,v in binds.items()}
+                        c,qasm=self._to_program(circuit.assign_parameters(point),output_qasm3)
+                        programs.append((circuit,c,qasm,{str(p):v for p,v in point.items()}))
+            else:
+                c,qasm=self._to_program(circuit,output_qasm3)
+                programs.append((circuit,c,qasm,None))
+
+        if shots*len(programs) > self.max_shots:
             raise QmioException("Total number of shots %d larger than capacity %d"%(shots,self.max_shots))
         
         #self._logger.debug("Starting QmioRuntimeService")
         #service = QmioRuntimeService()
         
-        if self._QPUBackend is None:
-            self._logger.debug("Starting backend")
-            self.connect()
-                          
-        
-        job_id=uuid.uuid4()
+        journal=None
+        if resume is not None:
+            if journal_dir is None:
+                raise QmioException("Option resume needs the option journal_dir")
+            job_id=resume
+            journal=JobJournal(journal_dir,job_id)
+            if journal.header is None:
+                raise QmioException("Journal of job %s not found in %s"%(job_id,journal_dir))
+            self._logger.info("Resuming job %s with %d completed chunks"%(job_id,len(journal)))
+        else:
+            job_id=uuid.uuid4()
+            if journal_dir is not None:
+                journal=JobJournal(journal_dir,job_id)
+        if result_cache is True:
+            result_cache=ResultCache.default()
+        if journal is not None:
+            journal.start([program[2] for program in programs],shots=shots,memory=memory,res_format=res_format,
+                          repetition_period=repetition_period,deduplicate=deduplicate,max_shots=self._max_shots)
                           
         self._logger.debug("Job id %s"%job_id)
                           
-        ExpResult=[]
-        
-        for circuit in circuits:
-
-            if isinstance(circuit,QuantumCircuit):
-                if len(circuit.cregs)>1:
-                    c=FlattenCircuit(circuit)
-                else:
-                    c=circuit
-            else:
-                c=circuit
-
-            #print("Metadata",c.metadata)
-            if isinstance(c,QuantumCircuit):
-                try:
-                    if output_qasm3:
-                        qasm=self._to_qasm3(c)
-                    else:
-                        qasm=self._to_qasm2(c)
-                except:
-                    try:
-                        qasm=self._to_openpulse(c)
-                    except:
-                        raise QmioException("Error converting circuit: %s"%c.name)
-                #print(qasm)
-            elif isinstance(c,Schedule) or isinstance(c,ScheduleBlock):
-                qasm=self._to_openpulse(c)
-                
-            else:
-                qasm=c
-
-            # parche
-            #self._logger.info("Replacing SC gate by RX(pi/2) as a temporal fix")
-            #qasm=qasm.replace("SX ","rx(pi/2) ").replace("sx ","rx(pi/2) ")
-            #self._logger.debug("Final submitted circuit %s"%qasm)
-            
-            remain_shots=shots
-            ExpDict={}
-            ExpList=[]
-            self._logger.info("QASM to execute %s"%qasm)
-            warning_raised = False
-            while (remain_shots > 0):
-                self._logger.info("Requesting SHOTS=%d"%min(self._max_shots,remain_shots))
-                if memory:
-                    _res_format="raw"
-                else:
-                    _res_format= res_format
-                results = self._QPUBackend.run(circuit=qasm, shots=min(self._max_shots,remain_shots),repetition_period=repetition_period,res_format=_res_format)
+        groups=OrderedDict()
+        for k,program in enumerate(programs):
+            groups.setdefault(program[2] if deduplicate else k,[]).append(k)
+        if len(groups)<len(programs):
+            self._logger.info("Running %d unique programs of %d"%(len(groups),len(programs)))
 
-                self._logger.debug("Results:%s"%results)
-                if "Exception" in results:
-                    raise QPUException(results["Exception"])
-                
-                try:
-                    r=results["results"][list(results["results"].keys())[0]]
-                except:
-                    if res_format == "raw":
-                        ExpList.append(results["results"])
-                    else:
-                        raise QPUException("QPU does not return results")
-                
-                if res_format== "binary_count":
-                    if not memory:
-                        for k in r:
-                            key=hex(int(k[::-1],base=2))
-                            ExpDict[key]=ExpDict[key]+r[k] if key in ExpDict else r[k]
-                    else:
-                        self._logger.debug("Output of type %s in memory register"%res_format)
-                        a=np.array(r)
-                        b=(a<0).astype(int).astype(str)
-                        for i in range(b.shape[1]):
-                            s=""
-                            for j in b[:,i][::-1]: s=s+j
-                            key=hex(int(s,base=2))
-                            ExpDict[key]=ExpDict[key]+1 if key in ExpDict else 1
-                            ExpList.append(key)
-                            #self._logger.debug("QmioException - Binary for the next version- ")
-                            #raise QmioException("Binary for the next version")
-                else:
-                    self._logger.debug("Output of type %s in memory register"%res_format)
-                    try:
-                        s=ExpList[0].copy()
-                        for k in len(s):
-                            s[k].append(r[k])
-                    except:
-                        s=r.copy()
-                    ExpList=s
-                    
-                    
-                remain_shots=remain_shots-self._max_shots
-            
-            
+        # Each experiment is built as soon as the execution of its program completes, so the outputs of the QPU are not all kept until the end
+        def _experiment(k, output, hit):
+            circuit,c,qasm,point=programs[k]
+            ExpDict,ExpList,results=output
             
             if isinstance(c,QuantumCircuit):
-                metadata=c.metadata
+                metadata=dict(c.metadata)
             else:
                 metadata={}
 
             if "execution_metrics" in results:
                 metadata["execution_metrics"]=results["execution_metrics"]
 
+            if point is not None:
+                metadata["parameter_values"]=point
+
+            if deduplicate and groups[qasm][0]!=k:
+                metadata["duplicate_of"]=groups[qasm][0]
+
+            if hit:
+                metadata["cached"]=True
+
             metadata["repetition_period"]=repetition_period
             metadata["res_format"]=res_format
 
@@ -640,46 +974,53 @@ class QmioBackend(BackendV2):
                 for c1 in circuit.qregs:
                     qreg_sizes.append([c1.name,c1.size])
                 n_qubits=len(circuit.qubits)
-            header ={'name': c.name, 'creg_sizes':creg_sizes, 'memory_slots':memory_slots, 'n_qubits':n_qubits,
-                           'qreg_sizes':qreg_sizes,'metadata':circuit.metadata}
+            header =_experiment_header(name=c.name, creg_sizes=creg_sizes, memory_slots=memory_slots, n_qubits=n_qubits,
+                           qreg_sizes=qreg_sizes, metadata=circuit.metadata)
             #header.update(c.metadata)
 
-            self._logger.debug("Retorno counts: %s"%ExpDict)
-            self._logger.debug("Returning memory: %s"%ExpList)
+            self._logger.debug("Retorno counts: %s", ExpDict)
+            self._logger.debug("Returning memory: %s", ExpList)
+            
+            extra={}
+            if readout_mitigation and len(ExpDict)>0:
+                if isinstance(c,QuantumCircuit):
+                    extra["quasi_dists"]=QuasiDistribution(self.readout_mitigator.quasi_probabilities(ExpDict,_measured_qubits(c)),shots=shots)
+                else:
+                    self._logger.warning("Readout mitigation is only available for QuantumCircuit. Skipping %s"%c.name)
             
-            dd={
-                'shots': shots,
-                'success': True,
-                'header': header,
-                }
-            if (res_format != "raw") and not memory:
-                dd['data']={
-                    'counts': ExpDict,
-                    'metadata': metadata,
-                }
+            if (res_format == "binary_count") and not memory:
+                data=ExperimentResultData(counts=ExpDict, metadata=metadata, **extra)
             else:
-                dd['data']={
-                    'counts': ExpDict,
-                    'memory': ExpList,
-                    'metadata': metadata,
-                }
-            ExpResult.append(dd)
-
-        result_dict = {
-            'backend_name': self._name,
-            'backend_version': self._version,
-            'qobj_id': None,
-            'job_id': job_id,
-            'success': True,
-            'results': ExpResult,
-            'date': datetime.now().isoformat(),
-
-        }
-        self._logger.debug("Final Results returned: %s"%result_dict)
-                          
-        results=Result.from_dict(result_dict)
+                data=ExperimentResultData(counts=ExpDict, memory=ExpList, metadata=metadata, **extra)
+            return ExperimentResult(shots=shots, success=True, data=data, header=header)
+
+        ExpResult=[None]*len(programs)
+        for indices in groups.values():
+            qasm=programs[indices[0]][2]
+            if len(indices)==1:
+                filename=None if memory_dir is None else os.path.join(memory_dir,"%s_%d.npy"%(job_id,indices[0]))
+                output,hit=self._cached_execute_program(result_cache,qasm,shots,memory,res_format,repetition_period,filename,journal,indices[0])
+                ExpResult[indices[0]]=_experiment(indices[0],output,hit)
+            elif res_format=="binary_count" and not memory:
+                (ExpDict,ExpList,results),hit=self._cached_execute_program(result_cache,qasm,shots,memory,res_format,repetition_period,None,journal,indices[0])
+                for k in indices:
+                    ExpResult[k]=_experiment(k,(dict(ExpDict),ExpList,results),hit)
+            else:
+                # The shots of all the copies are run together and split back in the original order
+                (ExpDict,ExpList,results),hit=self._cached_execute_program(result_cache,qasm,shots*len(indices),memory,res_format,repetition_period,None,journal,indices[0])
+                for j,k in enumerate(indices):
+                    if isinstance(ExpList,ShotMemory):
+                        filename=None if memory_dir is None else os.path.join(memory_dir,"%s_%d.npy"%(job_id,k))
+                        part=ExpList.slice(j*shots,(j+1)*shots,filename)
+                        ExpResult[k]=_experiment(k,(part.get_counts(),part,results),hit)
+                    else:
+                        ExpResult[k]=_experiment(k,(ExpDict,ExpList[...,j*shots:(j+1)*shots],results),hit)
+
+        results=Result(backend_name=self._name, backend_version=self._version, qobj_id=None, job_id=job_id,
+                       success=True, results=ExpResult, date=datetime.now().isoformat())
+        self._logger.debug("Final Results returned: %s", results)
 
-        job=QmioJob(backend=self,job_id=uuid.uuid4(), jobstatus=JobStatus.DONE, result=results)
+        job=QmioJob(backend=self,job_id=job_id, jobstatus=JobStatus.DONE, result=results)
        
         return job
     
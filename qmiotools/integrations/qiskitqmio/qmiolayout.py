@@ -0,0 +1,215 @@
+from qiskit.transpiler import Target, Layout, PassManager
+from qiskit.transpiler.basepasses import AnalysisPass
+from qiskit.transpiler.passes import SetLayout, DenseLayout
+from qiskit.transpiler.passmanager_config import PassManagerConfig
+from qiskit.transpiler.preset_passmanagers import common
+from qiskit.transpiler.preset_passmanagers.plugin import PassManagerStagePlugin
+from qiskit.passmanager.flow_controllers import ConditionalController
+from qiskit.dagcircuit import DAGCircuit
+
+import rustworkx as rx
+
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+import itertools
+import math
+import logging
+
+from ...version import VERSION
+
+logger=logging.getLogger("QmioLayout/%s"%VERSION)
+
+BEAM_WIDTH=32
+MAX_EMBEDDINGS=8
+MAX_CACHED_INDEXES=8
+
+_indexes=OrderedDict()
+
+
+def _cost(error) -> float:
+    if error is None:
+        return 0.0
+    return -math.log(max(1.0-error,1e-12))
+
+
+class SubgraphIndex:
+    """
+    Index of the best connected subgraphs of the coupling map of a :py:class:`qiskit.transpiler.Target`, scored with the errors of
+    its ``measure``, ``sx`` and ``ecr`` instructions (from the readout fidelities, ``Q1Gates`` and ``Q2Gates(RB)`` of the calibrations).
+
+    The cost of a set of qubits is the sum of :math:`-\\log(1-e)` of its qubits plus the cheapest edge that connects each new qubit
+    with the previous ones. The sets of each size are generated with a beam search and kept sorted by cost, so they are computed once
+    per calibration and reused by all the layout queries.
+
+    Args:
+        target (Target): the target of the backend.
+        beam_width (int): number of subgraphs kept for each size. Default 32
+    """
+
+    def __init__(self, target: Target, beam_width: int=BEAM_WIDTH):
+        self._beam_width=beam_width
+        self.num_qubits=target.num_qubits
+        self.node_cost=[0.0]*self.num_qubits
+        for name in ("measure","sx"):
+            if name in target.operation_names:
+                for qargs,props in target[name].items():
+                    if qargs is not None and props is not None:
+                        self.node_cost[qargs[0]]+=_cost(props.error)
+
+        self.edge_cost={}
+        if "ecr" in target.operation_names:
+            for qargs,props in target["ecr"].items():
+                if qargs is None:
+                    continue
+                edge=tuple(sorted(qargs))
+                cost=_cost(props.error if props is not None else None)
+                self.edge_cost[edge]=min(cost,self.edge_cost.get(edge,cost))
+
+        self.graph=rx.PyGraph()
+        self.graph.add_nodes_from(range(self.num_qubits))
+        self.neighbors=[set() for _ in range(self.num_qubits)]
+        for (a,b),cost in self.edge_cost.items():
+            self.graph.add_edge(a,b,cost)
+            self.neighbors[a].add(b)
+            self.neighbors[b].add(a)
+
+        self._levels=[None,sorted((self.node_cost[q],(q,)) for q in range(self.num_qubits))]
+
+    def subgraphs(self, size: int) -> List[Tuple[float,Tuple[int,...]]]:
+        """
+            Returns the best connected subgraphs with ``size`` qubits, as a list of (cost, qubits) sorted by cost.
+        """
+        if size>self.num_qubits:
+            return []
+        while len(self._levels)<=size:
+            best={}
+            for cost,nodes in self._levels[-1]:
+                members=set(nodes)
+                for v in set().union(*[self.neighbors[q] for q in nodes])-members:
+                    key=tuple(sorted(members|{v}))
+                    c=cost+self.node_cost[v]+min(self.edge_cost[tuple(sorted((v,q)))] for q in self.neighbors[v]&members)
+                    if c<best.get(key,math.inf):
+                        best[key]=c
+            self._levels.append(sorted((c,k) for k,c in best.items())[:self._beam_width])
+        return self._levels[size]
+
+
+def get_subgraph_index(target: Target) -> SubgraphIndex:
+    """
+        Returns the :class:`SubgraphIndex` of a target, reusing the one already built for the same calibration.
+    """
+    key=[]
+    for name in ("measure","sx","ecr"):
+        if name in target.operation_names:
+            key.extend((name,qargs,None if props is None else props.error) for qargs,props in target[name].items())
+    key=(target.num_qubits,tuple(key))
+    if key in _indexes:
+        _indexes.move_to_end(key)
+        return _indexes[key]
+    index=SubgraphIndex(target)
+    _indexes[key]=index
+    if len(_indexes)>MAX_CACHED_INDEXES:
+        _indexes.popitem(last=False)
+    return index
+
+
+class QmioLayout(AnalysisPass):
+    """
+    Noise-aware initial layout for Qmio.
+
+    It looks for the circuit interaction graph (the pairs of qubits of the two-qubit gates) in the best connected subgraphs of the
+    coupling map with the same number of qubits, taken from a :class:`SubgraphIndex` precomputed once per calibration. Among the first
+    embeddings found, it chooses the one with the lowest error, weighting each coupler by the number of two-qubit gates placed on it.
+    The idle virtual qubits are placed on the remaining physical qubits with the lowest error.
+
+    If no subgraph contains the interaction graph, the layout is not set, so a fallback layout pass can run after it.
+
+    Args:
+        target (Target): the target of the backend.
+        max_embeddings (int): maximum number of embeddings evaluated. Default 8
+    """
+
+    def __init__(self, target: Target, max_embeddings: int=MAX_EMBEDDINGS):
+        super().__init__()
+        self.target=target
+        self.max_embeddings=max_embeddings
+
+    def run(self, dag: DAGCircuit):
+        index=get_subgraph_index(self.target)
+        qubit_index={q:i for i,q in enumerate(dag.qubits)}
+
+        active=set()
+        weights={}
+        for node in dag.op_nodes(include_directives=False):
+            qargs=[qubit_index[q] for q in node.qargs]
+            if len(qargs)>2:
+                logger.debug("Gate %s with more than two qubits. Layout not set"%node.name)
+                return
+            active.update(qargs)
+            if len(qargs)==2:
+                edge=tuple(sorted(qargs))
+                weights[edge]=weights.get(edge,0)+1
+
+        if len(dag.qubits)>index.num_qubits or len(active)==0:
+            return
+
+        active=sorted(active)
+        if not weights:
+            physical=sorted(range(index.num_qubits),key=lambda q:index.node_cost[q])[:len(active)]
+            mapping=dict(zip(active,physical))
+        else:
+            mapping=self._embed(index,active,weights)
+            if mapping is None:
+                logger.debug("No subgraph found for the interaction graph. Layout not set")
+                return
+
+        free=sorted(set(range(index.num_qubits))-set(mapping.values()),key=lambda q:index.node_cost[q])
+        idle=[v for v in range(len(dag.qubits)) if v not in mapping]
+        mapping.update(zip(idle,free))
+
+        self.property_set["layout"]=Layout({dag.qubits[v]:p for v,p in mapping.items()})
+
+    def _embed(self, index: SubgraphIndex, active: List[int], weights: Dict[Tuple[int,int],int]):
+        interaction=rx.PyGraph()
+        nodes={v:interaction.add_node(v) for v in active}
+        for (a,b) in weights:
+            interaction.add_edge(nodes[a],nodes[b],None)
+
+        best=None
+        best_cost=math.inf
+        found=0
+        for _,subset in index.subgraphs(len(active)):
+            sub=index.graph.subgraph(list(subset))
+            mappings=rx.vf2_mapping(sub,interaction,subgraph=True,induced=False,id_order=False)
+            for m in itertools.islice(mappings,self.max_embeddings):
+                mapping={interaction[i]:sub[s] for s,i in m.items()}
+                cost=sum(index.node_cost[p] for p in mapping.values())
+                cost+=sum(w*index.edge_cost[tuple(sorted((mapping[a],mapping[b])))] for (a,b),w in weights.items())
+                if cost<best_cost:
+                    best,best_cost=mapping,cost
+                found+=1
+            if found>=self.max_embeddings:
+                break
+        return best
+
+
+class QmioLayoutPlugin(PassManagerStagePlugin):
+    """
+    Layout stage plugin that uses :class:`QmioLayout`, falling back to :py:class:`qiskit.transpiler.passes.DenseLayout`.
+    Use it with ``transpile(circuit, backend, layout_method="qmio")``.
+    """
+
+    def pass_manager(self, pass_manager_config: PassManagerConfig, optimization_level=None) -> PassManager:
+        def _choose_layout_condition(property_set):
+            return not property_set["layout"]
+
+        target=pass_manager_config.target
+        coupling_map=target if target is not None else pass_manager_config.coupling_map
+
+        layout=PassManager()
+        layout.append(SetLayout(pass_manager_config.initial_layout))
+        if target is not None:
+            layout.append(ConditionalController(QmioLayout(target),condition=_choose_layout_condition))
+        layout.append(ConditionalController(DenseLayout(coupling_map=pass_manager_config.coupling_map,target=target),condition=_choose_layout_condition))
+        layout+=common.generate_embed_passmanager(coupling_map)
+        return layout
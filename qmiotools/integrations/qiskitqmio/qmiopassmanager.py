@@ -0,0 +1,58 @@
+from qiskit.transpiler import Target
+from qiskit.transpiler.passmanager import StagedPassManager
+from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+
+from collections import OrderedDict
+import logging
+
+from ...version import VERSION
+
+logger=logging.getLogger("QmioPassManager/%s"%VERSION)
+
+MAX_CACHED_PASS_MANAGERS=16
+
+_pass_managers=OrderedDict()
+
+
+def get_pass_manager(target: Target, optimization_level: int=2, seed_transpiler: int=None, layout_method: str=None) -> StagedPassManager:
+    """
+    Returns the preset pass manager for a Qmio target, building it only the first time.
+
+    The pass managers are the stock ones of :py:func:`qiskit.transpiler.preset_passmanagers.generate_preset_pass_manager` for the
+    target, i.e., the same pipeline that :py:func:`qiskit.transpile` builds in each call, with the same output for the same seed.
+    There are no Qmio-specific translation or routing stages: the translation to ``{sx, x, rz, ecr}`` and the direction of the ECR
+    gates come from the target. The last pass managers are cached by target and parameters, so transpiling many circuits does not
+    rebuild them, but :py:func:`qiskit.transpile` does not use this cache.
+
+    Args:
+        target (Target): the target of the backend.
+        optimization_level (int): the optimization level, from 0 to 3. Default 2
+        seed_transpiler (int): the seed for the stochastic passes. Default *None*
+        layout_method (str): the layout stage plugin. Use "qmio" for :class:`QmioLayout`. Default *None*, i.e., the Qiskit default.
+
+    Returns:
+        StagedPassManager: the pass manager. Use its method ``run`` to transpile one or more circuits.
+
+    **Example**::
+
+        from qmiotools.integrations.qiskitqmio import QmioBackend
+
+        backend=QmioBackend()
+        pm=backend.get_pass_manager(2)
+        circuits=pm.run(circuits)
+    """
+    key=(id(target),optimization_level,seed_transpiler,layout_method)
+    if key in _pass_managers:
+        cached_target,pm=_pass_managers[key]
+        if cached_target is target:
+            _pass_managers.move_to_end(key)
+            return pm
+
+    logger.debug("Building pass manager with optimization_level %d, seed_transpiler %s, layout_method %s"%(optimization_level,seed_transpiler,layout_method))
+    pm=generate_preset_pass_manager(optimization_level,target=target,seed_transpiler=seed_transpiler,layout_method=layout_method)
+
+    # The target is kept alive while cached, so its id can not be reused by other target
+    _pass_managers[key]=(target,pm)
+    if len(_pass_managers)>MAX_CACHED_PASS_MANAGERS:
+        _pass_managers.popitem(last=False)
+    return pm
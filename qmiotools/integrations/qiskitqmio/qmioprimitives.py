@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+from qiskit.circuit import QuantumCircuit
+from qiskit.primitives import BaseSamplerV2, BaseEstimatorV2, PrimitiveJob
+from qiskit.primitives.containers import BitArray, DataBin, PrimitiveResult, PubResult, SamplerPubResult
+from qiskit.primitives.containers.sampler_pub import SamplerPub
+from qiskit.primitives.containers.estimator_pub import EstimatorPub
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+import weakref
+import math
+import logging
+
+from .shotmemory import ShotMemory
+from .flattencircuit import circuit_fingerprint
+from .paulimeasurement import MeasurementGroup, measurement_groups
+from ...version import VERSION
+
+logger=logging.getLogger("QmioPrimitives/%s"%VERSION)
+
+MAX_CACHED_MEASUREMENTS=256
+MAX_CACHED_GROUPS=64
+
+@dataclass
+class QmioSamplerOptions:
+    """
+    Options of :class:`QmioSamplerV2`.
+    """
+    default_shots: int=1024
+    """The number of shots of the pubs without shots."""
+    run_options: Dict=field(default_factory=dict)
+    """Options passed to the method ``run`` of the backend."""
+
+
+@dataclass
+class QmioEstimatorOptions:
+    """
+    Options of :class:`QmioEstimatorV2`.
+    """
+    default_precision: float=0.015625
+    """The precision of the pubs without precision. Each circuit is run ceil(1/precision^2) shots."""
+    run_options: Dict=field(default_factory=dict)
+    """Options passed to the method ``run`` of the backend."""
+
+
+def _batch_size(backend, shots: int) -> int:
+    size=getattr(backend,"max_circuits",None) or 1000
+    max_shots=getattr(backend,"max_shots",None)
+    if max_shots:
+        size=min(size,max(1,max_shots//shots))
+    return size
+
+
+def _submit(backend, tasks: List[Tuple[QuantumCircuit,np.ndarray]], shots: int, run_options: Dict) -> List[List[np.ndarray]]:
+    """
+        Runs each circuit of the tasks with each row of its parameter values, in batches of the largest number of programs the backend
+        accepts in one job. Each circuit is given with all its bindings in ``parameter_binds``, so the backend exports it only once.
+        Returns the bit-packed shots of each binding of each task, with shape (shots, bytes) and the bit *i* of each shot (little-endian)
+        the classical bit *i* of the circuit.
+    """
+    size=_batch_size(backend,shots)
+    items=[(t,j) for t,(c,values) in enumerate(tasks) for j in range(values.shape[0])]
+    outputs=[[] for _ in tasks]
+    for start in range(0,len(items),size):
+        batch=items[start:start+size]
+        circuits=[]
+        binds=[]
+        owners=[]
+        k=0
+        while k<len(batch):
+            t=batch[k][0]
+            end=k
+            while end<len(batch) and batch[end][0]==t:
+                end+=1
+            c,values=tasks[t]
+            rows=[j for _,j in batch[k:end]]
+            if c.num_parameters>0:
+                circuits.append(c)
+                binds.append({p:values[rows,i] for i,p in enumerate(c.parameters)})
+            else:
+                circuits.extend([c]*len(rows))
+                binds.extend([{}]*len(rows))
+            owners.extend([t]*len(rows))
+            k=end
+        logger.debug("Submitting %d programs of %d circuits with %d shots"%(len(owners),len(circuits),shots))
+        options=dict(run_options)
+        options.update(shots=shots,memory=True,parameter_binds=binds)
+        result=backend.run(circuits,**options).result()
+        for t,experiment in zip(owners,result.results):
+            outputs[t].append(_packed(experiment,tasks[t][0].num_clbits))
+    return outputs
+
+
+def _packed(experiment, num_bits: int) -> np.ndarray:
+    """
+        Returns the bit-packed shots of an experiment, little-endian as :py:class:`qmiotools.integrations.qiskitqmio.ShotMemory`.
+    """
+    memory=experiment.data.memory
+    if isinstance(memory,ShotMemory):
+        return memory.packed
+    # Other backends return the shots as hexadecimal strings
+    return BitArray.from_samples(memory,num_bits).array[:,::-1]
+
+
+def _register_packed(packed: np.ndarray, offset: int, size: int, total: int) -> np.ndarray:
+    """
+        Returns the bit-packed (little-endian) shots of the bits offset..offset+size of the shots of a circuit with total bits.
+    """
+    if offset==0 and size==total:
+        return packed
+    bits=np.unpackbits(packed,axis=1,count=total,bitorder="little")[:,offset:offset+size]
+    return np.packbits(bits,axis=1,bitorder="little")
+
+
+def _register_arrays(packed: List[np.ndarray], circuit: QuantumCircuit, shape: Tuple[int,...], shots: int) -> Dict[str,BitArray]:
+    """
+        Builds the :py:class:`qiskit.primitives.containers.BitArray` of each classical register from the bit-packed shots of each
+        binding, in the order of the registers as flattened by :func:`FlattenCircuit`.
+    """
+    arrays={}
+    offset=0
+    total=circuit.num_clbits
+    for creg in circuit.cregs:
+        size=creg.size
+        array=np.empty((len(packed),shots,(size+7)//8),dtype=np.uint8)
+        for j,p in enumerate(packed):
+            # BitArray stores the bytes of each shot in big-endian order
+            array[j]=_register_packed(p,offset,size,total)[:,::-1]
+        arrays[creg.name]=BitArray(array.reshape(shape+(shots,array.shape[-1])),size)
+        offset+=size
+    return arrays
+
+
+class QmioSamplerV2(BaseSamplerV2):
+    """
+    Sampler V2 primitive for :class:`QmioBackend`, that runs the pubs as batches of parametrized programs.
+
+    The circuits of the pubs must be in the native basis of the backend (for example, transpiled with the method ``get_pass_manager`` of
+    the backend). The parameter values of each pub are broadcast to the shape of the pub and all its bindings are submitted with
+    ``parameter_binds``, so the backend exports each circuit only once and only the angles change between bindings. The pubs are
+    grouped in jobs of the maximum number of programs that the backend accepts, and the :py:class:`qiskit.primitives.containers.BitArray`
+    of each classical register is built directly from the shots returned by the QPU, without counts.
+
+    Args:
+        backend (QmioBackend): the backend, or other backend that returns the memory of the shots, like :class:`FakeQmio`.
+        options (dict): the options, see :class:`QmioSamplerOptions`. Default *None*
+
+    **Example**::
+
+        from qmiotools.integrations.qiskitqmio import QmioBackend, QmioSamplerV2
+
+        backend=QmioBackend()
+        sampler=QmioSamplerV2(backend, options={"default_shots": 1000})
+        isa=backend.get_pass_manager(2).run(circuit)
+        result=sampler.run([(isa, values)]).result()
+        counts=result[0].data.meas.get_counts()
+    """
+
+    def __init__(self, backend, options: dict=None):
+        self._backend=backend
+        self._options=QmioSamplerOptions(**options) if options else QmioSamplerOptions()
+
+    @property
+    def backend(self):
+        """
+            The backend of the sampler.
+        """
+        return self._backend
+
+    @property
+    def options(self) -> QmioSamplerOptions:
+        """
+            The options of the sampler.
+        """
+        return self._options
+
+    def run(self, pubs: Iterable, *, shots: int=None) -> PrimitiveJob:
+        if shots is None:
+            shots=self._options.default_shots
+        coerced=[SamplerPub.coerce(pub,shots) for pub in pubs]
+        job=PrimitiveJob(self._run,coerced)
+        job._submit()
+        return job
+
+    def _run(self, pubs: List[SamplerPub]) -> PrimitiveResult:
+        groups=OrderedDict()
+        for i,pub in enumerate(pubs):
+            groups.setdefault(pub.shots,[]).append(i)
+        results=[None]*len(pubs)
+        for shots,indices in groups.items():
+            tasks=[]
+            for i in indices:
+                pub=pubs[i]
+                values=pub.parameter_values.as_array(pub.circuit.parameters).reshape(pub.parameter_values.size,pub.circuit.num_parameters)
+                tasks.append((pub.circuit,values))
+            outputs=_submit(self._backend,tasks,shots,self._options.run_options)
+            for i,packed in zip(indices,outputs):
+                pub=pubs[i]
+                arrays=_register_arrays(packed,pub.circuit,pub.shape,shots)
+                results[i]=SamplerPubResult(DataBin(**arrays,shape=pub.shape),
+                                            metadata={"shots":shots,"circuit_metadata":pub.circuit.metadata})
+        return PrimitiveResult(results,metadata={"version":2})
+
+
+class QmioEstimatorV2(BaseEstimatorV2):
+    """
+    Estimator V2 primitive for :class:`QmioBackend`, that runs the pubs as batches of parametrized programs.
+
+    The circuits of the pubs must be in the native basis of the backend and the observables must act on its physical qubits (for
+    example, with ``observable.apply_layout(isa.layout)``). The Pauli terms of the observables of each pub are grouped in qubit-wise
+    commuting sets with :func:`measurement_groups` and each set is measured once, with a copy of the circuit that changes the basis of
+    its qubits with native gates and measures them in a new classical register, so the circuit is not transpiled again. The groups and
+    the measured circuits are kept between calls, so the backend exports them only once for all the parameter values of a variational
+    loop. The expectation value of every term of a set is computed from the same shots, and the standard error of each observable
+    includes the covariance of the terms measured together.
+
+    Args:
+        backend (QmioBackend): the backend, or other backend that returns the memory of the shots, like :class:`FakeQmio`.
+        options (dict): the options, see :class:`QmioEstimatorOptions`. Default *None*
+
+    **Example**::
+
+        from qmiotools.integrations.qiskitqmio import QmioBackend, QmioEstimatorV2
+
+        backend=QmioBackend()
+        estimator=QmioEstimatorV2(backend, options={"default_precision": 0.01})
+        isa=backend.get_pass_manager(2).run(ansatz)
+        result=estimator.run([(isa, hamiltonian.apply_layout(isa.layout), values)]).result()
+        energies=result[0].data.evs
+    """
+
+    def __init__(self, backend, options: dict=None):
+        self._backend=backend
+        self._options=QmioEstimatorOptions(**options) if options else QmioEstimatorOptions()
+        self._measurements=OrderedDict()
+        self._groups=OrderedDict()
+
+    @property
+    def backend(self):
+        """
+            The backend of the estimator.
+        """
+        return self._backend
+
+    @property
+    def options(self) -> QmioEstimatorOptions:
+        """
+            The options of the estimator.
+        """
+        return self._options
+
+    def run(self, pubs: Iterable, *, precision: float=None) -> PrimitiveJob:
+        if precision is None:
+            precision=self._options.default_precision
+        coerced=[EstimatorPub.coerce(pub,precision) for pub in pubs]
+        for i,pub in enumerate(coerced):
+            if pub.precision<=0.0:
+                raise ValueError("The pub %d has precision %s, but it should be larger than 0"%(i,pub.precision))
+        job=PrimitiveJob(self._run,coerced)
+        job._submit()
+        return job
+
+    def _measurement_groups(self, labels: Tuple[str,...]) -> List[MeasurementGroup]:
+        """
+            Returns the measurement groups of the Pauli terms of the labels, cached by labels.
+        """
+        if labels in self._groups:
+            self._groups.move_to_end(labels)
+            return self._groups[labels]
+        groups=measurement_groups(list(labels))
+        self._groups[labels]=groups
+        if len(self._groups)>MAX_CACHED_GROUPS:
+            self._groups.popitem(last=False)
+        return groups
+
+    def _measurement_circuit(self, circuit: QuantumCircuit, group: MeasurementGroup) -> QuantumCircuit:
+        """
+            Returns the copy of the circuit that measures the group, cached by circuit and basis.
+        """
+        key=(id(circuit),group.qubits,group.basis)
+        fingerprint=circuit_fingerprint(circuit)
+        if key in self._measurements:
+            ref,cached_fingerprint,measured=self._measurements[key]
+            if ref() is circuit and cached_fingerprint==fingerprint:
+                self._measurements.move_to_end(key)
+                return measured
+
+        measured=group.measurement_circuit(circuit)
+        self._measurements[key]=(weakref.ref(circuit),fingerprint,measured)
+        if len(self._measurements)>MAX_CACHED_MEASUREMENTS:
+            self._measurements.popitem(last=False)
+        return measured
+
+    def _run(self, pubs: List[EstimatorPub]) -> PrimitiveResult:
+        groups=OrderedDict()
+        for i,pub in enumerate(pubs):
+            groups.setdefault(int(math.ceil(1.0/pub.precision**2)),[]).append(i)
+        results=[None]*len(pubs)
+        for shots,indices in groups.items():
+            tasks=[]
+            layouts=[]
+            for i in indices:
+                pub=pubs[i]
+                circuit=pub.circuit
+                values=pub.parameter_values.as_array(circuit.parameters).reshape(pub.parameter_values.size,circuit.num_parameters)
+                # Flat index of the bindings of each element of the pub
+                bindings=np.broadcast_to(np.arange(values.shape[0]).reshape(pub.parameter_values.shape),pub.shape)
+                observables=np.broadcast_to(pub.observables,pub.shape)
+                rows=OrderedDict()
+                for index in np.ndindex(*pub.shape):
+                    for label in observables[index]:
+                        if set(label)!={"I"}:
+                            rows.setdefault(label,set()).add(int(bindings[index]))
+                labels=tuple(rows)
+                plan=[]
+                for group in self._measurement_groups(labels):
+                    needed=sorted(set().union(*(rows[labels[t]] for t in group.indices)))
+                    measured=self._measurement_circuit(circuit,group)
+                    plan.append((group,needed,circuit.num_clbits,measured.num_clbits))
+                    tasks.append((measured,values[needed]))
+                layouts.append((bindings,observables,plan))
+            outputs=iter(_submit(self._backend,tasks,shots,self._options.run_options))
+            for i,(bindings,observables,plan) in zip(indices,layouts):
+                pub=pubs[i]
+                # The group and the position in the group of each term, and the statistics of each group for each binding
+                position={}
+                statistics={}
+                for g,(group,needed,offset,total) in enumerate(plan):
+                    for k,pauli in enumerate(group.paulis):
+                        position[pauli.to_label()]=(g,k)
+                    for j,packed in zip(needed,next(outputs)):
+                        statistics[g,j]=group.expectation_values(_register_packed(packed,offset,total-offset,total))
+                evs=np.zeros(pub.shape,dtype=float)
+                variances=np.zeros(pub.shape,dtype=float)
+                for index in np.ndindex(*pub.shape):
+                    j=int(bindings[index])
+                    coeffs={}
+                    for label,coeff in observables[index].items():
+                        if set(label)=={"I"}:
+                            evs[index]+=np.real(coeff)
+                            continue
+                        g,k=position[label]
+                        if g not in coeffs:
+                            coeffs[g]=np.zeros(len(plan[g][0].indices))
+                        coeffs[g][k]+=np.real(coeff)
+                    for g,c in coeffs.items():
+                        e,covariance=statistics[g,j]
+                        evs[index]+=c@e
+                        variances[index]+=c@covariance@c
+                stds=np.sqrt(np.maximum(variances,0.0)/shots)
+                results[i]=PubResult(DataBin(evs=evs,stds=stds,shape=pub.shape),
+                                     metadata={"target_precision":pub.precision,"shots":shots,"circuit_metadata":pub.circuit.metadata})
+        return PrimitiveResult(results,metadata={"version":2})
@@ -0,0 +1,144 @@
+from qiskit.circuit import QuantumCircuit
+from qiskit.transpiler import Target
+
+from dataclasses import dataclass
+from typing import List, Tuple
+import numpy as np
+
+
+# Directives accepted by the QPU that are not operations of the target
+DIRECTIVES=("barrier",)
+
+
+@dataclass
+class Diagnostic:
+    """
+    An instruction of a circuit that can not be executed in the target, returned by :meth:`TargetValidator.validate`.
+    """
+    circuit: int
+    index: int
+    name: str
+    qubits: Tuple[int,...]
+    message: str
+
+    def __str__(self):
+        return "Circuit %d, instruction %d (%s on qubits %s): %s"%(self.circuit,self.index,self.name,list(self.qubits),self.message)
+
+
+class TargetValidator:
+    """
+    Checks the instructions of circuits against a :py:class:`qiskit.transpiler.Target` before they are submitted.
+
+    The names and qubits of the operations of the target are stored in lookup tables (the qubits of each one-qubit operation and the
+    directed couplers of each two-qubit operation). The names of the operations of each circuit are checked with its counts and only the
+    instructions of the operations that are not available on all the qubits (the two-qubit gates) are extracted in a single pass and
+    checked with vectorized lookups.
+
+    Args:
+        target (Target): the target of the backend.
+
+    **Example**::
+
+        from qmiotools.integrations.qiskitqmio import QmioBackend
+
+        backend=QmioBackend()
+        for diagnostic in backend.validate(circuits):
+            print(diagnostic)
+    """
+
+    def __init__(self, target: Target):
+        self.num_qubits=target.num_qubits
+        names=sorted(set(target.operation_names)|set(DIRECTIVES))
+        n=len(names)
+        self._ids={name:i for i,name in enumerate(names)}
+        self._global=np.zeros(n,dtype=bool)
+        self._arity=np.full(n,-1,dtype=np.int64)
+        # One extra qubit, the padding of the instructions with less qubits
+        self._allowed1=np.zeros((n,self.num_qubits+1),dtype=bool)
+        self._allowed2=np.zeros((n,self.num_qubits+1,self.num_qubits+1),dtype=bool)
+        for i,name in enumerate(names):
+            qargs=None if name in DIRECTIVES else target.qargs_for_operation_name(name)
+            if qargs is None:
+                self._global[i]=True
+                continue
+            for q in qargs:
+                self._arity[i]=len(q)
+                if len(q)==1:
+                    self._allowed1[i,q[0]]=True
+                elif len(q)==2:
+                    self._allowed2[i,q[0],q[1]]=True
+        # The operations that can be applied to any qubit do not need to be checked one by one
+        self._universal={name for i,name in enumerate(names) if self._global[i] or (self._arity[i]==1 and self._allowed1[i,:-1].all())}
+
+    def _extract(self, circuit: QuantumCircuit, names=None):
+        index={q:i for i,q in enumerate(circuit.qubits)}
+        ids=self._ids
+        pad=self.num_qubits
+        rows=[]
+        positions=[]
+        for i,instruction in enumerate(circuit.data):
+            name=instruction.name
+            if names is not None and name not in names:
+                continue
+            qubits=instruction.qubits
+            positions.append(i)
+            rows.append((ids.get(name,-1),len(qubits),index[qubits[0]] if len(qubits)>0 else pad,index[qubits[1]] if len(qubits)>1 else pad))
+        rows=np.array(rows,dtype=np.int64).reshape(-1,4)
+        return np.array(positions,dtype=np.int64),rows[:,0],rows[:,1],rows[:,2],rows[:,3]
+
+    def validate(self, circuit: QuantumCircuit, circuit_index: int=0) -> List[Diagnostic]:
+        """
+        Returns the diagnostics of the instructions of a circuit that are not in the target: operations that are not native, qubits
+        outside of the target, one-qubit operations on qubits without them, two-qubit operations on qubits that are not coupled or
+        in the reverse direction of the coupler.
+
+        Args:
+            circuit (QuantumCircuit): the circuit, with its qubits as physical qubits.
+            circuit_index (int): the index of the circuit in the batch, stored in the diagnostics. Default 0
+
+        Returns:
+            list: the :class:`Diagnostic` of each invalid instruction, empty if the circuit is valid.
+        """
+        counts=circuit.count_ops()
+        names=None
+        if circuit.num_qubits<=self.num_qubits and all(name in self._ids for name in counts):
+            # Only the instructions of the operations not available on all the qubits are extracted
+            names={name for name in counts if name not in self._universal}
+            if not names:
+                return []
+        positions,op,nq,q0,q1=self._extract(circuit,names)
+        known=op>=0
+        ids=np.where(known,op,0)
+        outside=((nq>0)&(q0>=self.num_qubits))|((nq>1)&(q1>=self.num_qubits))
+        q0=np.where(outside,self.num_qubits,q0)
+        q1=np.where(outside,self.num_qubits,q1)
+        fixed=known&~self._global[ids]&~outside
+        arity=fixed&(nq!=self._arity[ids])
+        fixed&=~arity
+        one=fixed&(nq==1)&~self._allowed1[ids,q0]
+        two=fixed&(nq==2)&~self._allowed2[ids,q0,q1]
+        reversed_=two&self._allowed2[ids,q1,q0]
+
+        invalid=~known|outside|arity|one|two
+        if not invalid.any():
+            return []
+        diagnostics=[]
+        data=circuit.data
+        for k in np.flatnonzero(invalid).tolist():
+            i=int(positions[k])
+            instruction=data[i]
+            qubits=tuple(circuit.find_bit(q).index for q in instruction.qubits)
+            if not known[k]:
+                message="operation not supported by the backend"
+            elif outside[k]:
+                message="qubit outside of the backend, which has %d qubits"%self.num_qubits
+            elif arity[k]:
+                message="wrong number of qubits"
+            elif one[k]:
+                message="operation not available on this qubit"
+            elif reversed_[k]:
+                message="reversed direction, the coupler is %s"%list(qubits[::-1])
+            else:
+                message="qubits not coupled"
+            diagnostics.append(Diagnostic(circuit_index,i,instruction.name,qubits,message))
+        return diagnostics
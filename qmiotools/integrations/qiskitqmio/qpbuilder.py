@@ -1,5 +1,6 @@
-from qiskit.pulse import Schedule, Play, DriveChannel, Constant, Drag, Gaussian, GaussianSquare, Sin, barrier, Delay, ShiftPhase, ShiftFrequency, SetPhase, SetFrequency
+from qiskit.pulse import Play, Constant, Drag, Gaussian, GaussianSquare, Sin, barrier, Delay, ShiftPhase, ShiftFrequency, SetPhase, SetFrequency
 from qiskit.pulse.instructions import RelativeBarrier
+from qiskit.circuit import ParameterExpression
 import io
 
 from ...data import QBIT_MAP
@@ -12,172 +13,180 @@ class QPBuilder:
 
     def __init__(
             self,
-            logging_level: int=logging.NOTSET, 
+            logging_level: int=logging.NOTSET,
             logging_filename: str=None):
-        
+
         logger.setLevel(logging_level)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')    
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         if logging_filename!=None:
             self._handler = logging.FileHandler(logging_filename)
         else:
             import sys
             self._handler = logging.StreamHandler(sys.stdout)
-        
+
         self._handler.setFormatter(formatter)
         logger.addHandler(self._handler)
-        
+
         logger.info("Logging started:")
         self._handler.flush()
-        
 
-    def build_header(self):
+
+    def build_header(self, minify: bool=False):
         header ="""OPENQASM 3;\ndefcalgrammar "openpulse";\n"""
+        if minify:
+            return header.replace("\n","")
         return header
-    
+
     def __del__(self):
         """
             Internal method to call when the instance of this class is deleted.
         """
-        
-        if self._handler is not None:
-            self._logger.debug("Deleting instance of QmioBackend")
-            self._logger.removeHandler(self._handler)
+
+        if getattr(self,"_handler",None) is not None:
+            try:
+                logger.removeHandler(self._handler)
+            except Exception:
+                pass
             self._handler=None
-        
-        self._close()
-        atexit.unregister(self.__exit__)
-    
-    
-    def build_program(self,Sche):
-        
-        SetSentences=[]
-        CorSentences=[]
-        MeaSentences=[]
-
-        wf_count=0
-        ps_count=0
-        de_count=0
-        act_lis=[]
-        
+
+    @staticmethod
+    def _value(value, slots: dict=None, cast=float) -> str:
+        """
+            Returns the literal of a numeric value. If ``slots`` is not None and the value is an unbound
+            :py:class:`qiskit.circuit.ParameterExpression`, it returns a named ``%`` placeholder instead,
+            registering the expression in ``slots``.
+        """
+        if slots is not None and isinstance(value,ParameterExpression) and value.parameters:
+            name=slots.get(value)
+            if name is None:
+                name=slots[value]='p%d'%len(slots)
+            return '%%(%s)s'%name
+        return str(cast(value))
+
+    @staticmethod
+    def _time(value, name: str) -> str:
+        """
+            Returns the literal of a time in ``dt``. The times can not be placeholders of a template, as they change the
+            definitions of the program, so an unbound :py:class:`qiskit.circuit.ParameterExpression` raises a ValueError.
+        """
+        if isinstance(value,ParameterExpression):
+            if value.parameters:
+                raise ValueError("The %s can not be a parameter: %s"%(name,value))
+            value=float(value)
+            if value.is_integer():
+                value=int(value)
+        return '%sdt'%value
+
+    def _waveform(self, pulse, slots: dict=None) -> str:
+        """
+            Returns the OpenPulse expression of a waveform, for example ``drag(0.1,160dt,40dt,0.2)``
+        """
+        v=self._value
+        t=self._time
+        if isinstance(pulse,Drag):
+            return 'drag(%s,%s,%s,%s)'%(v(pulse.amp,slots),t(pulse.duration,"duration"),t(pulse.sigma,"sigma"),v(pulse.beta,slots))
+        elif isinstance(pulse,Gaussian):
+            return 'gaussian(%s,%s,%s)'%(v(pulse.amp,slots),t(pulse.duration,"duration"),t(pulse.sigma,"sigma"))
+        elif isinstance(pulse,GaussianSquare):
+            return 'gaussian_square(%s,%s,%s,%s)'%(v(pulse.amp,slots),t(pulse.duration,"duration"),t(pulse.width,"width"),t(pulse.sigma,"sigma"))
+        elif isinstance(pulse,Constant):
+            return 'constant(%s,%s)'%(t(pulse.duration,"duration"),v(pulse.amp,slots))
+        elif pulse.pulse_type=='Sech':
+            p=pulse.parameters
+            return 'sech(%s,%s,%s)'%(v(p['amp'],slots),t(p['duration'],"duration"),t(p['sigma'],"sigma"))
+        elif pulse.pulse_type=='Sin':
+            p=pulse.parameters
+            return 'sine(%s,%s,%s,%s)'%(v(p['amp'],slots),t(p['duration'],"duration"),v(p['freq'],slots),v(p['phase'],slots))
+        raise TypeError('Waveform not currently supported by Qmiobackend ')
+
+    def iter_program(self,Sche, slots: dict=None):
+        """
+            Generator that yields the sentences of the OpenPulse program (without the header).
+
+            The schedule is traversed only once: the definitions (waveforms and defcals) and the body
+            are collected in the same pass and the frames and measurements, that depend on the set of
+            active qubits, are generated at the end.
+
+            Waveforms are interned by shape and parameters, play defcals by waveform and frame and
+            delay defcals by qubit and duration, so repeated pulses reuse the same definitions.
+
+            If ``slots`` is a dictionary, the unbound parameters of the waveforms, phases and frequencies
+            are written as named ``%`` placeholders (see :py:meth:`_value`), producing a template.
+        """
+        definitions=[]
+        body=[]
+        active=set()
+
+        waveforms={}
+        plays={}
+        delays={}
+
         logger.info("Building OpenPulse sentences")
 
-        for inst in Sche.instructions:
-            if isinstance(inst[1],Play):
-                cidx=inst[1].channel.index
-                act_lis.append(QBIT_MAP[cidx])
-        
-        for qubit in set(act_lis):
-            frame='q'+str(qubit)+'_drive'
-            SetSentences.append('cal {extern frame '+frame+';}')
-
-        for inst in Sche.instructions:
-            if isinstance(inst[1],Play):
-                cidx=inst[1].channel.index
-                dcidx='$'+str(QBIT_MAP[cidx])
-                frame='q'+str(QBIT_MAP[cidx])+'_drive'
-                wf_name='wf'+str(wf_count)
-                ps_name='ps'+str(ps_count)
-
-
-                if isinstance(inst[1].pulse,Drag):
-                    amp=float(inst[1].pulse.amp)
-                    dur=inst[1].pulse.duration
-                    sig=inst[1].pulse.sigma
-                    bet=float(inst[1].pulse.beta)
-                    gparams='('+str(amp)+','+str(dur)+'dt,'+str(sig)+'dt,'+str(bet)+')'
-                    SetSentences.append('cal {waveform '+wf_name+'=drag'+gparams+';}')
-                elif isinstance(inst[1].pulse,Gaussian):
-                    amp=float(inst[1].pulse.amp)
-                    dur=inst[1].pulse.duration
-                    sig=inst[1].pulse.sigma
-                    gparams='('+str(amp)+','+str(dur)+'dt,'+str(sig)+'dt)'
-                    SetSentences.append('cal {waveform '+wf_name+'=gaussian'+gparams+';}')
-                elif isinstance(inst[1].pulse,GaussianSquare):
-                    amp=float(inst[1].pulse.amp)
-                    dur=inst[1].pulse.duration
-                    sig=inst[1].pulse.sigma
-                    wit=inst[1].pulse.width
-                    gparams='('+str(amp)+','+str(dur)+'dt,'+str(wit)+'dt,'+str(sig)+'dt)'
-                    SetSentences.append('cal {waveform '+wf_name+'=gaussian_square'+gparams+';}')
-                elif isinstance(inst[1].pulse,Constant):
-                    amp=float(inst[1].pulse.amp)
-                    dur=inst[1].pulse.duration
-                    gparams='('+str(dur)+'dt,'+str(amp)+')'
-                    SetSentences.append('cal {waveform '+wf_name+'=constant'+gparams+';}')
-                elif inst[1].pulse.pulse_type=='Sech':
-                    amp=float(inst[1].pulse.parameters['amp'])
-                    dur=inst[1].pulse.parameters['duration']
-                    sig=inst[1].pulse.parameters['sigma']
-                    gparams='('+str(amp)+','+str(dur)+'dt,'+str(sig)+'dt)'
-                    SetSentences.append('cal {waveform '+wf_name+'=sech'+gparams+';}')
-                elif inst[1].pulse.pulse_type=='Sin':
-                    amp=float(inst[1].pulse.parameters['amp'])
-                    dur=inst[1].pulse.parameters['duration']
-                    fre=float(inst[1].pulse.parameters['freq'])
-                    pha=float(inst[1].pulse.parameters['phase'])
-                    gparams='('+str(amp)+','+str(dur)+'dt,'+str(fre)+','+str(pha)+')'
-                    SetSentences.append('cal {waveform '+wf_name+'=sine'+gparams+';}')
-                else: 
-                    raise TypeError('Waveform not currently supported by Qmiobackend ')
-                
-                SetSentences.append('defcal '+ps_name+' '+dcidx+' {play('+frame+','+wf_name+');}')
-                CorSentences.append(ps_name+' '+dcidx+';')
-
-                wf_count+=1
-                ps_count+=1
-            elif isinstance(inst[1],RelativeBarrier):
-                st=''
-                for chan in inst[1].channels:
-                    st+='$'+str(QBIT_MAP[chan.index])+', '
-                CorSentences.append('barrier '+st[:-2]+';')
-            
-            elif isinstance(inst[1],Delay):
-
-                cidx=inst[1].channel.index
-                dcidx='$'+str(QBIT_MAP[cidx])
-                dur=inst[1].duration
-                SetSentences.append('defcal single_qubit_delay'+str(de_count)+' '+dcidx+' {delay['+str(dur)+'dt]'+' '+'q'+str(QBIT_MAP[cidx])+'_drive;}')
-                CorSentences.append('single_qubit_delay'+str(de_count)+' '+dcidx+';')
-
-                de_count+=1
-
-            elif isinstance(inst[1],ShiftPhase):
-                cidx=inst[1].channel.index
-                frame='q'+str(QBIT_MAP[cidx])+'_drive'
-                pha=inst[1].phase
-
-                CorSentences.append('cal {shift_phase('+frame+', '+str(pha)+');}')
-
-            elif isinstance(inst[1],SetPhase):
-                cidx=inst[1].channel.index
-                frame='q'+str(QBIT_MAP[cidx])+'_drive'
-                pha=inst[1].phase
-
-                CorSentences.append('cal {set_phase('+frame+', '+str(pha)+');}')
-
-            elif isinstance(inst[1],ShiftFrequency):
-                cidx=inst[1].channel.index
-                frame='q'+str(QBIT_MAP[cidx])+'_drive'
-                fre=inst[1].frequency
-
-                CorSentences.append('cal {shift_frequency('+frame+', '+str(fre)+');}')
-
-            elif isinstance(inst[1],SetFrequency):
-                cidx=inst[1].channel.index
-                frame='q'+str(QBIT_MAP[cidx])+'_drive'
-                fre=inst[1].frequency
-
-                CorSentences.append('cal {shift_frequency('+frame+', '+str(fre)+');}')
-
-        pos=0
-        MeaSentences.append('bit['+str(len(set(act_lis)))+'] c;')
-        for qubit in set(act_lis):
-            MeaSentences.append('c['+str(pos)+'] = measure $'+str(qubit)+';')
-            pos+=1
-                
-        Sentences=SetSentences+CorSentences+MeaSentences
-
-        logger.debug("Building OpenPulse sentences:%s"%Sentences)
-        
+        for _,inst in Sche.instructions:
+            if isinstance(inst,Play):
+                qubit=QBIT_MAP[inst.channel.index]
+                active.add(qubit)
+                waveform=self._waveform(inst.pulse,slots)
+                wf_name=waveforms.get(waveform)
+                if wf_name is None:
+                    wf_name=waveforms[waveform]='wf%d'%len(waveforms)
+                    definitions.append('cal {waveform %s=%s;}'%(wf_name,waveform))
+                ps_name=plays.get((wf_name,qubit))
+                if ps_name is None:
+                    ps_name=plays[(wf_name,qubit)]='ps%d'%len(plays)
+                    definitions.append('defcal %s $%d {play(q%d_drive,%s);}'%(ps_name,qubit,qubit,wf_name))
+                body.append('%s $%d;'%(ps_name,qubit))
+
+            elif isinstance(inst,RelativeBarrier):
+                body.append('barrier '+', '.join(['$%d'%QBIT_MAP[chan.index] for chan in inst.channels])+';')
+
+            elif isinstance(inst,Delay):
+                qubit=QBIT_MAP[inst.channel.index]
+                de_name=delays.get((qubit,inst.duration))
+                if de_name is None:
+                    de_name=delays[(qubit,inst.duration)]='single_qubit_delay%d'%len(delays)
+                    definitions.append('defcal %s $%d {delay[%s] q%d_drive;}'%(de_name,qubit,self._time(inst.duration,"duration"),qubit))
+                body.append('%s $%d;'%(de_name,qubit))
+
+            elif isinstance(inst,ShiftPhase):
+                body.append('cal {shift_phase(q%d_drive, %s);}'%(QBIT_MAP[inst.channel.index],self._value(inst.phase,slots,str)))
+
+            elif isinstance(inst,SetPhase):
+                body.append('cal {set_phase(q%d_drive, %s);}'%(QBIT_MAP[inst.channel.index],self._value(inst.phase,slots,str)))
+
+            elif isinstance(inst,(ShiftFrequency,SetFrequency)):
+                body.append('cal {shift_frequency(q%d_drive, %s);}'%(QBIT_MAP[inst.channel.index],self._value(inst.frequency,slots,str)))
+
+        for qubit in active:
+            yield 'cal {extern frame q%d_drive;}'%qubit
+        yield from definitions
+        del definitions
+        yield from body
+        del body
+
+        yield 'bit[%d] c;'%len(active)
+        for pos,qubit in enumerate(active):
+            yield 'c[%d] = measure $%d;'%(pos,qubit)
+
+    def build_program(self,Sche):
+        """
+            Returns the list of sentences of the OpenPulse program (without the header).
+        """
+        Sentences=list(self.iter_program(Sche))
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Building OpenPulse sentences:%s"%Sentences)
+
         return Sentences
 
+    def write_program(self, Sche, program: io.IOBase, minify: bool=False, slots: dict=None):
+        """
+            Writes the full OpenPulse program, including the header, to a stream.
+            If ``minify`` is True, the sentences are not separated by newlines.
+        """
+        program.write(self.build_header(minify))
+        if minify:
+            program.writelines(self.iter_program(Sche,slots))
+        else:
+            program.writelines(piece+'\n' for piece in self.iter_program(Sche,slots))
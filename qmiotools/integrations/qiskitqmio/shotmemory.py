@@ -0,0 +1,141 @@
+from collections.abc import Sequence
+from collections import Counter
+from typing import Dict, Iterator, Union
+
+import numpy as np
+
+from ...exceptions import QmioException
+
+
+class ShotMemory(Sequence):
+    """
+    Compact storage of the memory (the outcome of every shot) of one experiment.
+
+    The outcomes are bit-packed in a :py:class:`numpy.ndarray` of ``uint8`` with one row per shot, where the bit *i* of the
+    row is the classical bit *i*. The array is preallocated and filled chunk by chunk with :meth:`append`. If a filename is given,
+    the array is a memory-mapped ``.npy`` file, that is not removed when the instance is deleted and can be loaded again with
+    :py:func:`numpy.load`.
+
+    The class behaves as a read-only list of hexadecimal strings (the format used by Qiskit for the memory), built only when they are
+    accessed, so :py:meth:`qiskit.result.Result.get_memory` works as with a list.
+
+    Args:
+        num_bits (int): number of classical bits of each shot.
+        shots (int): total number of shots to store.
+        filename (str): path of the ``.npy`` file to store the memory. Default *None*, i.e., the memory is kept in RAM.
+    """
+
+    def __init__(self, num_bits: int, shots: int, filename: str=None):
+        self._num_bits=num_bits
+        self._filename=filename
+        nbytes=max(1,(num_bits+7)//8)
+        if filename is None:
+            self._packed=np.zeros((shots,nbytes),dtype=np.uint8)
+        else:
+            self._packed=np.lib.format.open_memmap(filename,mode="w+",dtype=np.uint8,shape=(shots,nbytes))
+        self._size=0
+
+    @property
+    def num_bits(self) -> int:
+        return self._num_bits
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    @property
+    def packed(self) -> np.ndarray:
+        """
+            The bit-packed array of the stored shots, with shape (shots, bytes per shot). It is a view, not a copy.
+        """
+        return self._packed[:self._size]
+
+    def append(self, bits: np.ndarray):
+        """
+        Stores a chunk of shots.
+
+        Args:
+            bits (numpy.ndarray): array of booleans with shape (shots, num_bits).
+
+        Raises:
+            QmioException: if the chunk does not fit in the preallocated memory.
+        """
+        n=bits.shape[0]
+        if self._size+n>self._packed.shape[0]:
+            raise QmioException("Chunk of %d shots exceeds the capacity of the memory (%d shots)"%(n,self._packed.shape[0]))
+        self._packed[self._size:self._size+n]=np.packbits(bits,axis=1,bitorder="little")
+        self._size+=n
+
+    def slice(self, start: int, stop: int, filename: str=None) -> "ShotMemory":
+        """
+        Returns a new instance with a copy of the shots from ``start`` to ``stop``.
+
+        Args:
+            start (int): first shot.
+            stop (int): shot after the last one.
+            filename (str): path of the ``.npy`` file to store the new memory. Default *None*, i.e., the memory is kept in RAM.
+        """
+        return ShotMemory.from_packed(self._num_bits,self.packed[start:stop],filename)
+
+    @classmethod
+    def from_packed(cls, num_bits: int, packed: np.ndarray, filename: str=None) -> "ShotMemory":
+        """
+        Returns a new instance with a copy of a bit-packed array, as returned by :attr:`packed`.
+
+        Args:
+            num_bits (int): number of classical bits of each shot.
+            packed (numpy.ndarray): array of ``uint8`` with shape (shots, bytes per shot).
+            filename (str): path of the ``.npy`` file to store the memory. Default *None*, i.e., the memory is kept in RAM.
+        """
+        memory=cls(num_bits,packed.shape[0],filename)
+        memory._packed[:]=packed
+        memory._size=packed.shape[0]
+        return memory
+
+    def to_bits(self) -> np.ndarray:
+        """
+            Returns the outcomes as an array of ``uint8`` 0/1 with shape (shots, num_bits).
+        """
+        return np.unpackbits(self.packed,axis=1,count=self._num_bits,bitorder="little")
+
+    def to_ints(self) -> np.ndarray:
+        """
+            Returns the outcomes as an array of ``uint64`` integers. Only for 64 classical bits or less.
+        """
+        if self._num_bits>64:
+            raise QmioException("Outcomes of %d bits do not fit in 64 bits integers"%self._num_bits)
+        packed=self.packed
+        buffer=np.zeros((packed.shape[0],8),dtype=np.uint8)
+        buffer[:,:packed.shape[1]]=packed
+        return buffer.view("<u8").ravel()
+
+    def get_counts(self) -> Dict[str,int]:
+        """
+            Returns the histogram of the outcomes, with the keys in hexadecimal.
+        """
+        if self._num_bits<=64:
+            values,counts=np.unique(self.to_ints(),return_counts=True)
+            return {hex(int(v)):int(c) for v,c in zip(values,counts)}
+        return dict(Counter(iter(self)))
+
+    def _hex(self, row: np.ndarray) -> str:
+        return hex(int.from_bytes(row.tobytes(),"little"))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: Union[int,slice]):
+        if isinstance(index,slice):
+            return [self._hex(row) for row in self.packed[index]]
+        if index<0:
+            index+=self._size
+        if index<0 or index>=self._size:
+            raise IndexError("ShotMemory index out of range")
+        return self._hex(self._packed[index])
+
+    def __iter__(self) -> Iterator[str]:
+        for row in self.packed:
+            yield self._hex(row)
+
+    def __repr__(self) -> str:
+        return "ShotMemory(num_bits=%d, shots=%d, filename=%s)"%(self._num_bits,self._size,self._filename)
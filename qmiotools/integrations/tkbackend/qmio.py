@@ -17,15 +17,19 @@ from pytket.unit_id import Node, Qubit
 
 
 from typing import List, Union, Tuple, Iterable, Optional, Sequence, Dict
-from ..utils import Calibrations
+from ..utils import Calibrations, ReadoutMitigator, ResultCache, draw_coupling_map
+from ...data import MAX_SHOTS_PER_STEP
 from ...exceptions import QmioException, QPUException
 from ...version import VERSION
-from ...data import QUBIT_POSITIONS
 
-from collections import Counter
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
 import networkx as nx
+import numpy as np
 from uuid import uuid4
 import atexit
+import math
 
 import logging
 
@@ -130,6 +134,103 @@ def _required_predicates(self) -> List[Predicate]:
     return preds
 
 
+MAX_CACHED_PLACEMENTS=256
+
+_placements=OrderedDict()
+
+
+def _interaction_graph(circuit: Circuit) -> nx.Graph:
+    """
+        Returns the graph of the two-qubit interactions of a circuit. The nodes are the positions of the qubits in the circuit and the
+        edges have the number of two-qubit gates between their qubits.
+    """
+    index={q:i for i,q in enumerate(circuit.qubits)}
+    graph=nx.Graph()
+    graph.add_nodes_from(range(len(index)))
+    for command in circuit.get_commands():
+        qubits=command.qubits
+        if len(qubits)!=2 or command.op.type==OpType.Barrier:
+            continue
+        a,b=index[qubits[0]],index[qubits[1]]
+        if graph.has_edge(a,b):
+            graph[a][b]["weight"]+=1
+        else:
+            graph.add_edge(a,b,weight=1)
+    for a,b,data in graph.edges(data=True):
+        data["label"]=str(data["weight"])
+    return graph
+
+
+def _match_graphs(graph: nx.Graph, cached: nx.Graph) -> Optional[Dict[int,int]]:
+    """
+        Returns an isomorphism between the interaction graphs, with the same number of gates in each edge, or None if they are not isomorphic.
+    """
+    if graph.number_of_nodes()!=cached.number_of_nodes() or graph.number_of_edges()!=cached.number_of_edges():
+        return None
+    if all(cached.has_edge(a,b) and cached[a][b]["weight"]==w for a,b,w in graph.edges(data="weight")):
+        return {i:i for i in graph.nodes}
+    matcher=nx.algorithms.isomorphism.GraphMatcher(graph,cached,edge_match=lambda x,y: x["weight"]==y["weight"])
+    return next(matcher.isomorphisms_iter(),None)
+
+
+def _cached_placement_pass(self, placement: Placement, options: Optional[Dict]) -> BasePass:
+    """
+    Returns a pass that places and routes each circuit in the architecture, with the map computed by the placement for the first circuit
+    with the same two-qubit interaction graph and calibrations.
+
+    The interaction graphs are hashed with the Weisfeiler-Lehman hash of :py:mod:`networkx`, with the number of gates of each edge,
+    and a cached map is only used if the graphs are isomorphic, through the isomorphism. So circuits with the same shape, for example
+    an ansatz with different angles, solve the placement problem only once. The pass is :py:class:`pytket.passes.CXMappingPass` with its
+    PlacementPass replaced by a :py:class:`pytket.passes.RenameQubitsPass` to the map of the circuit, so the routing, the rebase to CX
+    and the delay of the measures are the ones of CXMappingPass.
+
+    The circuit that fills the cache gets the same result as with CXMappingPass and the placement. The other circuits with the same shape
+    (e.g. the same circuit with the qubits relabeled) reuse the map through the isomorphism, which is a valid placement, but not
+    necessarily the one that the placement would choose for them, so the compiled circuits can be different.
+    """
+    architecture=self.backend_info.architecture
+    calibrations=self._load_calibrations().get_hash()
+    settings=None if options is None else tuple(sorted(options.items()))
+    logger=self._logger
+
+    def _placement_map(circuit: Circuit) -> Dict[Qubit,Node]:
+        graph=_interaction_graph(circuit)
+        key=(nx.weisfeiler_lehman_graph_hash(graph,edge_attr="label"),calibrations,settings)
+        qubits=circuit.qubits
+        for cached,cached_map in _placements.get(key,[]):
+            mapping=_match_graphs(graph,cached)
+            if mapping is not None:
+                _placements.move_to_end(key)
+                logger.debug("Placement read from the cache")
+                return {q:cached_map[mapping[i]] for i,q in enumerate(qubits) if mapping[i] in cached_map}
+        qubit_map=placement.get_placement_map(circuit)
+        _placements.setdefault(key,[]).append((graph,{i:qubit_map[q] for i,q in enumerate(qubits) if q in qubit_map}))
+        _placements.move_to_end(key)
+        if len(_placements)>MAX_CACHED_PLACEMENTS:
+            _placements.popitem(last=False)
+        return qubit_map
+
+    def _replace_placement(compilation_pass: BasePass, placement_pass: BasePass) -> BasePass:
+        if isinstance(compilation_pass,SequencePass):
+            return SequencePass([_replace_placement(p,placement_pass) for p in compilation_pass.get_sequence()])
+        if compilation_pass.to_dict().get("StandardPass",{}).get("name")=="PlacementPass":
+            return placement_pass
+        return compilation_pass
+
+    mapping_pass=CXMappingPass(architecture, placement, directed_cx=True, delay_measures=True)
+    naive_pass=NaivePlacementPass(architecture)
+
+    # CXMappingPass is applied with its PlacementPass replaced by the renaming to the map of each circuit, in a custom pass, as the
+    # map is only known when the circuit arrives
+    def _map(circuit: Circuit) -> Circuit:
+        qubit_map=_placement_map(circuit)
+        _replace_placement(mapping_pass,RenameQubitsPass({q:n for q,n in qubit_map.items() if q!=n})).apply(circuit)
+        naive_pass.apply(circuit)
+        return circuit
+
+    return CustomPass(_map,"QmioCachedPlacement")
+
+
 def _default_compilation_pass(self, optimisation_level: int = 1, options: Optional[Dict] = None, placement: Optional[Union[Placement, Dict[int,int],Dict[Qubit, Node]]] = None) -> BasePass:
     """
     The basic compilation pass that produce a circuit with enough optimisation to run on Qmio.
@@ -201,21 +302,98 @@ def _default_compilation_pass(self, optimisation_level: int = 1, options: Option
                                        self.backend_info.averaged_node_gate_errors,
                                        self.backend_info.averaged_edge_gate_errors,
                                        self.backend_info.averaged_readout_errors)
-        seq.append(CXMappingPass(self.backend_info.architecture, 
-                                placement, directed_cx=True, delay_measures=True))
+        if self._placement_cache:
+            # The circuit is placed with the cached map of its interaction graph and routed by CXMappingPass
+            seq.append(_cached_placement_pass(self, placement, options))
+        else:
+            seq.append(CXMappingPass(self.backend_info.architecture, 
+                                    placement, directed_cx=True, delay_measures=True))
 
-        # Convert to supported gates
-        seq.append(NaivePlacementPass(self.backend_info.architecture))
+            # Convert to supported gates
+            seq.append(NaivePlacementPass(self.backend_info.architecture))
     seq.append(auto_rebase_pass(self._gateset))  
     seq.append(auto_squash_pass(self._1Qgateset))
     
     return SequencePass(seq)
 
 
+_worker_pass=None
+
+
+def _init_compile_worker(calibration_file: str, optimisation_level: int, options: Optional[Dict], placement_cache: bool):
+    """
+        Builds the compilation pass once in each worker process of :py:meth:`Qmio.get_compiled_circuits`.
+    """
+    global _worker_pass
+    _worker_pass=_QmioCompiler(calibration_file,placement_cache).default_compilation_pass(optimisation_level,options)
+
+
+def _compile_chunk(circuits: List[Dict]) -> List[Dict]:
+    """
+        Compiles a chunk of circuits, serialized as tket JSON, in a worker process.
+    """
+    compiled=[]
+    for data in circuits:
+        circuit=Circuit.from_dict(data)
+        _worker_pass.apply(circuit)
+        compiled.append(circuit.to_dict())
+    return compiled
+
+
+def _get_compiled_circuits(self, circuits: Sequence[Circuit], optimisation_level: int = 2, workers: Optional[int] = None, options: Optional[Dict] = None) -> List[Circuit]:
+    """
+    Compiles the circuits with :py:meth:`default_compilation_pass`, building the pass only once.
+
+    With more than one worker, the circuits are serialized to tket JSON and compiled in chunks across a pool of processes, where
+    the pass is built once per worker, and the compiled circuits are returned in the same order. The pool is kept between calls
+    with the same number of workers, optimisation level and options (close it with :py:meth:`Qmio.shutdown`).
+
+    Args:
+        circuits: the circuits to compile. They are not modified.
+        optimisation_level: the optimisation level of :py:meth:`default_compilation_pass`. Default 2
+        workers: the number of worker processes. Default *None*, the value given to the backend (1 if not given, i.e., compiled in this process).
+        options: the options of :py:class:`pytket.placement.NoiseAwarePlacement` for the optimisation level 2. Default *None*
+
+    Return:
+        The compiled circuits.
+    """
+    circuits=list(circuits)
+    if workers is None:
+        workers=self._compile_workers
+    workers=min(workers or 1,len(circuits))
+    if workers<=1:
+        compilation_pass=self.default_compilation_pass(optimisation_level,options)
+        compiled=[]
+        for circuit in circuits:
+            c=circuit.copy()
+            compilation_pass.apply(c)
+            compiled.append(c)
+        return compiled
+
+    pool=self._get_pool(workers,optimisation_level,options)
+    # Several chunks per worker, to balance circuits with different compilation times
+    size=max(1,math.ceil(len(circuits)/(4*workers)))
+    chunks=[[c.to_dict() for c in circuits[i:i+size]] for i in range(0,len(circuits),size)]
+    self._logger.debug("Compiling %d circuits in %d chunks with %d workers"%(len(circuits),len(chunks),workers))
+    compiled=[]
+    for chunk in pool.map(_compile_chunk,chunks):
+        compiled.extend(Circuit.from_dict(data) for data in chunk)
+    return compiled
+
+
+def _load_calibrations(self) -> Calibrations:
+    """
+    Returns the calibrations of the backend, loading them and the architecture the first time.
+    """
+    if self._calibrations is None:
+        self._architecture, self._calibrations=_QmioArchitecture(self._calibration_file)
+    return self._calibrations
+
 @property
 def backend_info(self) -> BackendInfo:
     if self._backend_info is None:
-        architecture, calibrations=_QmioArchitecture(self._calibration_file)
+        calibrations=self._load_calibrations()
+        architecture=self._architecture
         N=architecture.nodes
         
         _averaged_node_gate_errors={}
@@ -276,24 +454,41 @@ def _circuit_status(self, handle: ResultHandle) -> CircuitStatus:
         return CircuitStatus(StatusEnum.COMPLETED)
     raise CircuitNotRunError(handle)
 
-def _convert_to_br(results: dict, circuit: Circuit, binary: bool = False):
-    
-    
+def _decode_counts(results: dict, n_measures: int) -> Tuple[np.ndarray,np.ndarray]:
+    """
+        Returns the outcomes of the counts returned by the QPU for one chunk of shots, as rows of bits, and the count of each one.
+    """
+    try:
+        measures=results["results"][list(results["results"].keys())[0]]
+    except:
+        raise QPUException("QPU did not return results")
+    keys=list(measures.keys())
+    if any(len(k)!=n_measures for k in keys):
+        keys=[k.zfill(n_measures) for k in keys]
+    bits=np.frombuffer("".join(keys).encode(),dtype=np.uint8).reshape(len(keys),n_measures)-ord("0")
+    counts=np.fromiter(measures.values(),dtype=np.int64,count=len(keys))
+    return bits,counts
+
+
+def _merge_counts(chunks: List[Tuple[np.ndarray,np.ndarray]], circuit: Circuit) -> BackendResult:
+    """
+        Merges the decoded counts of the chunks of shots of a circuit, adding the counts of the same outcome with array operations.
+    """
     n_measures=circuit.n_gates_of_type(OpType.Measure)
+    bits=np.concatenate([b for b,_ in chunks])
+    counts=np.concatenate([c for _,c in chunks])
+    outcomes,inverse=np.unique(bits,axis=0,return_inverse=True)
+    totals=np.bincount(inverse.ravel(),weights=counts,minlength=len(outcomes)).astype(np.int64)
+    packed=np.packbits(outcomes,axis=1)
+    counts=Counter({OutcomeArray(packed[i:i+1],n_measures):int(totals[i]) for i in range(len(outcomes))})
+    return BackendResult(q_bits=circuit.qubits,c_bits=circuit.bits,counts=counts)
+
+
+def _convert_to_br(results: dict, circuit: Circuit, binary: bool = False):
     
-    if (not binary):
-        measures=results['results']
-        measures=measures[list(measures.keys())[0]]
-        counts=Counter()
-        for k,v in measures.items():
-            ar=OutcomeArray.from_ints([int(k, base=2)],n_measures,big_endian=True)
-            counts[ar]=v
-        
-        br=BackendResult(q_bits=circuit.qubits,c_bits=circuit.bits,counts=counts) #,ppcirc=circuit) 
-    else:
+    if binary:
         raise QmioException("Not implemented yet. Waiting for examples...")
-        
-    return br
+    return _merge_counts([_decode_counts(results,circuit.n_gates_of_type(OpType.Measure))],circuit)
 
 def _run_circuit(
         self,
@@ -302,6 +497,7 @@ def _run_circuit(
         valid_check: bool = True,
         binary: bool = False,
         repetition_period: float = None,
+        result_cache: Optional[ResultCache] = None,
         **kwargs: KwargTypes,
     ) -> BackendResult:
         """
@@ -313,40 +509,15 @@ def _run_circuit(
             valid_check: Flag to check if the circuit is valid before run
             binary: Flag to ask for raw binary. Default False, returning the counts
             repetition_period: Time between two executions of the circuit. 
+            result_cache: A :py:class:`qmiotools.integrations.utils.ResultCache` (or True for the default one) to reuse the result of the same program with the same parameters and calibrations. Default, the one given to the backend.
         Return: 
-            The results of the execution
+            The results of the execution. If it was read from the cache, the handle of the result is in :py:attr:`Qmio.cached_results`
 
         Raises:
             QPUException. If the execution in the QPU fails, including a description of the exception raised by the QPU
 
         """
-        
-        if self._QPUBackend is None:
-            self._logger.debug("Starting backend")
-            self.connect()
-            
-        if valid_check:
-            self._check_all_circuits([circuit])
-        
-        qasm = circuit_to_qasm_str(circuit).replace("\n","")
-        
-                                                                                                           
-        results=self._QPUBackend.run(circuit=qasm, shots=n_shots, repetition_period=repetition_period, res_format="binary_count")
-        if "Exception" in results:
-            raise QPUException(results["Exception"])
-        try:
-            r=results["results"][list(results["results"].keys())[0]]
-        except:
-            raise QPUException("QPU did not return results")
-        
-        self._logger.debug("Results: %s"%results)
-        
-        
-        
-        br = _convert_to_br(results, circuit, binary)
-        self._logger.debug("BR: %s"%results)
-        
-        return br
+        return _run_circuits(self,[circuit],[n_shots],valid_check,binary,repetition_period,result_cache)[0]
 
         
 
@@ -358,33 +529,96 @@ def _run_circuits(
         valid_check: bool = True,
         binary: bool = False,
         repetition_period: int = None,
+        result_cache: Optional[ResultCache] = None,
         **kwargs: KwargTypes,
     ) -> List[BackendResult]:
         """
         Submits circuits to the backend and returns results
 
+        All the circuits are checked and exported to OpenQASM before the first submission. The shots of each circuit are run in chunks of at
+        most the maximum number of shots per step (:py:data:`qmiotools.data.MAX_SHOTS_PER_STEP`, as in the Qiskit backend) and the counts of each chunk are decoded in a thread
+        while the next chunk runs in the QPU. The result of each circuit is stored in the cache as soon as it is decoded, so it is kept if a later circuit fails.
+
         :param circuits: Sequence of Circuits to be executed
         :param n_shots: Passed on to :py:meth:`Backend.process_circuits`
         :param valid_check: Passed on to :py:meth:`Backend.process_circuits`
         :param binary: Flag to ask for raw binary. Default False, returning the counts
         :param repetition_period: Time between two executions of the circuit. 
+        :param result_cache: A :py:class:`qmiotools.integrations.utils.ResultCache` (or True for the default one) to reuse the results of the same programs with the same parameters and calibrations. Default, the one given to the backend.
         :return: List of results
-        :raises: QmioException
+        :raises: QmioException, QPUException
 
         """
-        if isinstance(n_shots,int):
+        if isinstance(n_shots,int) or n_shots is None:
             N=[n_shots]*len(circuits)
         else:
             N=n_shots
         if isinstance(n_shots, Sequence) and len(circuits)!=len(n_shots):
             raise QmioException("lengths of circuits (%d) and n_shots (%d) do not match"%(len(circuits),len(n_shots)))
+        if binary:
+            raise QmioException("Not implemented yet. Waiting for examples...")
         
-        BR=[]
-        #print(circuits,N)
-        for c,s in zip(circuits,N):
-            self._logger.debug("Running circuit...%s for shots %d"%(c,s))
-            BR.append(_run_circuit(self,c,s,valid_check,binary, repetition_period))
-        self._logger.debug("Returning: %s"%BR)
+        if valid_check:
+            self._check_all_circuits(circuits)
+        qasms=[circuit_to_qasm_str(c).replace("\n","") for c in circuits]
+        
+        if result_cache is None:
+            result_cache=self._result_cache
+        if result_cache is True:
+            result_cache=ResultCache.default()
+        
+        BR=[None]*len(circuits)
+        keys=[None]*len(circuits)
+        pending=[]
+
+        def _decode(chunks, circuit):
+            return _merge_counts([chunk.result() for chunk in chunks],circuit)
+
+        def _store_decoded(wait: bool = False):
+            # The results are taken in the main thread, as the cache is not thread safe, as soon as they are decoded, so a failure in a
+            # later circuit does not lose them
+            while pending and (wait or pending[0][1].done()):
+                i,future=pending.pop(0)
+                BR[i]=future.result()
+                if keys[i] is not None:
+                    # The results are stored as dicts, as the outcome arrays of the counts can not be unpickled
+                    result_cache.put(keys[i],BR[i].to_dict())
+
+        # A single thread decodes the chunks in order, so each circuit is merged after its chunks
+        with ThreadPoolExecutor(max_workers=1) as decoder:
+            for i,(c,qasm,s) in enumerate(zip(circuits,qasms,N)):
+                _store_decoded()
+                if result_cache is not None:
+                    keys[i]=ResultCache.key("Qmio-tket",qasm,s,repetition_period,binary,self._load_calibrations().get_hash())
+                    br=result_cache.get(keys[i])
+                    if br is not None:
+                        self._logger.debug("Result of circuit %d read from the cache"%i)
+                        self.cached_results.add(keys[i])
+                        BR[i]=BackendResult.from_dict(br)
+                        continue
+                
+                if self._QPUBackend is None:
+                    self._logger.debug("Starting backend")
+                    self.connect()
+                
+                self._logger.debug("Running circuit %d for shots %s"%(i,s))
+                n_measures=c.n_gates_of_type(OpType.Measure)
+                remain_shots=s
+                chunks=[]
+                while True:
+                    shots=remain_shots if remain_shots is None else min(self._max_shots,remain_shots)
+                    results=self._QPUBackend.run(circuit=qasm, shots=shots, repetition_period=repetition_period, res_format="binary_count")
+                    if "Exception" in results:
+                        _store_decoded(True)
+                        raise QPUException(results["Exception"])
+                    self._logger.debug("Results: %s",results)
+                    chunks.append(decoder.submit(_decode_counts,results,n_measures))
+                    if remain_shots is None or remain_shots<=self._max_shots:
+                        break
+                    remain_shots-=self._max_shots
+                pending.append((i,decoder.submit(_decode,chunks,c)))
+            _store_decoded(True)
+        self._logger.debug("Returning: %s",BR)
         return BR
     
 def _process_circuits(
@@ -420,6 +654,12 @@ class Qmio(Backend):
         logging_level (int): flag to indicate the logging level. Better if use the :py:mod:`logging` package levels. Default :py:data:`logging.NOTSET`
             
         logging_filename (str):  Path to store the logging messages. Default *None*, i.e., output in stdout
+
+        compile_workers (int): number of worker processes used by :py:meth:`get_compiled_circuits`. Default *None*, i.e., the circuits are compiled in this process.
+
+        placement_cache (bool): if the placements of the optimisation level 2 are cached by the two-qubit interaction graph of the circuits and the calibrations, so the circuits with the same shape are placed only once. The circuits that reuse a cached map can be compiled differently than without the cache (see :py:func:`_cached_placement_pass`). Default False
+
+        result_cache (ResultCache): cache of the results used by :py:meth:`run_circuit` and :py:meth:`run_circuits`, or True to use :py:meth:`qmiotools.integrations.utils.ResultCache.default`. Default *None*, i.e., without cache. As :py:class:`pytket.backends.backendresult.BackendResult` has no metadata, the keys of the results read from the cache are added to the set ``cached_results``.
     
     It uses :py:class:`qmio.QmioRuntimeService` to submit circuits to the QPU. By default, the calibrations are read from the last JSON file in the directory set by environ variable QMIO_CALIBRATIONS, but accepts a direct filename to use instead of."""
     
@@ -441,12 +681,23 @@ class Qmio(Backend):
     _persistent_handles = False
     _backend_info=None
     _backend_version=VERSION
-    
-    def __init__(self, tunnel_time_limit: str=None, reservation_name: str=None, calibration_file: str = None, logging_level: int=logging.NOTSET, logging_filename: str=None, **kwargs):
+    _calibrations=None
+    _architecture=None
+    _mitigator=None
+    _pool=None
+    _pool_key=None
+    _placement_cache=False
+    _max_shots=MAX_SHOTS_PER_STEP
+    
+    def __init__(self, tunnel_time_limit: str=None, reservation_name: str=None, calibration_file: str = None, logging_level: int=logging.NOTSET, logging_filename: str=None, result_cache: ResultCache=None, compile_workers: int=None, placement_cache: bool=False, **kwargs):
         """Create a new instance of the class
         
         """
         self._calibration_file=calibration_file
+        self._result_cache=result_cache
+        self._compile_workers=compile_workers
+        self._placement_cache=placement_cache
+        self.cached_results=set()
         self._logger=logger
         self._QPUBackend=None
         self._tunnel_time_limit=tunnel_time_limit
@@ -477,6 +728,7 @@ class Qmio(Backend):
         super().__init__(**kwargs)
         
     backend_info=backend_info
+    _load_calibrations=_load_calibrations
     required_predicates = _required_predicates
     rebase_pass = auto_rebase_pass(_gateset)
     default_compilation_pass = _default_compilation_pass
@@ -486,6 +738,7 @@ class Qmio(Backend):
     process_circuit = _process_circuit
     run_circuit=_run_circuit
     run_circuits = _run_circuits
+    get_compiled_circuits = _get_compiled_circuits
     
     def connect(self):
         """
@@ -535,48 +788,104 @@ class Qmio(Backend):
         self._close()
         atexit.unregister(self.__exit__)
         
+    def _get_pool(self, workers: int, optimisation_level: int, options: Optional[Dict]) -> ProcessPoolExecutor:
+        calibration_file=self._load_calibrations().get_filename()
+        key=(workers,calibration_file,optimisation_level,None if options is None else sorted(options.items()),self._placement_cache)
+        if self._pool is None or self._pool_key!=key:
+            self.shutdown()
+            self._pool=ProcessPoolExecutor(max_workers=workers,mp_context=multiprocessing.get_context("spawn"),
+                                           initializer=_init_compile_worker,initargs=(calibration_file,optimisation_level,options,self._placement_cache))
+            self._pool_key=key
+        return self._pool
+
+    def shutdown(self):
+        """
+            Closes the pool of processes used by :py:meth:`get_compiled_circuits`.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool=None
+            self._pool_key=None
+
     def _close(self):
+        self.shutdown()
         self.disconnect()
         del self._QPUBackend
         self._QPUBackend=None
     
     
-    def draw_graph(self):
+    @property
+    def readout_mitigator(self) -> ReadoutMitigator:
         """
-        
-        Using matplotlib and networkx, plots the current connectivity of Qmio.
-
-
+            The :py:class:`qmiotools.integrations.utils.ReadoutMitigator` built from the readout fidelities of the calibrations. 
+            It can be replaced by one built from an on-device calibration run.
         """
-        import matplotlib.pyplot as plt 
+        if self._mitigator is None:
+            self._mitigator=ReadoutMitigator.from_calibrations(self._load_calibrations())
+        return self._mitigator
+    
+    @readout_mitigator.setter
+    def readout_mitigator(self, mitigator: ReadoutMitigator):
+        self._mitigator=mitigator
+    
+    def mitigate(self, result: BackendResult, circuit: Circuit, method: str = "inverse") -> Dict[Tuple[int, ...], float]:
+        """
+        Applies the readout-error mitigation of :attr:`readout_mitigator` to the counts of a result.
         
-        coupling_graph = nx.DiGraph(self.backend_info.architecture.coupling)
+        Args:
+            result: the result of the execution of the circuit.
+            circuit: the compiled circuit that was executed, to know the qubit measured in each bit.
+            method: "inverse" or "least_squares". See :py:meth:`qmiotools.integrations.utils.ReadoutMitigator.quasi_probabilities`
         
-        space=5
-        positions=[(1,2),(1,3),(1,4),(1,5),(1,6),
-            (2,6.5),(2,4.5),(2,2.5),
-            (3,1),(3,2),(3,3),(3,4),(3,5),
-            (4,5.5),(4,3.5),(4,1.5),
-            (5,1),(5,2),(5,3),(5,4),(5,5),(5,6),
-            (6,6.5),(6,4.5),(6,2.5),(6,1),
-            (7,1),(7,2),(7,3),(7,4),(7,5),(7,6)]
-        positions=QUBIT_POSITIONS
-        pos={}
-        for i in range(len(self.backend_info.architecture.nodes)):
-            pos.update({self.backend_info.architecture.nodes[i]:(positions[i][1]*0.5,positions[i][0]*2)})
+        Return:
+            A dictionary between the outcomes, with the same format of :py:meth:`pytket.backends.backendresult.BackendResult.get_distribution`, and their quasi-probabilities.
+        """
+        bits=sorted(result.c_bits, key=lambda b: result.c_bits[b])
+        measured={b: q for q, b in circuit.qubit_to_bit_map.items()}
+        qubits=[measured[b].index[0] if b in measured else None for b in bits]
         
-        options = {
-            "font_size": 36*5,
-            "node_size": 50000,
-            "node_color": "#7BC8F6",
-            "edgecolors": "black",
-            "linewidths": 5,
-            "arrowsize":200,
-            "arrowstyle":"-|>",
-            "width": 10,
-            "label":"QMIO - Not real yet"
-        }
-        fig = plt.figure(1, figsize=(200, 80))
+        counts={}
+        for outcome, count in result.get_counts(bits).items():
+            counts[sum(v << k for k, v in enumerate(outcome))]=count
         
-        nx.draw_networkx(coupling_graph, pos, arrows=True, labels={node: node.index[0] for node in coupling_graph.nodes()},**options)
- 
+        quasi=self.readout_mitigator.quasi_probabilities(counts, qubits, method)
+        n=len(bits)
+        return {tuple((key >> k) & 1 for k in range(n)): value for key, value in quasi.items()}
+    
+    def draw_graph(self, qubit_metric: Optional[str] = "readout", edge_metric: Optional[str] = "ecr", output: str = "svg", filename: str = None) -> Union[str,bytes]:
+        """
+        
+        Draws the connectivity of Qmio with heatmaps of the current calibrations, with :py:func:`qmiotools.integrations.utils.draw_coupling_map`.
+
+        Args:
+            qubit_metric (str): the metric of the qubits, ``t1``, ``t2``, ``readout`` or ``sx``. Default "readout". *None* draws the qubits without colors.
+            edge_metric (str): the metric of the couplers, ``ecr``. Default "ecr". *None* draws the couplers without colors.
+            output (str): the format, ``svg`` or ``png``. Default "svg"
+            filename (str): if not *None*, the file where the drawing is also written. Default *None*
+
+        Returns:
+            str or bytes: the SVG document or the PNG image.
+
+        """
+        return draw_coupling_map(self._load_calibrations(), qubit_metric, edge_metric, output, filename)
+
+
+class _QmioCompiler:
+    """
+        Builds the compilation passes of :class:`Qmio` from the architecture and the calibrations of a file, without creating a backend
+        (its logging handlers, exit handler and connection). Used in the worker processes of :py:meth:`Qmio.get_compiled_circuits`.
+    """
+    _1Qgateset=Qmio._1Qgateset
+    _gateset=Qmio._gateset
+    _backend_info=None
+    _calibrations=None
+    _architecture=None
+
+    def __init__(self, calibration_file: str, placement_cache: bool):
+        self._calibration_file=calibration_file
+        self._placement_cache=placement_cache
+        self._logger=logger
+
+    backend_info=backend_info
+    _load_calibrations=_load_calibrations
+    default_compilation_pass=_default_compilation_pass
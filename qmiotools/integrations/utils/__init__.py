@@ -9,8 +9,13 @@ Qmio utils
    :toctree: stubs/
 
    Calibrations
+   ReadoutMitigator
+   ResultCache
+   draw_coupling_map
 
 """
 
 from .calibrations import Calibrations
-
+from .mitigation import ReadoutMitigator
+from .resultcache import ResultCache
+from .visualization import draw_coupling_map
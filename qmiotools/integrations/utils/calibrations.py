@@ -3,6 +3,7 @@ import os
 import glob
 from collections import OrderedDict
 import json
+import hashlib
 
 from typing import Union, Optional, List
 
@@ -23,6 +24,12 @@ class Calibrations(OrderedDict):
     
     def get_filename(self) -> str:
         return self._calibration_file
+
+    def get_hash(self) -> str:
+        """
+            Returns the SHA-256 hash of the content of the calibrations, independent of the file where they were read.
+        """
+        return hashlib.sha256(json.dumps(self, sort_keys=True).encode()).hexdigest()
     
     def get_mapping(self) -> List:
         Q2Gates=self["Q2Gates(RB)"]
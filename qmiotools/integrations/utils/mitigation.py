@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .calibrations import Calibrations
+
+
+METHODS=["inverse","least_squares"]
+
+
+def _parse_key(key: Union[str,int]) -> int:
+    if isinstance(key,str):
+        if key.startswith("0x"):
+            return int(key,16)
+        return int(key.replace(" ",""),2)
+    return int(key)
+
+
+def _project_to_simplex(values: np.ndarray) -> np.ndarray:
+    """
+        Euclidean projection of a quasi-probability vector summing 1 onto the probability simplex, i.e., the closest
+        probability distribution in the least-squares sense.
+    """
+    u=np.sort(values)[::-1]
+    cssv=np.cumsum(u)-1.0
+    index=np.arange(1,len(u)+1)
+    rho=np.nonzero(u-cssv/index>0)[0][-1]
+    theta=cssv[rho]/(rho+1)
+    return np.maximum(values-theta,0.0)
+
+
+class ReadoutMitigator:
+    """
+    Readout-error mitigation using tensored (uncorrelated) per-qubit assignment matrices.
+
+    Each physical qubit *q* has a 2x2 assignment matrix ``A[i,j]``, the probability of reading *i* when the qubit was in *j*. The mitigated
+    quasi-probabilities are obtained applying the tensor product of the inverses only for the measured qubits. It is applied qubit by qubit
+    over the observed outcomes, so the cost depends on the number of different outcomes and not on :math:`2^n`.
+
+    Args:
+        assignment_matrices (dict): a dictionary between the physical qubit and its 2x2 assignment matrix.
+
+    **Example**::
+
+        from qmiotools.integrations.utils import Calibrations, ReadoutMitigator
+
+        mitigator=ReadoutMitigator.from_calibrations(Calibrations.import_last_calibration())
+        quasi=mitigator.quasi_probabilities({"00":480,"01":20,"11":500}, qubits=[3,4])
+    """
+
+    def __init__(self, assignment_matrices: Dict[int,np.ndarray]):
+        self._matrices={}
+        self._inverses={}
+        for q,m in assignment_matrices.items():
+            m=np.asarray(m,dtype=float)
+            self._matrices[q]=m
+            self._inverses[q]=np.linalg.inv(m)
+
+    @classmethod
+    def from_calibrations(cls, calibrations: Calibrations) -> ReadoutMitigator:
+        """
+        Builds the assignment matrices from the ``Fidelity readout`` of each qubit in the calibrations, assuming that the error is symmetric.
+
+        Args:
+            calibrations (Calibrations): the calibrations of Qmio.
+        """
+        matrices={}
+        for (q,),error in calibrations.get_measuring_errors().items():
+            matrices[q]=np.array([[1.0-error,error],[error,1.0-error]])
+        return cls(matrices)
+
+    @classmethod
+    def from_calibration_counts(cls, qubits: Sequence[int], counts0: Dict[Union[str,int],int], counts1: Dict[Union[str,int],int]) -> ReadoutMitigator:
+        """
+        Builds the assignment matrices from an on-device calibration run: the counts of the circuits that prepare all the qubits in
+        :math:`|0\\rangle` and all in :math:`|1\\rangle` (see :meth:`calibration_circuits`).
+
+        Args:
+            qubits (list): the physical qubit measured in each classical bit.
+            counts0 (dict): the counts with all the qubits prepared in :math:`|0\\rangle`. Keys can be hexadecimal or binary strings (or integers), with the classical bit 0 as the least significant bit.
+            counts1 (dict): the counts with all the qubits prepared in :math:`|1\\rangle`.
+        """
+        matrices={}
+        for k,q in enumerate(qubits):
+            m=np.zeros((2,2))
+            for j,counts in enumerate((counts0,counts1)):
+                keys=np.array([_parse_key(key) for key in counts],dtype=np.uint64)
+                vals=np.array(list(counts.values()),dtype=float)
+                ones=vals[((keys>>np.uint64(k))&np.uint64(1)).astype(bool)].sum()
+                m[1,j]=ones/vals.sum()
+                m[0,j]=1.0-m[1,j]
+            matrices[q]=m
+        return cls(matrices)
+
+    @staticmethod
+    def calibration_circuits(qubits: Sequence[int], num_qubits: int) -> List:
+        """
+        Returns the two Qiskit circuits for an on-device calibration of the given physical qubits: all in :math:`|0\\rangle` and all in
+        :math:`|1\\rangle`, measured in the same order. Their counts can be passed to :meth:`from_calibration_counts`.
+
+        Args:
+            qubits (list): the physical qubits to calibrate.
+            num_qubits (int): the number of qubits of the backend.
+        """
+        from qiskit.circuit import QuantumCircuit
+
+        circuits=[]
+        for name in ("cal_0","cal_1"):
+            c=QuantumCircuit(num_qubits,len(qubits),name=name)
+            if name=="cal_1":
+                c.x(list(qubits))
+            c.measure(list(qubits),list(range(len(qubits))))
+            circuits.append(c)
+        return circuits
+
+    @property
+    def qubits(self) -> List[int]:
+        return list(self._matrices.keys())
+
+    def assignment_matrix(self, qubit: int) -> np.ndarray:
+        return self._matrices[qubit]
+
+    def quasi_probabilities(self, counts: Dict[Union[str,int],int], qubits: Sequence[Optional[int]], method: str="inverse", threshold: Optional[float]=None) -> Dict[int,float]:
+        """
+        Applies the mitigation to a histogram.
+
+        Args:
+            counts (dict): the counts. Keys can be hexadecimal or binary strings (spaces are ignored) or integers, with the classical bit 0 as the least significant bit. At most 64 classical bits.
+            qubits (list): the physical qubit measured in each classical bit, or None if the classical bit is not mitigated.
+            method (str): "inverse" returns the quasi-probabilities obtained with the inverse of the assignment matrices. "least_squares" returns the closest probability distribution to them. Default "inverse".
+            threshold (float): quasi-probabilities with absolute value smaller than this value are discarded after each qubit, keeping the number of outcomes bounded for many qubits. Default *None*, i.e., 0.1/shots, below the resolution of the histogram.
+
+        Returns:
+            dict: a dictionary between the outcome (as an integer) and its quasi-probability.
+
+        Raises:
+            ValueError: if the method is not valid or a qubit has no assignment matrix.
+        """
+        if method not in METHODS:
+            raise ValueError("Method %s not in available methods:%s"%(method,METHODS))
+        if len(counts)==0:
+            return {}
+
+        keys=np.fromiter((_parse_key(k) for k in counts),dtype=np.uint64,count=len(counts))
+        vals=np.fromiter(counts.values(),dtype=float,count=len(counts))
+        shots=vals.sum()
+        vals=vals/shots
+        if threshold is None:
+            threshold=0.1/shots
+
+        for k,q in enumerate(qubits):
+            if q is None:
+                continue
+            if q not in self._inverses:
+                raise ValueError("Qubit %d has no assignment matrix"%q)
+            inv=self._inverses[q]
+            bit=np.uint64(1)<<np.uint64(k)
+            b=((keys>>np.uint64(k))&np.uint64(1)).astype(np.intp)
+            keys=np.concatenate((keys&~bit,keys|bit))
+            vals=np.concatenate((vals*inv[0,b],vals*inv[1,b]))
+            keys,inverse=np.unique(keys,return_inverse=True)
+            vals=np.bincount(inverse.ravel(),weights=vals)
+            keep=np.abs(vals)>threshold
+            keys=keys[keep]
+            vals=vals[keep]
+
+        if method=="least_squares":
+            vals=_project_to_simplex(vals)
+            keep=vals>0
+            keys=keys[keep]
+            vals=vals[keep]
+
+        return dict(zip(keys.tolist(),vals.tolist()))
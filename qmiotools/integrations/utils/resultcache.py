@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import time
+import os
+
+import numpy as np
+
+
+CACHE_DIR=os.getenv("QMIO_CACHE_DIR",os.path.join(os.path.expanduser("~"),".cache","qmiotools"))
+
+
+def _to_json(value):
+    # The arrays and the complex values (e.g. the IQ points of raw results) are tagged to be decoded by _from_json
+    if isinstance(value,np.ndarray):
+        return {"__ndarray__":value.tolist(),"dtype":value.dtype.str,"shape":list(value.shape)}
+    if isinstance(value,complex):
+        return {"__complex__":[value.real,value.imag]}
+    if isinstance(value,np.generic):
+        return value.item()
+    raise TypeError("Object of type %s is not JSON serializable"%type(value).__name__)
+
+
+def _from_json(record: Dict):
+    if "__ndarray__" in record:
+        return np.array(record["__ndarray__"],dtype=np.dtype(record["dtype"])).reshape(record["shape"])
+    if len(record)==1 and "__complex__" in record:
+        return complex(*record["__complex__"])
+    return record
+
+
+class ResultCache:
+    """
+    Content-addressed cache of results, to avoid running again the same program with the same parameters.
+
+    The keys are the SHA-256 hash of the program and the parameters that change its results (see :meth:`key`). The values are stored as JSON,
+    so each :meth:`get` returns a new copy. They can be made of dicts, lists, strings, numbers, complex numbers and :py:class:`numpy.ndarray`
+    (the tuples are returned as lists and the keys of the dicts must be strings). The entries are kept in memory with a least-recently-used
+    eviction and, if a directory is given, also on disk as ``<key>.json`` files, shared by all the processes that use the same directory.
+    As they are JSON, reading an entry written by another user of a shared directory can not execute code. The entries older than the
+    time to live are discarded.
+
+    Args:
+        directory (str): directory to store the entries on disk. Default *None*, i.e., only in memory.
+        ttl (float): time to live of the entries, in seconds. Default *None*, i.e., they do not expire.
+        max_entries (int): maximum number of entries, in memory and on disk. Default 256
+
+    **Example**::
+
+        from qmiotools.integrations.utils import ResultCache
+        from qmiotools.integrations.qiskitqmio import QmioBackend
+
+        cache=ResultCache(directory="results", ttl=3600)
+        backend=QmioBackend()
+        result=backend.run(circuit, shots=1000, result_cache=cache).result()
+    """
+
+    _default=None
+
+    def __init__(self, directory: str=None, ttl: float=None, max_entries: int=256):
+        self._directory=directory
+        self._ttl=ttl
+        self._max_entries=max_entries
+        self._entries=OrderedDict()
+        if directory is not None:
+            os.makedirs(directory,exist_ok=True)
+
+    @classmethod
+    def default(cls) -> ResultCache:
+        """
+            Returns the shared cache used when the option ``result_cache`` is True, stored in the directory ``results`` of QMIO_CACHE_DIR
+            (by default ~/.cache/qmiotools), with a time to live of one day.
+        """
+        if cls._default is None:
+            cls._default=cls(directory=os.path.join(CACHE_DIR,"results"),ttl=86400)
+        return cls._default
+
+    @staticmethod
+    def key(*parts) -> str:
+        """
+            Returns the key of the given parts (the program and its parameters), the SHA-256 hash of their representation.
+        """
+        h=hashlib.sha256()
+        for part in parts:
+            h.update(part.encode() if isinstance(part,str) else repr(part).encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _filename(self, key: str) -> str:
+        return os.path.join(self._directory,"%s.json"%key)
+
+    def _expired(self, created: float) -> bool:
+        return self._ttl is not None and time.time()-created>self._ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+            Returns a copy of the value stored with the key, or None if it is not stored or it has expired.
+        """
+        if key in self._entries:
+            created,data=self._entries[key]
+            if not self._expired(created):
+                self._entries.move_to_end(key)
+                return json.loads(data,object_hook=_from_json)
+            del self._entries[key]
+
+        if self._directory is not None:
+            filename=self._filename(key)
+            try:
+                created=os.path.getmtime(filename)
+                if self._expired(created):
+                    os.remove(filename)
+                    return None
+                with open(filename,"rb") as f:
+                    data=f.read()
+                value=json.loads(data,object_hook=_from_json)
+                # Only the access time is updated, the modification time is the creation of the entry
+                os.utime(filename,(time.time(),created))
+            except (OSError,ValueError,TypeError,KeyError):
+                return None
+            self._store(key,created,data)
+            return value
+        return None
+
+    def put(self, key: str, value: Any):
+        """
+            Stores a copy of the value with the key.
+
+            Raises:
+                TypeError: if the value can not be stored as JSON.
+        """
+        data=json.dumps(value,default=_to_json).encode()
+        self._store(key,time.time(),data)
+        if self._directory is not None:
+            filename=self._filename(key)
+            tmp="%s.%d.tmp"%(filename,os.getpid())
+            with open(tmp,"wb") as f:
+                f.write(data)
+            os.replace(tmp,filename)
+            self._evict_disk()
+
+    def _store(self, key: str, created: float, data: bytes):
+        self._entries[key]=(created,data)
+        self._entries.move_to_end(key)
+        while len(self._entries)>self._max_entries:
+            self._entries.popitem(last=False)
+
+    def _evict_disk(self):
+        files=[os.path.join(self._directory,f) for f in os.listdir(self._directory) if f.endswith(".json")]
+        if len(files)<=self._max_entries:
+            return
+        files.sort(key=lambda f: os.path.getatime(f) if os.path.exists(f) else 0.0)
+        for f in files[:len(files)-self._max_entries]:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+
+    def clear(self):
+        """
+            Removes all the entries, in memory and on disk.
+        """
+        self._entries.clear()
+        if self._directory is not None:
+            for f in os.listdir(self._directory):
+                if f.endswith(".json"):
+                    os.remove(os.path.join(self._directory,f))
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,243 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+from xml.sax.saxutils import escape
+import io
+
+import numpy as np
+
+from .calibrations import Calibrations
+from ...data import QUBIT_POSITIONS
+from ...exceptions import QmioException
+
+
+MAX_CACHED_DRAWINGS=32
+
+_drawings=OrderedDict()
+
+# Anchors of the viridis colormap, interpolated linearly
+_VIRIDIS=np.array([[68,1,84],[59,82,139],[33,145,140],[94,201,98],[253,231,37]],dtype=float)
+
+# Name of each metric: title, unit, scale from the calibration value and if the lower values are better
+QUBIT_METRICS={
+    "t1": ("T1","us",1e6,False),
+    "t2": ("T2","us",1e6,False),
+    "readout": ("Readout error","%",100.0,True),
+    "sx": ("SX error","%",100.0,True),
+}
+EDGE_METRICS={
+    "ecr": ("ECR error","%",100.0,True),
+}
+
+# Size of the drawing in pixels for each unit of the positions of the qubits
+_SCALE=70
+_MARGIN=50
+_RADIUS=17
+_LEGEND=60
+
+
+def _colors(values: np.ndarray, lower_is_better: bool) -> list:
+    """
+        Returns the hexadecimal colors of the values in the viridis colormap, with the best values in yellow.
+    """
+    if len(values)==0:
+        return []
+    low,high=values.min(),values.max()
+    t=(values-low)/(high-low) if high>low else np.full(len(values),0.5)
+    if lower_is_better:
+        t=1.0-t
+    x=np.linspace(0.0,1.0,len(_VIRIDIS))
+    rgb=np.stack([np.interp(t,x,_VIRIDIS[:,k]) for k in range(3)],axis=1).round().astype(int)
+    return ["#%02x%02x%02x"%tuple(c) for c in rgb]
+
+
+def _dark(color: str) -> bool:
+    r,g,b=(int(color[k:k+2],16) for k in (1,3,5))
+    return 0.299*r+0.587*g+0.114*b<128
+
+
+def _qubit_values(calibrations: Calibrations, metric: Optional[str]) -> Dict[int,float]:
+    if metric is None:
+        return {}
+    scale=QUBIT_METRICS[metric][2]
+    if metric=="readout":
+        return {k[0]:v*scale for k,v in calibrations.get_measuring_errors().items()}
+    if metric=="sx":
+        return {k[0]:v*scale for k,v in calibrations.get_1Q_errors().items()}
+    field="T1 (s)" if metric=="t1" else "T2 (s)"
+    return {int(k[2:-1]):v[field]*scale for k,v in calibrations.get_qubits().items()}
+
+
+def _layout(qubits: list) -> Dict[int,Tuple[float,float]]:
+    """
+        Returns the position in pixels of each qubit, from :py:data:`qmiotools.data.QUBIT_POSITIONS`. The qubits without a position are
+        placed in a row below the others.
+    """
+    known=[QUBIT_POSITIONS[q] for q in qubits if q<len(QUBIT_POSITIONS)]
+    xs=[p[0] for p in known] or [0.0]
+    ys=[p[1] for p in known] or [0.0]
+    x0,y0=min(xs),min(ys)
+    positions={}
+    extra=0
+    for q in qubits:
+        if q<len(QUBIT_POSITIONS):
+            x,y=QUBIT_POSITIONS[q]
+        else:
+            x,y=x0+extra,max(ys)+1
+            extra+=1
+        positions[q]=(_MARGIN+(x-x0)*_SCALE,_MARGIN+(y-y0)*_SCALE)
+    return positions
+
+
+def _legend(x: float, y: float, width: float, title: str, unit: str, values: np.ndarray, lower_is_better: bool, gradient: str) -> list:
+    stops=_colors(np.linspace(0.0,1.0,len(_VIRIDIS)),lower_is_better)
+    svg=['<defs><linearGradient id="%s">'%gradient]
+    svg+=['<stop offset="%.2f" stop-color="%s"/>'%(k/(len(stops)-1),c) for k,c in enumerate(stops)]
+    svg.append('</linearGradient></defs>')
+    svg.append('<rect x="%.1f" y="%.1f" width="%.1f" height="10" fill="url(#%s)"/>'%(x,y,width,gradient))
+    svg.append('<text x="%.1f" y="%.1f">%s (%s)</text>'%(x,y-5,escape(title),escape(unit)))
+    svg.append('<text x="%.1f" y="%.1f">%.3g</text>'%(x,y+24,values.min()))
+    svg.append('<text x="%.1f" y="%.1f" text-anchor="end">%.3g</text>'%(x+width,y+24,values.max()))
+    return svg
+
+
+def _svg(calibrations: Calibrations, qubit_metric: Optional[str], edge_metric: Optional[str]) -> str:
+    qubits=sorted(int(k[2:-1]) for k in calibrations.get_qubits())
+    values=_qubit_values(calibrations,qubit_metric)
+    edges=calibrations.get_2Q_errors()
+    positions=_layout(qubits)
+    width=max(x for x,_ in positions.values())+_MARGIN
+    height=max(y for _,y in positions.values())+_MARGIN
+    legends=int(qubit_metric is not None)+int(edge_metric is not None)
+
+    svg=['<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" viewBox="0 0 %d %d" font-family="sans-serif" font-size="11">'
+         %(width,height+legends*_LEGEND,width,height+legends*_LEGEND)]
+    svg.append('<defs><marker id="qmio-arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="6" markerHeight="6" orient="auto">'
+               '<path d="M0,0 L10,5 L0,10 z" fill="#444"/></marker></defs>')
+    svg.append('<rect width="100%" height="100%" fill="white"/>')
+
+    # The couplers, from the control to the target, stopping at the border of the circles
+    pairs=[p for p in edges if p[0] in positions and p[1] in positions]
+    colors=_colors(np.array([edges[p] for p in pairs]),True) if edge_metric is not None else ["#444"]*len(pairs)
+    for (control,target),color in zip(pairs,colors):
+        (x1,y1),(x2,y2)=positions[control],positions[target]
+        d=max(np.hypot(x2-x1,y2-y1),1e-9)
+        ux,uy=(x2-x1)/d,(y2-y1)/d
+        title="ECR %d-%d: error %.3g%%"%(control,target,edges[control,target]*100)
+        svg.append('<line x1="%.1f" y1="%.1f" x2="%.1f" y2="%.1f" stroke="%s" stroke-width="%d" marker-end="url(#qmio-arrow)"><title>%s</title></line>'
+                   %(x1+ux*_RADIUS,y1+uy*_RADIUS,x2-ux*_RADIUS,y2-uy*_RADIUS,color,5 if edge_metric is not None else 2,title))
+
+    colors=_colors(np.array([values[q] for q in qubits if q in values]),QUBIT_METRICS[qubit_metric][3]) if qubit_metric is not None else []
+    colors=dict(zip([q for q in qubits if q in values],colors))
+    for q in qubits:
+        x,y=positions[q]
+        title="Qubit %d"%q
+        if q in values:
+            name,unit=QUBIT_METRICS[qubit_metric][:2]
+            title+=": %s %.3g %s"%(name,values[q],unit)
+        fill=colors.get(q,"#7BC8F6")
+        text="white" if _dark(fill) else "black"
+        svg.append('<g><title>%s</title><circle cx="%.1f" cy="%.1f" r="%d" fill="%s" stroke="black"/>'
+                   '<text x="%.1f" y="%.1f" text-anchor="middle" fill="%s">%d</text></g>'%(escape(title),x,y,_RADIUS,fill,x,y+4,text,q))
+
+    y=height+20
+    if qubit_metric is not None:
+        svg+=_legend(_MARGIN,y,width-2*_MARGIN,*QUBIT_METRICS[qubit_metric][:2],np.array(list(values.values())),QUBIT_METRICS[qubit_metric][3],"qmio-qubits")
+        y+=_LEGEND
+    if edge_metric is not None:
+        svg+=_legend(_MARGIN,y,width-2*_MARGIN,*EDGE_METRICS[edge_metric][:2],np.array([edges[p]*100 for p in pairs]),True,"qmio-edges")
+    svg.append('</svg>')
+    return "".join(svg)
+
+
+def _png(calibrations: Calibrations, qubit_metric: Optional[str], edge_metric: Optional[str], dpi: int) -> bytes:
+    """
+        Draws the coupling map and the colors of :func:`_svg` with matplotlib, imported only here, without pyplot.
+    """
+    try:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+    except ImportError as e:
+        raise QmioException("The PNG output needs matplotlib. Install it with 'pip install matplotlib' or use output='svg'") from e
+
+    qubits=sorted(int(k[2:-1]) for k in calibrations.get_qubits())
+    values=_qubit_values(calibrations,qubit_metric)
+    edges=calibrations.get_2Q_errors()
+    positions=_layout(qubits)
+    width=max(x for x,_ in positions.values())+_MARGIN
+    height=max(y for _,y in positions.values())+_MARGIN
+
+    figure=Figure(figsize=(width/100,height/100),dpi=dpi)
+    FigureCanvasAgg(figure)
+    axes=figure.add_axes([0,0,1,1])
+    axes.set_xlim(0,width)
+    axes.set_ylim(height,0)
+    axes.set_aspect("equal")
+    axes.axis("off")
+    pairs=[p for p in edges if p[0] in positions and p[1] in positions]
+    colors=_colors(np.array([edges[p] for p in pairs]),True) if edge_metric is not None else ["#444"]*len(pairs)
+    for (control,target),color in zip(pairs,colors):
+        (x1,y1),(x2,y2)=positions[control],positions[target]
+        axes.annotate("",xy=(x2,y2),xytext=(x1,y1),arrowprops=dict(arrowstyle="-|>",color=color,lw=3 if edge_metric is not None else 1.5,
+                                                                   shrinkA=_RADIUS*0.75,shrinkB=_RADIUS*0.75))
+    measured=[q for q in qubits if q in values]
+    colors=dict(zip(measured,_colors(np.array([values[q] for q in measured]),QUBIT_METRICS[qubit_metric][3]))) if qubit_metric is not None else {}
+    xs=[positions[q][0] for q in qubits]
+    ys=[positions[q][1] for q in qubits]
+    axes.scatter(xs,ys,s=(_RADIUS*1.5)**2,c=[colors.get(q,"#7BC8F6") for q in qubits],edgecolors="black",zorder=2)
+    for q in qubits:
+        axes.text(positions[q][0],positions[q][1],str(q),ha="center",va="center",fontsize=7,zorder=3,
+                  color="white" if q in colors and _dark(colors[q]) else "black")
+    buffer=io.BytesIO()
+    figure.savefig(buffer,format="png",dpi=dpi)
+    return buffer.getvalue()
+
+
+def draw_coupling_map(calibrations: Calibrations, qubit_metric: Optional[str]="readout", edge_metric: Optional[str]="ecr",
+                      output: str="svg", filename: str=None, dpi: int=100) -> Union[str,bytes]:
+    """
+    Draws the coupling map of Qmio with heatmaps of the calibrations: the qubits are colored by a metric of each qubit and the couplers,
+    drawn from the control to the target, by their ECR error. The best values are drawn in yellow and the worst in purple.
+
+    The SVG is written directly as text, with the values in the tooltips of the qubits and couplers, so it does not need matplotlib.
+    The PNG is drawn with matplotlib, imported the first time it is requested (a :class:`QmioException` is raised if it is not installed). The drawings are cached by the hash of the calibrations
+    and the arguments, so drawing the same calibrations again does not render them.
+
+    Args:
+        calibrations (Calibrations): the calibrations to draw.
+        qubit_metric (str): the metric of the qubits, ``t1``, ``t2`` (in microseconds), ``readout`` or ``sx`` (errors in %). Default "readout". *None* draws the qubits without colors.
+        edge_metric (str): the metric of the couplers, ``ecr`` (error in %). Default "ecr". *None* draws the couplers without colors.
+        output (str): the format, ``svg`` or ``png``. Default "svg"
+        filename (str): if not *None*, the file where the drawing is also written. Default *None*
+        dpi (int): the resolution of the PNG. Default 100
+
+    Returns:
+        str or bytes: the SVG document or the PNG image.
+
+    **Example**::
+
+        from IPython.display import SVG
+        from qmiotools.integrations.qiskitqmio import QmioBackend
+
+        backend=QmioBackend()
+        SVG(backend.draw_graph(qubit_metric="t1"))
+    """
+    if output not in ("svg","png"):
+        raise QmioException("Output %s not in available formats: ['svg', 'png']"%output)
+    if qubit_metric is not None and qubit_metric not in QUBIT_METRICS:
+        raise QmioException("Qubit metric %s not in available metrics: %s"%(qubit_metric,list(QUBIT_METRICS)))
+    if edge_metric is not None and edge_metric not in EDGE_METRICS:
+        raise QmioException("Edge metric %s not in available metrics: %s"%(edge_metric,list(EDGE_METRICS)))
+    key=(calibrations.get_hash(),qubit_metric,edge_metric,output,dpi if output=="png" else None)
+    drawing=_drawings.get(key)
+    if drawing is None:
+        drawing=_svg(calibrations,qubit_metric,edge_metric) if output=="svg" else _png(calibrations,qubit_metric,edge_metric,dpi)
+        _drawings[key]=drawing
+        if len(_drawings)>MAX_CACHED_DRAWINGS:
+            _drawings.popitem(last=False)
+    else:
+        _drawings.move_to_end(key)
+    if filename is not None:
+        with open(filename,"w" if output=="svg" else "wb") as f:
+            f.write(drawing)
+    return drawing
@@ -0,0 +1,26 @@
+import os
+import json
+import random
+import tempfile
+
+# The qmio client reads the address of the QPU when it is imported and the backends load the last calibrations of
+# QMIO_CALIBRATIONS, so both are set before the tests import qmiotools. The calibrations are synthetic, with the
+# 32 qubits and the couplers of Qmio.
+os.environ.setdefault("ZMQ_SERVER","tcp://localhost:5555")
+
+if "QMIO_CALIBRATIONS" not in os.environ:
+    rng=random.Random(1)
+    qubits={}
+    q1gates={}
+    q2gates={}
+    for i in range(32):
+        qubits["q[%d]"%i]={"T1 (s)":50e-6+rng.random()*1e-5,"T2 (s)":30e-6+rng.random()*1e-5,"Drive Frequency (Hz)":4.5e9+i*1e7,
+                           "Fidelity readout":0.9+0.09*rng.random(),"Readout duration (s)":2e-6}
+        q1gates["q[%d]"%i]={"SX":{"Fidelity(RB)":0.999-0.001*rng.random(),"Gate duration (s)":4e-8}}
+    edges=[(i,i+1) if i%2 else (i+1,i) for i in range(31)]+[(0,8),(10,3),(12,20),(22,14)]
+    for c,t in edges:
+        q2gates["q[%d]-q[%d]"%(c,t)]={"ECR":{"Control":c,"Target":t,"Fidelity(RB)":0.97+0.02*rng.random(),"Duration (s)":5e-7}}
+    directory=tempfile.mkdtemp(prefix="qmiotools-calibrations-")
+    with open(os.path.join(directory,"2025_01_01__00_00_00.json"),"w") as f:
+        json.dump({"Qubits":qubits,"Q1Gates":q1gates,"Q2Gates(RB)":q2gates},f)
+    os.environ["QMIO_CALIBRATIONS"]=directory
@@ -0,0 +1,180 @@
+import os
+
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from qiskit.circuit import QuantumCircuit
+from qiskit_aer.noise import amplitude_damping_error
+
+import qmiotools.integrations.qiskitqmio.fakeqmio as fakeqmio
+from qmiotools.integrations.qiskitqmio import FakeQmio, QmioJob
+
+
+def _noise_files(directory):
+    return [f for f in os.listdir(directory) if f.startswith("noise_model_")] if os.path.isdir(directory) else []
+
+
+def test_memory_cache_by_default(tmp_path,monkeypatch):
+    monkeypatch.setattr(fakeqmio,"CACHE_DIR",str(tmp_path))
+    backend=FakeQmio()
+    circuit=QuantumCircuit(2,2)
+    circuit.sx(0)
+    circuit.ecr(0,1)
+    circuit.measure([0,1],[0,1])
+    backend.run(circuit,shots=100,seed_simulator=1).result()
+    assert _noise_files(str(tmp_path))==[]
+    assert FakeQmio()._noise_model is backend._noise_model
+
+
+def test_disk_cache(tmp_path,monkeypatch):
+    monkeypatch.setattr(fakeqmio,"CACHE_DIR",str(tmp_path))
+    monkeypatch.setattr(fakeqmio,"MAX_DISK_NOISE_MODELS",2)
+    fakeqmio._noise_models.clear()
+    for temperature in (0,10,20):
+        FakeQmio(temperature=temperature,disk_cache=True)
+    assert len(_noise_files(str(tmp_path)))==2
+    fakeqmio._noise_models.clear()
+    assert FakeQmio(temperature=20,disk_cache=True)._noise_model is not None
+
+
+def test_quantum_errors():
+    backend=FakeQmio(gate_error=True)
+    errors=fakeqmio._quantum_errors(backend._noise_model)
+    assert len(errors)>0
+    assert all(isinstance(e,fakeqmio.QuantumError) for e in errors)
+
+
+@pytest.fixture(scope="module")
+def noisy():
+    return FakeQmio(gate_error=True,readout_error=True)
+
+
+def _coupler(backend, minimum=3):
+    return [e for e in backend.target.build_coupling_map().get_edges() if min(e)>=minimum][0]
+
+
+def _pair_circuit(backend):
+    control,target=_coupler(backend)
+    circuit=QuantumCircuit(backend.num_qubits,2)
+    circuit.sx(control)
+    circuit.rz(0.3,control)
+    circuit.sx(control)
+    circuit.ecr(control,target)
+    circuit.barrier()
+    circuit.measure([control,target],[0,1])
+    return circuit
+
+
+def test_options_off_by_default(noisy):
+    assert not noisy._restrict_qubits
+    assert not noisy._auto_method
+    circuit=_pair_circuit(noisy)
+    assert isinstance(noisy.run(circuit,shots=10),QmioJob)
+    assert isinstance(noisy.run(circuit,shots=10,restrict_qubits=True,auto_method=True),QmioJob)
+
+
+def test_compact_circuit(noisy):
+    circuit=_pair_circuit(noisy)
+    active=fakeqmio._active_qubits(circuit)
+    assert active==tuple(sorted(_coupler(noisy)))
+    compact=fakeqmio._compact_circuit(circuit,active)
+    assert compact.num_qubits==2
+    assert compact.num_clbits==circuit.num_clbits
+    assert [i.operation.name for i in compact.data]==[i.operation.name for i in circuit.data]
+    assert compact.data[4].operation.num_qubits==2
+
+
+def test_restrict_target(noisy):
+    active=tuple(sorted(_coupler(noisy)))
+    target=fakeqmio._restrict_target(noisy.target,active)
+    assert target.num_qubits==2
+    assert set(target["ecr"].keys())=={tuple(active.index(q) for q in _coupler(noisy))}
+    for i,q in enumerate(active):
+        assert target["sx"][(i,)]==noisy.target["sx"][(q,)]
+        assert target.qubit_properties[i]==noisy.target.qubit_properties[q]
+
+
+@pytest.mark.parametrize("method",["statevector","density_matrix"])
+def test_restricted_counts(noisy, method):
+    circuit=_pair_circuit(noisy)
+    restricted=noisy.run(circuit,shots=2000,seed_simulator=5,method=method,restrict_qubits=True).result()
+    full=noisy.run(circuit,shots=2000,seed_simulator=5,method=method,restrict_qubits=False).result()
+    assert restricted.get_counts()==full.get_counts()
+
+
+def _chain(n, clifford):
+    circuit=QuantumCircuit(n,n)
+    circuit.sx(0)
+    for i in range(n-1):
+        circuit.rz(np.pi/2 if clifford else 0.3,i)
+        circuit.ecr(i,i+1)
+    circuit.measure(range(n),range(n))
+    return circuit
+
+
+def test_select_method(noisy):
+    ideal=FakeQmio(thermal_relaxation=False)._noise_model
+    noise,key=noisy._noise_model,noisy._noise_key
+    select=fakeqmio._select_method
+    assert select(_chain(4,False),4,noise,key,10000,False)==("density_matrix",False)
+    assert select(_chain(4,True),4,ideal,None,10000,False)==("stabilizer",False)
+    # With T2<=T1 the thermal relaxation of Aer is a mixture of identity, Z and reset, so the noise of the calibrations is Clifford
+    assert select(_chain(4,True),4,noise,key,10,False)==("stabilizer",False)
+    damping=fakeqmio.NoiseModel()
+    damping.add_all_qubit_quantum_error(amplitude_damping_error(0.01),["sx"])
+    assert select(_chain(4,True),4,damping,None,10,True)==("stabilizer",True)
+    assert select(_chain(4,True),4,damping,None,10,False)==("statevector",False)
+    assert select(_chain(24,False),24,noise,key,10,False)==("matrix_product_state",False)
+    circuit=_chain(24,False)
+    for i in range(0,24,2):
+        circuit.ecr(i,23-i)
+    assert select(circuit,24,noise,key,10,False)==("statevector",False)
+
+
+def test_auto_method_metadata(noisy):
+    circuit=_pair_circuit(noisy)
+    result=noisy.run(circuit,shots=10000,seed_simulator=1,auto_method=True,restrict_qubits=True).result()
+    assert result.results[0].metadata["method"]=="density_matrix"
+
+
+def test_merge_counts():
+    merged=fakeqmio._merge_counts([{"0x0":3,"0x1":2},{},{"0x1":5,"0x3":1}])
+    assert merged=={"0x0":3,"0x1":7,"0x3":1}
+    assert fakeqmio._merge_counts([{},{}])=={}
+
+
+@pytest.fixture(scope="module")
+def sharded():
+    backend=FakeQmio(gate_error=True,readout_error=True)
+    yield backend
+    backend.shutdown()
+
+
+def test_sharded_shots(sharded):
+    circuit=_pair_circuit(sharded)
+    result=sharded.run([circuit,circuit],shots=1001,seed_simulator=3,processes=3,memory=True).result()
+    for k in range(2):
+        experiment=result.results[k]
+        # The shards add up to the requested shots, in the counts and in the memory
+        assert experiment.shots==1001 and sum(experiment.metadata["shards"])==1001 and len(experiment.metadata["shards"])==3
+        assert sum(result.get_counts(k).values())==1001
+        assert len(result.get_memory(k))==1001
+        assert Counter(result.get_memory(k))==result.get_counts(k)
+    # More processes than shots leaves no empty shard
+    small=sharded.run(circuit,shots=2,seed_simulator=3,processes=3).result()
+    assert small.results[0].metadata["shards"]==[1,1] and sum(small.get_counts().values())==2
+
+
+def test_sharded_seed(sharded):
+    circuit=_pair_circuit(sharded)
+    first=sharded.run(circuit,shots=2000,seed_simulator=9,processes=2,memory=True).result()
+    second=sharded.run(circuit,shots=2000,seed_simulator=9,processes=2,memory=True).result()
+    # The shards use the seeds derived from the master seed, so the same seed and processes give the same shots
+    assert first.results[0].metadata["shard_seeds"]==second.results[0].metadata["shard_seeds"]
+    assert first.get_memory()==second.get_memory()
+    assert first.get_counts()==second.get_counts()
+    other=sharded.run(circuit,shots=2000,seed_simulator=10,processes=2,memory=True).result()
+    assert other.get_memory()!=first.get_memory()
+    assert len(first.get_counts())>1
@@ -0,0 +1,54 @@
+import numpy as np
+
+from qiskit import transpile
+from qiskit.circuit import ClassicalRegister, Parameter, QuantumCircuit, QuantumRegister
+from qiskit.circuit.library import RXGate
+from qiskit.providers.fake_provider import GenericBackendV2
+
+from qmiotools.integrations.qiskitqmio import FlattenCircuit
+from qmiotools.integrations.qiskitqmio.flattencircuit import circuit_fingerprint
+
+
+def _circuit():
+    theta=Parameter("theta")
+    circuit=QuantumCircuit(QuantumRegister(2,"q"),ClassicalRegister(1,"a"),ClassicalRegister(1,"b"))
+    circuit.rx(theta,0)
+    circuit.cx(0,1)
+    circuit.measure(0,0)
+    circuit.measure(1,1)
+    return circuit,theta
+
+
+def test_flatten():
+    circuit,_=_circuit()
+    circuit.global_phase=0.5
+    flat=FlattenCircuit(circuit)
+    assert len(flat.cregs)==1 and flat.num_clbits==2
+    assert flat.clbits==circuit.clbits and flat.data==circuit.data
+    assert flat.global_phase==0.5 and flat.name==circuit.name
+
+
+def test_flatten_keeps_layout():
+    circuit,theta=_circuit()
+    isa=transpile(circuit.assign_parameters({theta:0.3}),GenericBackendV2(4,seed=1),seed_transpiler=1)
+    flat=FlattenCircuit(isa)
+    assert flat.layout==isa.layout and flat.layout is not None
+    assert [flat.find_bit(i.clbits[0]).index for i in flat.data if i.name=="measure"]==[0,1]
+
+
+def test_flatten_in_place_edits():
+    circuit,theta=_circuit()
+    circuit.assign_parameters({theta:0.9},inplace=True)
+    assert FlattenCircuit(circuit).data[0].operation.params==[0.9]
+    circuit.data[0]=circuit.data[0].replace(operation=RXGate(0.1))
+    assert FlattenCircuit(circuit).data[0].operation.params==[0.1]
+    circuit.data[1]=circuit.data[1].replace(qubits=(circuit.qubits[1],circuit.qubits[0]))
+    assert FlattenCircuit(circuit).data[1].qubits==(circuit.qubits[1],circuit.qubits[0])
+
+
+def test_fingerprint():
+    circuit,theta=_circuit()
+    a=circuit_fingerprint(circuit)
+    assert a==circuit_fingerprint(circuit.copy())
+    circuit.assign_parameters({theta:np.pi},inplace=True)
+    assert a!=circuit_fingerprint(circuit)
@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pytest
+
+from qmiotools.exceptions import QmioException
+from qmiotools.integrations.qiskitqmio import JobJournal
+
+
+def test_complex_results(tmp_path):
+    journal=JobJournal(str(tmp_path),"job")
+    journal.start(["OPENQASM 2.0;"],shots=10)
+    iq=np.array([[1+2j,-0.5j],[3.0+0j,0.25-1j]])
+    journal.record(0,0,{"results":{"c":iq},"execution_metrics":{"shots":np.int64(10)}})
+    resumed=JobJournal(str(tmp_path),"job")
+    results=resumed.get(0,0)
+    assert np.array_equal(np.asarray(results["results"]["c"]),iq)
+    assert np.asarray(results["results"]["c"]).dtype==complex
+    assert results["execution_metrics"]=={"shots":10}
+
+
+def test_truncated_line(tmp_path):
+    journal=JobJournal(str(tmp_path),"job")
+    journal.start(["OPENQASM 2.0;"],shots=10)
+    journal.record(0,0,{"results":{"c":{"00":5}}})
+    journal.record(0,1,{"results":{"c":{"11":5}}})
+    valid=os.path.getsize(journal.filename)
+    # A crash while writing the third record leaves half a line
+    with open(journal.filename,"a") as f:
+        f.write('{"program": 0, "chunk": 2, "resu')
+    resumed=JobJournal(str(tmp_path),"job")
+    assert len(resumed)==2 and resumed.get(0,1)=={"results":{"c":{"11":5}}} and resumed.get(0,2) is None
+    assert os.path.getsize(journal.filename)==valid
+    # The next records are appended after the last valid line
+    resumed.start(["OPENQASM 2.0;"],shots=10)
+    resumed.record(0,2,{"results":{"c":{"01":5}}})
+    assert JobJournal(str(tmp_path),"job").get(0,2)=={"results":{"c":{"01":5}}}
+
+
+def test_header_mismatch(tmp_path):
+    JobJournal(str(tmp_path),"job").start(["OPENQASM 2.0;"],shots=10,memory=False)
+    resumed=JobJournal(str(tmp_path),"job")
+    assert resumed.header["programs"]==[JobJournal.program_hash("OPENQASM 2.0;")]
+    resumed.start(["OPENQASM 2.0;"],shots=10,memory=False)
+    with pytest.raises(QmioException,match="other programs or options"):
+        resumed.start(["OPENQASM 2.0;"],shots=20,memory=False)
+    with pytest.raises(QmioException,match="other programs or options"):
+        resumed.start(["OPENQASM 3.0;"],shots=10,memory=False)
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from qmiotools.integrations.utils import Calibrations
+from qmiotools.integrations.utils.mitigation import ReadoutMitigator
+
+
+MATRICES={3:np.array([[0.95,0.08],[0.05,0.92]]),7:np.array([[0.9,0.2],[0.1,0.8]])}
+
+
+def _exact(counts, qubits, matrices):
+    # The inverse of the full tensor product, with the classical bit 0 as the least significant bit
+    full=np.ones((1,1))
+    for q in qubits:
+        full=np.kron(matrices[q],full)
+    p=np.zeros(2**len(qubits))
+    for k,v in counts.items():
+        p[int(k,2)]=v
+    return np.linalg.solve(full,p/p.sum())
+
+
+def test_inverse_is_exact():
+    counts={"00":400,"01":100,"10":150,"11":350}
+    quasi=ReadoutMitigator(MATRICES).quasi_probabilities(counts,[3,7],threshold=0)
+    exact=_exact(counts,[3,7],MATRICES)
+    assert np.allclose([quasi.get(k,0.0) for k in range(4)],exact)
+    assert sum(quasi.values())==pytest.approx(1.0)
+
+
+def test_keys_and_unmitigated_bits():
+    mitigator=ReadoutMitigator(MATRICES)
+    binary=mitigator.quasi_probabilities({"0 10":30,"1 01":70},[3,None,7],threshold=0)
+    # The same histogram with hexadecimal and integer keys
+    assert mitigator.quasi_probabilities({"0x2":30,"0x5":70},[3,None,7],threshold=0)==pytest.approx(binary)
+    assert mitigator.quasi_probabilities({2:30,5:70},[3,None,7],threshold=0)==pytest.approx(binary)
+    # The classical bit 1 is not mitigated, so it keeps its value in every outcome
+    marginal={}
+    for k,v in binary.items():
+        marginal[(k>>1)&1]=marginal.get((k>>1)&1,0.0)+v
+    assert marginal==pytest.approx({1:0.3,0:0.7})
+
+
+def test_least_squares():
+    counts={"00":490,"01":3,"10":2,"11":505}
+    mitigator=ReadoutMitigator(MATRICES)
+    inverse=mitigator.quasi_probabilities(counts,[3,7],threshold=0)
+    assert min(inverse.values())<0
+    probabilities=mitigator.quasi_probabilities(counts,[3,7],method="least_squares",threshold=0)
+    assert all(v>0 for v in probabilities.values())
+    assert sum(probabilities.values())==pytest.approx(1.0)
+    # It is the projection onto the simplex, so the kept quasi-probabilities move by the same shift
+    assert len({round(inverse[k]-v,12) for k,v in probabilities.items()})==1
+
+
+def test_pruning():
+    mitigator=ReadoutMitigator({q:np.array([[0.98,0.03],[0.02,0.97]]) for q in range(10)})
+    counts={"0"*10:900,"1"*10:100}
+    full=mitigator.quasi_probabilities(counts,list(range(10)),threshold=0)
+    assert len(full)==2**10
+    pruned=mitigator.quasi_probabilities(counts,list(range(10)),threshold=1e-3)
+    assert len(pruned)<len(full) and all(abs(v)>1e-3 for v in pruned.values())
+    # The large quasi-probabilities are kept with their values
+    for k in (0,2**10-1):
+        assert pruned[k]==pytest.approx(full[k],abs=1e-2)
+    # The default threshold is 0.1/shots
+    assert all(abs(v)>0.1/1000 for v in mitigator.quasi_probabilities(counts,list(range(10))).values())
+
+
+def test_from_calibration_counts():
+    qubits=[3,7]
+    circuits=ReadoutMitigator.calibration_circuits(qubits,8)
+    assert [c.name for c in circuits]==["cal_0","cal_1"]
+    assert circuits[1].count_ops()["x"]==2 and circuits[0].num_clbits==2
+    # 5% of the shots flip the bit 0 (qubit 3) and 10% flip the bit 1 (qubit 7)
+    counts0={"00":855,"01":45,"10":95,"11":5}
+    counts1={"11":855,"10":45,"01":95,"00":5}
+    mitigator=ReadoutMitigator.from_calibration_counts(qubits,counts0,counts1)
+    assert mitigator.qubits==qubits
+    assert np.allclose(mitigator.assignment_matrix(3),[[0.95,0.05],[0.05,0.95]])
+    assert np.allclose(mitigator.assignment_matrix(7),[[0.9,0.1],[0.1,0.9]])
+    # Mitigating the calibration counts gives the prepared states
+    assert mitigator.quasi_probabilities(counts1,qubits)==pytest.approx({3:1.0})
+
+
+def test_from_calibrations():
+    calibrations=Calibrations.import_last_calibration()
+    mitigator=ReadoutMitigator.from_calibrations(calibrations)
+    errors=calibrations.get_measuring_errors()
+    assert sorted(mitigator.qubits)==sorted(q for (q,) in errors)
+    q,=next(iter(errors))
+    assert np.allclose(mitigator.assignment_matrix(q),[[1-errors[(q,)],errors[(q,)]],[errors[(q,)],1-errors[(q,)]]])
+
+
+def test_errors():
+    mitigator=ReadoutMitigator(MATRICES)
+    with pytest.raises(ValueError,match="Method"):
+        mitigator.quasi_probabilities({"0":1},[3],method="other")
+    with pytest.raises(ValueError,match="Qubit 5"):
+        mitigator.quasi_probabilities({"0":1},[5])
+    assert mitigator.quasi_probabilities({},[3])=={}
@@ -0,0 +1,45 @@
+import pytest
+
+from qiskit import pulse
+from qiskit.circuit import Parameter
+
+from qmiotools.integrations.qiskitqmio.opexporter import OPExporter
+
+
+def _block(duration=160, sigma=40):
+    amp=Parameter("amp")
+    phase=Parameter("phase")
+    with pulse.build() as block:
+        pulse.play(pulse.Drag(duration,amp,sigma,0.1),pulse.DriveChannel(0))
+        pulse.shift_phase(phase,pulse.DriveChannel(0))
+        pulse.play(pulse.Gaussian(duration,amp,sigma),pulse.DriveChannel(1))
+    return block,amp,phase
+
+
+@pytest.mark.parametrize("minify",[False,True])
+def test_schedule_block_sweep(minify):
+    block,amp,phase=_block()
+    exporter=OPExporter()
+    values={amp:[0.125,0.25,0.375,0.5],phase:[0.25,0.5,0.75,1.5]}
+    programs=exporter.dumps_sweep(block,values,minify)
+    assert len(programs)==4
+    for i,program in enumerate(programs):
+        bound=block.assign_parameters({amp:values[amp][i],phase:values[phase][i]},inplace=False)
+        assert program==exporter.dumps(bound,minify)
+    assert exporter.compile(block,minify) is exporter.compile(block,minify)
+
+
+def test_schedule_sweep():
+    block,amp,phase=_block()
+    schedule=pulse.transforms.block_to_schedule(block)
+    exporter=OPExporter()
+    programs=exporter.dumps_sweep(schedule,{amp:[0.2,0.3],phase:[0.25,0.5]})
+    assert programs[1]==exporter.dumps(schedule.assign_parameters({amp:0.3,phase:0.5},inplace=False))
+
+
+def test_parametric_times():
+    exporter=OPExporter()
+    with pytest.raises(ValueError):
+        exporter.compile(_block(sigma=Parameter("sigma"))[0])
+    with pytest.raises(ValueError):
+        exporter.compile(_block(duration=Parameter("duration"))[0])
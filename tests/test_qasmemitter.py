@@ -0,0 +1,110 @@
+import re
+import warnings
+
+import numpy as np
+import pytest
+
+from qiskit import qasm2, qasm3
+from qiskit.circuit import ClassicalRegister, Parameter, QuantumCircuit, QuantumRegister
+
+from qmiotools.integrations.qiskitqmio import QmioBackend
+from qmiotools.integrations.qiskitqmio.qasmemitter import build_template, dumps_qasm2, dumps_qasm3
+from qmiotools.integrations.qiskitqmio.qmiobackend import QBIT_MAP2
+
+
+@pytest.fixture(scope="module")
+def backend():
+    return QmioBackend()
+
+
+def _generic_qasm3(backend, circuit):
+    # The conversion of qiskit.qasm3, followed by the post-processing that QmioBackend applies when the emitter can not be used
+    basis_gates=[g for g in backend.operation_names if g not in ("measure","delay")]
+    qasm=qasm3.dumps(circuit,includes=[],basis_gates=basis_gates).replace("\n","")
+    for i in range(backend.num_qubits-1,-1,-1):
+        qasm=qasm.replace("$%d;"%i,"$%d;"%QBIT_MAP2[i])
+        qasm=qasm.replace("$%d,"%i,"$%d,"%QBIT_MAP2[i])
+        qasm=qasm.replace("$%d "%i,"$%d "%QBIT_MAP2[i])
+    return qasm
+
+
+def _generic_qasm2(circuit):
+    qasm=qasm2.dumps(circuit)
+    qasm=re.sub("\\ngate rzx.*\\n","\\n",qasm)
+    qasm=re.sub("\\ngate ecr.*\\n","\\ngate ecr q0, q1 {};\\n",qasm)
+    return qasm.replace("\n","")
+
+
+def _native(backend, delay=False, registers=1, theta=None):
+    """
+        A circuit in the native gates on the couplers of Qmio, with angles that pi_check writes as fractions, powers and floats,
+        compiled without optimisation to get its layout.
+    """
+    couplers=list(backend.coupling_map.get_edges())[:6]
+    qubits=sorted({q for c in couplers for q in c})
+    size=max(qubits)+1
+    cregs=[ClassicalRegister(len(qubits),"c")] if registers==1 else \
+        [ClassicalRegister(n,"m%d"%k) for k,n in enumerate((len(qubits)//2,len(qubits)-len(qubits)//2))]
+    circuit=QuantumCircuit(QuantumRegister(size,"q"),*cregs)
+    angles=[0.0,np.pi,-np.pi/2,3*np.pi/4,np.pi**2,2*np.pi/16,0.1234567,-1e-10,1e5]
+    if theta is not None:
+        circuit.rz(theta,couplers[0][1])
+    for k,(control,target) in enumerate(couplers):
+        circuit.rz(angles[k%len(angles)],control)
+        circuit.sx(target)
+        circuit.x(control)
+        circuit.ecr(control,target)
+        circuit.rz(angles[(k+3)%len(angles)],target)
+        if delay:
+            circuit.delay(100+k,target,unit="ns")
+        circuit.barrier(control,target)
+    circuit.measure(qubits,range(len(qubits)))
+    return backend.get_pass_manager(0).run(circuit)
+
+
+@pytest.mark.parametrize("delay",[False,True])
+@pytest.mark.parametrize("registers",[1,2])
+def test_qasm3_same_as_dumps(backend, delay, registers):
+    isa=_native(backend,delay,registers)
+    qasm=dumps_qasm3(isa,QBIT_MAP2[:backend.num_qubits])
+    assert qasm is not None
+    assert qasm==_generic_qasm3(backend,isa)
+
+
+@pytest.mark.parametrize("registers",[1,2])
+def test_qasm2_same_as_dumps(backend, registers):
+    isa=_native(backend,False,registers)
+    qasm=dumps_qasm2(isa)
+    assert qasm is not None
+    assert qasm==_generic_qasm2(isa)
+
+
+@pytest.mark.parametrize("qasm3",[True,False])
+def test_template_same_as_dumps(backend, qasm3):
+    theta=Parameter("theta")
+    isa=_native(backend,theta=2*theta+1)
+    template=build_template(isa,QBIT_MAP2[:backend.num_qubits],qasm3)
+    values=[0.0,np.pi/4,0.3]
+    programs=template.bind(np.array(values)[:,None])
+    for value,program in zip(values,programs):
+        bound=isa.assign_parameters({theta:value})
+        assert program==(_generic_qasm3(backend,bound) if qasm3 else _generic_qasm2(bound))
+
+
+def test_unsupported_circuits(backend):
+    isa=_native(backend)
+    conditioned=isa.copy()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore",DeprecationWarning)
+        conditioned.x(isa.layout.final_index_layout()[0]).c_if(conditioned.cregs[0],1)
+    # The emitter does not write conditions, so they are left to the exporters of Qiskit
+    assert dumps_qasm3(conditioned,QBIT_MAP2[:backend.num_qubits]) is None
+    assert dumps_qasm2(conditioned) is None
+    other=isa.copy()
+    other.h(0)
+    assert dumps_qasm2(other) is None
+    # OpenQASM 3.0 needs a layout to write the physical qubits
+    logical=QuantumCircuit(2,2)
+    logical.sx(0)
+    logical.measure([0,1],[0,1])
+    assert dumps_qasm3(logical,QBIT_MAP2[:backend.num_qubits]) is None
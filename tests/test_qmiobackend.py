@@ -0,0 +1,243 @@
+import os
+import re
+
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from qiskit.circuit import Parameter, QuantumCircuit
+from qiskit.circuit.library import RZGate
+
+from qmiotools.integrations.qiskitqmio import QmioBackend
+
+
+@pytest.fixture(scope="module")
+def backend():
+    return QmioBackend()
+
+
+def _native(theta, second=None):
+    circuit=QuantumCircuit(2,2)
+    circuit.rz(theta,0)
+    if second is None:
+        circuit.sx(0)
+    else:
+        circuit.rz(second,0)
+    circuit.ecr(0,1)
+    circuit.measure([0,1],[0,1])
+    return circuit
+
+
+def test_template_in_place_edits(backend):
+    output_qasm3=False
+    theta=Parameter("theta")
+    circuit=_native(theta)
+    _,template=backend._to_template(circuit,output_qasm3)
+    assert template is not None
+    before=template.bind(np.array([[0.5]]))[0]
+    # Replacing an instruction keeps the number of instructions and parameters of the circuit
+    circuit.data[1]=circuit.data[1].replace(operation=RZGate(theta*2))
+    _,template=backend._to_template(circuit,output_qasm3)
+    after=template.bind(np.array([[0.5]]))[0]
+    assert before!=after
+    assert after==backend._to_template(_native(theta,theta*2),output_qasm3)[1].bind(np.array([[0.5]]))[0]
+
+
+class _EmulatedQPU:
+    """
+        Emulates the QPU returning, for each format, data that only depends on the index of the shot in the program,
+        so the results of a program do not depend on how the shots are split in chunks. The format binary_count returns the counts.
+    """
+    shots_done={}
+    calls=[]
+
+    def __init__(self, **kwargs):
+        pass
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def run(self, circuit, shots, repetition_period=None, res_format="binary_count"):
+        self.calls.append(shots)
+        start=self.shots_done.get(circuit,0)
+        self.shots_done[circuit]=start+shots
+        index=np.arange(start,start+shots)
+        bits=np.array([(index*7+3)%5<2,(index*3+1)%4<2])
+        if res_format=="raw":
+            data=np.where(bits,-1.0,1.0)+0.01*index
+        elif res_format=="binary":
+            data=bits.astype(int)
+        else:
+            data=np.array(["".join("1" if b else "0" for b in shot) for shot in bits.T])
+            if res_format=="binary_count":
+                return {"results":{"c":dict(Counter(data.tolist()))}}
+        return {"results":{"c":data.tolist()}}
+
+
+@pytest.mark.parametrize("res_format",["raw","binary","squash_binary_result_arrays","memory"])
+def test_chunked_results(backend, monkeypatch, res_format):
+    import qmiotools.integrations.qiskitqmio.qmiobackend as qmiobackend
+    monkeypatch.setattr(qmiobackend,"QPUBackend",_EmulatedQPU)
+    monkeypatch.setattr(backend,"_QPUBackend",None)
+    options={"memory":True} if res_format=="memory" else {"res_format":res_format}
+    circuit=QuantumCircuit(2,2)
+    circuit.sx(1)
+    circuit.ecr(1,0)
+    circuit.measure([0,1],[0,1])
+    results=[]
+    for max_shots in (backend._max_shots,7):
+        _EmulatedQPU.shots_done.clear()
+        _EmulatedQPU.calls.clear()
+        monkeypatch.setattr(backend,"_max_shots",max_shots)
+        result=backend.run(circuit,shots=50,**options).result()
+        results.append(result.results[0].data)
+    single,multiple=results
+    assert _EmulatedQPU.calls==[7]*7+[1]
+    assert np.array_equal(np.asarray(single.memory),np.asarray(multiple.memory))
+    assert np.asarray(multiple.memory).shape[-1 if res_format!="memory" else 0]==50
+    assert single.counts==multiple.counts
+
+
+def _pair(rz=None):
+    circuit=QuantumCircuit(2,2)
+    if rz is not None:
+        circuit.rz(rz,1)
+    circuit.sx(1)
+    circuit.ecr(1,0)
+    circuit.measure([0,1],[0,1])
+    return circuit
+
+
+@pytest.fixture
+def emulated(backend, monkeypatch):
+    import qmiotools.integrations.qiskitqmio.qmiobackend as qmiobackend
+    monkeypatch.setattr(qmiobackend,"QPUBackend",_EmulatedQPU)
+    monkeypatch.setattr(backend,"_QPUBackend",None)
+    _EmulatedQPU.shots_done.clear()
+    _EmulatedQPU.calls.clear()
+    return backend
+
+
+def test_deduplicate_counts(emulated):
+    circuits=[_pair(),_pair(0.5),_pair(),_pair()]
+    result=emulated.run(circuits,shots=20,deduplicate=True).result()
+    # The copies share the histogram of a single execution with the requested shots
+    assert _EmulatedQPU.calls==[20,20]
+    assert [r.data.metadata.get("duplicate_of") for r in result.results]==[None,None,0,0]
+    counts=[result.get_counts(k) for k in range(4)]
+    assert counts[2]==counts[0] and counts[3]==counts[0] and sum(counts[0].values())==20
+
+
+@pytest.mark.parametrize("options",[{"memory":True},{"res_format":"raw"}])
+def test_deduplicate_memory(emulated, options):
+    circuits=[_pair(),_pair(0.5),_pair(),_pair()]
+    deduplicated=emulated.run(circuits,shots=20,deduplicate=True,**options).result()
+    assert _EmulatedQPU.calls==[60,20]
+    assert [r.data.metadata.get("duplicate_of") for r in deduplicated.results]==[None,None,0,0]
+    # The shots of the single execution are split in the order of the copies, so each copy gets the shots it would get if the copies
+    # were executed one after the other
+    _EmulatedQPU.shots_done.clear()
+    sequential=[emulated.run(circuits[0],shots=60,**options).result().results[0].data.memory]
+    axis=0 if "memory" in options else -1
+    for j,k in enumerate((0,2,3)):
+        expected=np.take(np.asarray(sequential[0]),range(20*j,20*(j+1)),axis=axis)
+        assert np.array_equal(np.asarray(deduplicated.results[k].data.memory),expected)
+    assert np.array_equal(np.asarray(deduplicated.results[1].data.memory),np.take(np.asarray(sequential[0]),range(20),axis=axis))
+
+
+@pytest.mark.parametrize("options",[{},{"memory":True},{"res_format":"raw"}])
+def test_result_cache(emulated, tmp_path, options):
+    from qmiotools.integrations.utils import ResultCache
+    first=emulated.run(_pair(),shots=20,result_cache=ResultCache(directory=str(tmp_path)),**options).result()
+    # A new instance reads the entry stored as JSON on disk, without running the program again
+    second=emulated.run(_pair(),shots=20,result_cache=ResultCache(directory=str(tmp_path)),**options).result()
+    assert _EmulatedQPU.calls==[20]
+    assert second.results[0].data.metadata["cached"]
+    assert second.get_counts()==first.get_counts()
+    if options:
+        assert np.array_equal(np.asarray(second.results[0].data.memory),np.asarray(first.results[0].data.memory))
+
+
+def test_experiments_built_per_execution(emulated, monkeypatch):
+    import qmiotools.integrations.qiskitqmio.qmiobackend as qmiobackend
+    events=[]
+    run=_EmulatedQPU.run
+    experiment_result=qmiobackend.ExperimentResult
+
+    def _run(self, circuit, shots, **kwargs):
+        events.append("run")
+        return run(self,circuit,shots,**kwargs)
+
+    def _experiment_result(**kwargs):
+        events.append("experiment")
+        return experiment_result(**kwargs)
+
+    monkeypatch.setattr(_EmulatedQPU,"run",_run)
+    monkeypatch.setattr(qmiobackend,"ExperimentResult",_experiment_result)
+    result=emulated.run([_pair(),_pair(0.5),_pair(),_pair(1.5)],shots=10,deduplicate=True).result()
+    # Each experiment is built after the execution of its program and before the next one. The copy of the first program is built
+    # with it
+    assert events==["run","experiment","experiment","run","experiment","run","experiment"]
+    assert len(result.results)==4
+
+
+def test_measured_qubits_after_routing(backend):
+    from qmiotools.integrations.qiskitqmio.qmiobackend import QBIT_MAP2, _measured_qubits
+    # The qubits 0 and 2 are not coupled, so the compilation moves them before the measurements
+    circuit=QuantumCircuit(3,3)
+    circuit.sx(0)
+    circuit.cx(0,2)
+    circuit.cx(2,1)
+    circuit.measure([0,1,2],[0,1,2])
+    c,qasm=backend._to_program(circuit,True)
+    assert c.layout is not None
+    measured={}
+    for bit,qubit in re.findall(r"c\[(\d+)\] = measure \$(\d+);",qasm):
+        measured[int(bit)]=QBIT_MAP2.index(int(qubit))
+    assert _measured_qubits(c)==[measured[k] for k in range(3)]
+
+
+@pytest.mark.parametrize("options",[{},{"memory":True}])
+def test_resume_after_crash(emulated, monkeypatch, tmp_path, options):
+    from qmiotools.exceptions import QmioException
+    from qmiotools.integrations.qiskitqmio import JobJournal
+    monkeypatch.setattr(emulated,"_max_shots",7)
+    circuits=[_pair(),_pair(0.5)]
+    expected=emulated.run(circuits,shots=20,**options).result()
+    _EmulatedQPU.shots_done.clear()
+    _EmulatedQPU.calls.clear()
+
+    run=_EmulatedQPU.run
+
+    def _killed(self, circuit, shots, **kwargs):
+        # The process dies while the fifth chunk is executed, the second of the second program
+        if len(self.calls)==4:
+            raise KeyboardInterrupt
+        return run(self,circuit,shots,**kwargs)
+
+    monkeypatch.setattr(_EmulatedQPU,"run",_killed)
+    with pytest.raises(KeyboardInterrupt):
+        emulated.run(circuits,shots=20,journal_dir=str(tmp_path),**options)
+    monkeypatch.setattr(_EmulatedQPU,"run",run)
+    filename,=os.listdir(str(tmp_path))
+    job_id=filename[:-len(".journal")]
+    assert len(JobJournal(str(tmp_path),job_id))==4
+    # Other shots do not match the journal
+    with pytest.raises(QmioException,match="other programs or options"):
+        emulated.run(circuits,shots=21,journal_dir=str(tmp_path),resume=job_id,**options)
+    with pytest.raises(QmioException,match="not found"):
+        emulated.run(circuits,shots=20,journal_dir=str(tmp_path),resume="other",**options)
+
+    _EmulatedQPU.calls.clear()
+    resumed=emulated.run(circuits,shots=20,journal_dir=str(tmp_path),resume=job_id,**options).result()
+    # Only the chunks that were not completed are sent to the QPU
+    assert _EmulatedQPU.calls==[7,6]
+    assert len(JobJournal(str(tmp_path),job_id))==6
+    for k in range(2):
+        assert resumed.get_counts(k)==expected.get_counts(k)
+        if options:
+            assert np.array_equal(np.asarray(resumed.results[k].data.memory),np.asarray(expected.results[k].data.memory))
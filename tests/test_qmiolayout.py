@@ -0,0 +1,120 @@
+import importlib
+import os
+import tomllib
+
+import pytest
+import rustworkx as rx
+
+from qiskit import transpile
+from qiskit.circuit import QuantumCircuit
+from qiskit.converters import circuit_to_dag
+from qiskit.transpiler import PassManager
+from qiskit.transpiler.passmanager_config import PassManagerConfig
+from qiskit.transpiler.preset_passmanagers.plugin import list_stage_plugins
+
+from qmiotools.integrations.qiskitqmio import QmioBackend, QmioLayout
+from qmiotools.integrations.qiskitqmio.qmiolayout import QmioLayoutPlugin, SubgraphIndex, get_subgraph_index
+
+
+@pytest.fixture(scope="module")
+def backend():
+    return QmioBackend()
+
+
+def _line(n, idle=0):
+    circuit=QuantumCircuit(n+idle)
+    for i in range(n-1):
+        circuit.cx(i,i+1)
+    circuit.cx(0,1)
+    return circuit
+
+
+def _star(n):
+    circuit=QuantumCircuit(n)
+    for i in range(1,n):
+        circuit.cx(0,i)
+    return circuit
+
+
+def _assert_valid(backend, circuit, physical):
+    # Each virtual qubit has its own physical qubit and the two-qubit gates act on couplers
+    assert len(set(physical))==len(physical) and all(0<=p<backend.num_qubits for p in physical)
+    coupled={frozenset(e) for e in backend.coupling_map.get_edges()}
+    for instruction in circuit.data:
+        if len(instruction.qubits)==2:
+            assert frozenset(physical[circuit.find_bit(q).index] for q in instruction.qubits) in coupled
+
+
+def test_subgraph_index(backend):
+    index=SubgraphIndex(backend.target)
+    for size in (1,2,4,6):
+        subgraphs=index.subgraphs(size)
+        assert 0<len(subgraphs)<=32
+        assert [c for c,_ in subgraphs]==sorted(c for c,_ in subgraphs)
+        assert len({nodes for _,nodes in subgraphs})==len(subgraphs)
+        for _,nodes in subgraphs:
+            assert len(nodes)==size and rx.is_connected(index.graph.subgraph(list(nodes)))
+    # The best qubit has the lowest cost and the best pair is a coupler
+    assert index.subgraphs(1)[0][0]==min(index.node_cost)
+    assert tuple(index.subgraphs(2)[0][1]) in index.edge_cost
+    assert index.subgraphs(backend.num_qubits+1)==[]
+
+
+def test_subgraph_index_cache(backend):
+    index=get_subgraph_index(backend.target)
+    assert get_subgraph_index(backend.target) is index
+    assert get_subgraph_index(QmioBackend().target) is index
+
+
+def test_layout_is_subgraph(backend):
+    circuit=_line(5,idle=2)
+    pm=PassManager(QmioLayout(backend.target))
+    pm.run(circuit)
+    layout=pm.property_set["layout"]
+    assert layout is not None
+    _assert_valid(backend,circuit,[layout[q] for q in circuit.qubits])
+    # The active qubits are one of the subgraphs of the index
+    active=tuple(sorted(layout[q] for q in circuit.qubits[:5]))
+    assert active in {nodes for _,nodes in get_subgraph_index(backend.target).subgraphs(5)}
+
+
+def test_layout_not_set(backend):
+    three=QuantumCircuit(3)
+    three.ccx(0,1,2)
+    for circuit in (three,_star(6)):
+        layout=QmioLayout(backend.target)
+        layout.run(circuit_to_dag(circuit))
+        assert layout.property_set["layout"] is None
+
+
+def test_plugin(backend):
+    config=PassManagerConfig.from_backend(backend)
+    # The star can not be embedded, so the plugin falls back to DenseLayout
+    for circuit in (_line(6),_star(6)):
+        pm=QmioLayoutPlugin().pass_manager(config)
+        compiled=pm.run(circuit)
+        layout=pm.property_set["layout"]
+        assert compiled.num_qubits==backend.num_qubits
+        assert sorted(layout.get_physical_bits())==list(range(backend.num_qubits))
+        physical=[layout[q] for q in circuit.qubits]
+        assert len(set(physical))==circuit.num_qubits
+    line=_line(6)
+    pm=QmioLayoutPlugin().pass_manager(config)
+    pm.run(line)
+    _assert_valid(backend,line,[pm.property_set["layout"][q] for q in line.qubits])
+
+
+def test_entry_point():
+    with open(os.path.join(os.path.dirname(__file__),"..","pyproject.toml"),"rb") as f:
+        entry_points=tomllib.load(f)["project"]["entry-points"]["qiskit.transpiler.layout"]
+    module,name=entry_points["qmio"].split(":")
+    assert getattr(importlib.import_module(module),name) is QmioLayoutPlugin
+
+
+@pytest.mark.skipif("qmio" not in list_stage_plugins("layout"),reason="qmiotools is installed without its entry points")
+def test_transpile(backend):
+    circuit=_line(5)
+    circuit.measure_all()
+    compiled=transpile(circuit,backend,layout_method="qmio",seed_transpiler=1)
+    _assert_valid(backend,_line(5),compiled.layout.initial_index_layout()[:5])
+    assert backend.get_pass_manager(1,layout_method="qmio").run(circuit).layout is not None
@@ -0,0 +1,24 @@
+import pytest
+
+from qiskit import transpile
+from qiskit.circuit.library import QFT
+from qiskit.circuit.random import random_circuit
+
+from qmiotools.integrations.qiskitqmio import QmioBackend
+
+
+@pytest.fixture(scope="module")
+def backend():
+    return QmioBackend()
+
+
+@pytest.mark.parametrize("optimization_level",[0,1,2,3])
+def test_same_as_transpile(backend, optimization_level):
+    for circuit in (QFT(5).decompose(),random_circuit(6,8,max_operands=2,seed=3)):
+        circuit.measure_all()
+        expected=transpile(circuit,backend,optimization_level=optimization_level,seed_transpiler=7)
+        pm=backend.get_pass_manager(optimization_level,seed_transpiler=7)
+        assert pm is backend.get_pass_manager(optimization_level,seed_transpiler=7)
+        compiled=pm.run(circuit)
+        assert compiled==expected
+        assert compiled.layout.final_index_layout()==expected.layout.final_index_layout()
@@ -0,0 +1,111 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from qiskit.circuit import Parameter, QuantumCircuit
+from qiskit.circuit.library import RZGate
+from qiskit.quantum_info import Pauli, PauliList, SparsePauliOp, Statevector
+
+from qmiotools.integrations.qiskitqmio import FakeQmio, QmioBackend, QmioEstimatorV2, QmioSamplerV2, group_paulis, measurement_groups
+
+
+def test_measurement_circuit_in_place_edits():
+    estimator=QmioEstimatorV2(QmioBackend())
+    circuit=QuantumCircuit(2)
+    circuit.rz(0.9,0)
+    circuit.sx(1)
+    group=measurement_groups(["ZZ"])[0]
+    measured=estimator._measurement_circuit(circuit,group)
+    assert estimator._measurement_circuit(circuit,group) is measured
+    circuit.data[0]=circuit.data[0].replace(operation=RZGate(0.1))
+    measured=estimator._measurement_circuit(circuit,group)
+    assert measured.data[0].operation.params==[0.1]
+
+
+@pytest.fixture(scope="module")
+def ideal():
+    # Without noise, so the results are only compared with the exact values within their statistical error
+    return FakeQmio(thermal_relaxation=False,restrict_qubits=True)
+
+
+def _ansatz(theta):
+    # A native circuit on the qubits 1 and 0, coupled by the ecr, with a parametrized rotation
+    circuit=QuantumCircuit(2)
+    circuit.sx(1)
+    circuit.rz(theta,1)
+    circuit.sx(1)
+    circuit.ecr(1,0)
+    circuit.rz(0.5,0)
+    circuit.sx(0)
+    circuit.rz(0.9,1)
+    circuit.sx(1)
+    return circuit
+
+
+def _commute(p, q, qubit_wise):
+    if qubit_wise:
+        return all(a=="I" or b=="I" or a==b for a,b in zip(p,q))
+    return Pauli(p).commutes(Pauli(q))
+
+
+@pytest.mark.parametrize("qubit_wise",[True,False])
+def test_group_paulis(qubit_wise):
+    labels=["".join(p) for p in itertools.product("IXYZ",repeat=3)][1:]
+    groups=group_paulis(PauliList(labels),qubit_wise=qubit_wise)
+    # Each term is in one group and the terms of each group commute
+    assert sorted(int(i) for g in groups for i in g)==list(range(len(labels)))
+    for g in groups:
+        assert all(_commute(labels[a],labels[b],qubit_wise) for a,b in itertools.combinations(g,2))
+    # The 27 terms of weight 3 do not commute qubit-wise with each other, but the general groups are fewer
+    assert len(groups)==27 if qubit_wise else len(groups)<27
+
+
+@pytest.mark.parametrize("label",["XI","IY","ZZ","XY","YX"])
+def test_basis_rotations(label):
+    state=_ansatz(0.7)
+    group=measurement_groups([label])[0]
+    assert group.basis==label.replace("I","")[::-1]
+    measured=group.measurement_circuit(state).remove_final_measurements(inplace=False)
+    # The expectation value is the parity of the measured qubits after the rotation
+    probabilities=Statevector(measured).probabilities_dict(qargs=list(group.qubits))
+    parity=sum(p*(-1)**k.count("1") for k,p in probabilities.items())
+    assert parity==pytest.approx(Statevector(state).expectation_value(Pauli(label)).real)
+
+
+def test_sampler(ideal):
+    theta=Parameter("theta")
+    circuit=_ansatz(theta)
+    circuit.measure_all()
+    values=np.array([[0.0],[np.pi/2],[np.pi]])
+    sampler=QmioSamplerV2(ideal,options={"run_options":{"seed_simulator":7}})
+    result=sampler.run([(circuit,values)],shots=4000).result()
+    bits=result[0].data.meas
+    assert bits.shape==(3,) and bits.num_shots==4000
+    for j,value in enumerate(values[:,0]):
+        exact=Statevector(circuit.remove_final_measurements(inplace=False).assign_parameters([value])).probabilities_dict()
+        counts=bits[j].get_counts()
+        assert sum(counts.values())==4000
+        for k,p in exact.items():
+            # Five standard deviations of the binomial distribution
+            assert counts.get(k,0)/4000==pytest.approx(p,abs=5*np.sqrt(p*(1-p)/4000)+1e-9)
+    # The same seed gives the same shots
+    again=sampler.run([(circuit,values)],shots=4000).result()
+    assert np.array_equal(again[0].data.meas.array,bits.array)
+
+
+def test_estimator(ideal):
+    theta=Parameter("theta")
+    circuit=_ansatz(theta)
+    observable=SparsePauliOp(["ZZ","XY","YI","IX","XX","II"],[0.5,-0.3,0.2,0.7,0.4,0.1])
+    values=np.array([[0.0],[0.4],[2.1]])
+    estimator=QmioEstimatorV2(ideal,options={"run_options":{"seed_simulator":11}})
+    result=estimator.run([(circuit,observable,values)],precision=0.01).result()
+    evs,stds=result[0].data.evs,result[0].data.stds
+    assert evs.shape==(3,) and result[0].metadata["shots"]==10000
+    for j,value in enumerate(values[:,0]):
+        exact=Statevector(circuit.assign_parameters([value])).expectation_value(observable).real
+        assert 0<stds[j]<0.02
+        assert evs[j]==pytest.approx(exact,abs=5*stds[j])
+    again=estimator.run([(circuit,observable,values)],precision=0.01).result()
+    assert np.array_equal(again[0].data.evs,evs)
@@ -0,0 +1,96 @@
+import pytest
+
+from qiskit.circuit import QuantumCircuit
+
+from qmiotools.exceptions import QmioException
+from qmiotools.integrations.qiskitqmio import QmioBackend
+from qmiotools.integrations.qiskitqmio.qmiovalidator import TargetValidator
+
+
+@pytest.fixture(scope="module")
+def backend():
+    return QmioBackend()
+
+
+@pytest.fixture(scope="module")
+def validator(backend):
+    return TargetValidator(backend.target)
+
+
+def _coupler(backend):
+    # The first coupler of the calibrations and a pair of qubits that are not coupled in any direction
+    control,target=next(iter(backend.coupling_map.get_edges()))
+    coupled={frozenset(e) for e in backend.coupling_map.get_edges()}
+    free=next(q for q in range(backend.num_qubits) if frozenset((control,q)) not in coupled and q!=control)
+    return control,target,free
+
+
+def _native(backend):
+    control,target,_=_coupler(backend)
+    circuit=QuantumCircuit(backend.num_qubits,2)
+    circuit.rz(0.1,control)
+    circuit.sx(target)
+    circuit.x(control)
+    circuit.ecr(control,target)
+    circuit.delay(100,target,unit="ns")
+    circuit.barrier()
+    circuit.measure([control,target],[0,1])
+    return circuit
+
+
+def test_valid(backend, validator):
+    assert validator.validate(_native(backend))==[]
+
+
+def test_not_supported(backend, validator):
+    circuit=_native(backend)
+    circuit.h(3)
+    diagnostics=validator.validate(circuit,4)
+    assert len(diagnostics)==1
+    d=diagnostics[0]
+    assert (d.circuit,d.index,d.name,d.qubits)==(4,len(circuit.data)-1,"h",(3,))
+    assert d.message=="operation not supported by the backend"
+
+
+def test_reversed_coupler(backend, validator):
+    control,target,_=_coupler(backend)
+    circuit=_native(backend)
+    circuit.ecr(target,control)
+    diagnostics=validator.validate(circuit)
+    assert [(d.name,d.qubits,d.message) for d in diagnostics]==[("ecr",(target,control),"reversed direction, the coupler is %s"%[control,target])]
+
+
+def test_not_coupled(backend, validator):
+    control,_,free=_coupler(backend)
+    circuit=_native(backend)
+    circuit.ecr(control,free)
+    assert [(d.qubits,d.message) for d in validator.validate(circuit)]==[((control,free),"qubits not coupled")]
+
+
+def test_qubit_out_of_range(backend, validator):
+    circuit=QuantumCircuit(backend.num_qubits+2,1)
+    circuit.sx(0)
+    circuit.sx(backend.num_qubits+1)
+    circuit.ecr(*next(iter(backend.coupling_map.get_edges())))
+    circuit.measure(backend.num_qubits,0)
+    diagnostics=validator.validate(circuit)
+    assert [(d.index,d.qubits) for d in diagnostics]==[(1,(backend.num_qubits+1,)),(3,(backend.num_qubits,))]
+    assert all(d.message=="qubit outside of the backend, which has %d qubits"%backend.num_qubits for d in diagnostics)
+
+
+def test_all_diagnostics_in_order(backend, validator):
+    control,target,free=_coupler(backend)
+    circuit=_native(backend)
+    circuit.ecr(target,control)
+    circuit.h(0)
+    circuit.ecr(control,free)
+    assert [d.index for d in validator.validate(circuit)]==[len(circuit.data)-3,len(circuit.data)-2,len(circuit.data)-1]
+
+
+def test_run_validation(backend):
+    circuit=_native(backend)
+    circuit.h(0)
+    # The validation is off by default and the option raises before submitting anything
+    assert backend.options.validate is False
+    with pytest.raises(QmioException,match="1 invalid instructions"):
+        backend.run(circuit,validate=True)
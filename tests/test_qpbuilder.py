@@ -0,0 +1,61 @@
+import logging
+import re
+
+from qiskit import pulse
+
+from qmiotools.data import QBIT_MAP
+from qmiotools.integrations.qiskitqmio.qpbuilder import QPBuilder, logger
+
+
+def _schedule():
+    drag=pulse.Drag(160,0.2,40,0.1)
+    with pulse.build() as block:
+        for _ in range(3):
+            pulse.play(drag,pulse.DriveChannel(0))
+            pulse.delay(100,pulse.DriveChannel(0))
+        pulse.play(pulse.Drag(160,0.2,40,0.1),pulse.DriveChannel(1))
+        pulse.delay(100,pulse.DriveChannel(1))
+        pulse.play(pulse.Gaussian(160,0.2,40),pulse.DriveChannel(0))
+        pulse.delay(200,pulse.DriveChannel(0))
+    return pulse.transforms.block_to_schedule(block)
+
+
+def test_definitions_emitted_once():
+    schedule=_schedule()
+    sentences=QPBuilder().build_program(schedule)
+    waveforms=[s for s in sentences if s.startswith("cal {waveform")]
+    plays=[s for s in sentences if re.match(r"defcal ps\d+ ",s)]
+    delays=[s for s in sentences if re.match(r"defcal single_qubit_delay\d+ ",s)]
+    # The same drag on two qubits is one waveform with a defcal for each frame, and the delays are reused by qubit and duration
+    assert len(waveforms)==2 and len(set(waveforms))==2
+    assert len(plays)==3 and len(set(plays))==3
+    assert len(delays)==3 and len(set(delays))==3
+
+    # Replacing the names by their definitions gives the instructions of the schedule, in order
+    waveform={m[0]:m[1] for m in (re.match(r"cal \{waveform (\w+)=(.*);\}",s).groups() for s in waveforms)}
+    calls={}
+    for s in plays+delays:
+        name,qubit,body=re.match(r"defcal (\w+) \$(\d+) \{(.*)\}",s).groups()
+        play=re.match(r"play\(q\d+_drive,(\w+)\);",body)
+        calls[name,int(qubit)]=("play",waveform[play.group(1)]) if play else ("delay",re.match(r"delay\[(\w+)\]",body).group(1))
+    body=[]
+    for s in sentences:
+        call=re.match(r"(\w+) \$(\d+);$",s)
+        if call is not None:
+            body.append(calls[call.group(1),int(call.group(2))]+(int(call.group(2)),))
+    expected=[]
+    for _,inst in schedule.instructions:
+        qubit=QBIT_MAP[inst.channel.index]
+        if isinstance(inst,pulse.Play):
+            expected.append(("play",QPBuilder()._waveform(inst.pulse),qubit))
+        else:
+            expected.append(("delay","%ddt"%inst.duration,qubit))
+    assert body==expected
+
+
+def test_handlers_removed():
+    handlers=len(logger.handlers)
+    builder=QPBuilder(logging_level=logging.WARNING)
+    assert len(logger.handlers)==handlers+1
+    del builder
+    assert len(logger.handlers)==handlers
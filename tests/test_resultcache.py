@@ -0,0 +1,101 @@
+import os
+import pickle
+import time
+
+import numpy as np
+import pytest
+
+from qiskit import QuantumCircuit
+
+from qmiotools.integrations.qiskitqmio import FakeQmio
+from qmiotools.integrations.utils import ResultCache
+
+
+def test_key_stability():
+    key=ResultCache.key("Qmio","OPENQASM 3.0;",100,False,None)
+    # The key only depends on the representation of the parts, so it is the same in any process
+    assert key==ResultCache.key("Qmio","OPENQASM 3.0;",100,False,None)
+    assert len(key)==64 and int(key,16)>=0
+    assert key!=ResultCache.key("Qmio","OPENQASM 3.0;",101,False,None)
+    # The parts are separated, so moving characters between them changes the key
+    assert ResultCache.key("ab","c")!=ResultCache.key("a","bc")
+
+
+def test_round_trip(tmp_path):
+    value=({"0x0":3,"0x3":7},np.array([[1+2j,-0.5j]]),{"execution_metrics":{"shots":np.int64(10)},"empty":np.zeros((2,0))})
+    memory=ResultCache()
+    memory.put("k",value)
+    ResultCache(directory=str(tmp_path)).put("k",value)
+    # The second one reads the entry from the disk
+    for cache in (memory,ResultCache(directory=str(tmp_path))):
+        counts,iq,results=cache.get("k")
+        assert counts==value[0]
+        assert iq.dtype==value[1].dtype and np.array_equal(iq,value[1])
+        assert results["execution_metrics"]=={"shots":10} and results["empty"].shape==(2,0)
+        # Each get returns a new copy
+        assert cache.get("k")[1] is not cache.get("k")[1]
+
+
+def test_not_json():
+    with pytest.raises(TypeError):
+        ResultCache().put("k",{"value":object()})
+
+
+def test_pickle_is_not_loaded(tmp_path):
+    cache=ResultCache(directory=str(tmp_path))
+    key=ResultCache.key("program")
+    with open(os.path.join(str(tmp_path),"%s.pkl"%key),"wb") as f:
+        pickle.dump({"0x0":1},f)
+    assert cache.get(key) is None
+    with open(os.path.join(str(tmp_path),"%s.json"%key),"w") as f:
+        f.write("{truncated")
+    assert cache.get(key) is None
+
+
+def test_ttl(tmp_path, monkeypatch):
+    now=time.time()
+    cache=ResultCache(directory=str(tmp_path),ttl=60)
+    cache.put("k",[1])
+    monkeypatch.setattr(time,"time",lambda: now+30)
+    assert cache.get("k")==[1]
+    assert ResultCache(directory=str(tmp_path),ttl=60).get("k")==[1]
+    monkeypatch.setattr(time,"time",lambda: now+120)
+    assert cache.get("k") is None
+    # The expired entry is removed from the disk
+    assert ResultCache(directory=str(tmp_path),ttl=60).get("k") is None
+    assert not os.listdir(str(tmp_path))
+
+
+def test_memory_eviction():
+    cache=ResultCache(max_entries=2)
+    cache.put("a",1)
+    cache.put("b",2)
+    assert cache.get("a")==1
+    cache.put("c",3)
+    # b is the least recently used
+    assert "b" not in cache and cache.get("a")==1 and cache.get("c")==3
+    assert len(cache)==2
+
+
+def test_disk_eviction(tmp_path):
+    cache=ResultCache(directory=str(tmp_path),max_entries=2)
+    for i,key in enumerate("abc"):
+        cache.put(key,i)
+        # The access times of the files order the eviction
+        os.utime(os.path.join(str(tmp_path),"%s.json"%key),(1000+i,1000+i))
+    cache.put("d",3)
+    assert sorted(os.listdir(str(tmp_path)))==["c.json","d.json"]
+    fresh=ResultCache(directory=str(tmp_path))
+    assert fresh.get("a") is None and fresh.get("c")==2
+
+
+def test_fakeqmio_result(tmp_path):
+    circuit=QuantumCircuit(2,2)
+    circuit.sx(0)
+    circuit.measure([0,1],[0,1])
+    backend=FakeQmio()
+    cache=ResultCache(directory=str(tmp_path))
+    first=backend.run(circuit,shots=100,seed_simulator=1,result_cache=cache).result()
+    second=backend.run(circuit,shots=100,seed_simulator=1,result_cache=cache).result()
+    assert second.results[0].metadata["cached"]
+    assert second.get_counts()==first.get_counts()
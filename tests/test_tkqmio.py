@@ -0,0 +1,172 @@
+from collections import Counter
+
+import pytest
+
+from pytket import Circuit, OpType
+from pytket.predicates import ConnectivityPredicate, DirectednessPredicate
+
+from qmiotools.exceptions import QPUException
+from qmiotools.integrations.tkbackend import Qmio
+from qmiotools.integrations.tkbackend import qmio as tkqmio
+from qmiotools.integrations.utils import ResultCache
+
+
+def _ghz(n):
+    circuit=Circuit(n,n)
+    circuit.H(0)
+    for i in range(n-1):
+        circuit.CX(i,i+1)
+    circuit.CX(n-1,0)
+    for i in range(n):
+        circuit.Measure(i,i)
+    return circuit
+
+
+@pytest.mark.parametrize("optimisation_level",[1,2])
+def test_placement_cache(optimisation_level):
+    cached=Qmio(placement_cache=True).get_compiled_circuits([_ghz(4)],optimisation_level)
+    uncached=Qmio(placement_cache=False).get_compiled_circuits([_ghz(4)],optimisation_level)
+    assert cached[0]==uncached[0]
+
+
+def _relabel(circuit,permutation):
+    relabeled=Circuit(circuit.n_qubits,circuit.n_bits)
+    for command in circuit.get_commands():
+        qubits=[permutation[q.index[0]] for q in command.qubits]
+        if command.op.type==OpType.Measure:
+            relabeled.Measure(qubits[0],command.bits[0].index[0])
+        else:
+            relabeled.add_gate(command.op,qubits)
+    return relabeled
+
+
+def _check_routed(backend,circuit):
+    assert backend.valid_circuit(circuit)
+    assert ConnectivityPredicate(backend.backend_info.architecture).verify(circuit)
+    assert DirectednessPredicate(backend.backend_info.architecture).verify(circuit)
+
+
+@pytest.mark.parametrize("circuit",[_ghz(4),_ghz(6)])
+def test_placement_cache_hit(circuit):
+    backend=Qmio(placement_cache=True)
+    tkqmio._placements.clear()
+    first=backend.get_compiled_circuit(circuit,2)
+    cached=list(tkqmio._placements.values())
+    # The same circuit with the qubits relabeled has an isomorphic interaction graph, so its placement is read from the cache
+    relabeled=_relabel(circuit,[(5*i+1)%circuit.n_qubits for i in range(circuit.n_qubits)])
+    second=backend.get_compiled_circuit(relabeled,2)
+    assert list(tkqmio._placements.values())==cached and len(cached)==1 and len(cached[0])==1
+    _check_routed(backend,first)
+    _check_routed(backend,second)
+    assert second.n_gates_of_type(OpType.Measure)==circuit.n_qubits
+
+
+def test_placement_cache_swaps():
+    # A complete interaction graph needs swaps, which are routed and directed by CXMappingPass
+    circuit=Circuit(5,5)
+    for a in range(5):
+        for b in range(a+1,5):
+            circuit.CX(a,b)
+    for q in range(5):
+        circuit.Measure(q,q)
+    backend=Qmio(placement_cache=True)
+    tkqmio._placements.clear()
+    for c in (circuit,_relabel(circuit,[4,2,0,3,1])):
+        _check_routed(backend,backend.get_compiled_circuit(c,2))
+    assert len(tkqmio._placements)==1
+
+
+def test_compiler_without_backend():
+    backend=Qmio()
+    calibration_file=backend._load_calibrations().get_filename()
+    compiler=tkqmio._QmioCompiler(calibration_file,True)
+    expected=_ghz(5)
+    backend.default_compilation_pass(2).apply(expected)
+    circuit=_ghz(5)
+    compiler.default_compilation_pass(2).apply(circuit)
+    assert circuit==expected
+
+
+def test_parallel_compilation():
+    backend=Qmio()
+    circuits=[_ghz(n) for n in range(2,8)]
+    try:
+        parallel=backend.get_compiled_circuits(circuits,2,workers=2)
+    finally:
+        backend.shutdown()
+    assert parallel==backend.get_compiled_circuits(circuits,2,workers=1)
+
+
+def test_max_shots():
+    from qmiotools.integrations.qiskitqmio import QmioBackend
+    assert Qmio()._max_shots==QmioBackend()._max_shots
+
+
+class _EmulatedQPU:
+    """
+        Emulates the QPU returning the counts of the binary_count format, where the outcome of each shot only depends on its index in the
+        program, so the merged counts do not depend on how the shots are split in chunks. The outcome 1 is returned without the leading zeros.
+        The programs in ``failing`` return an exception.
+    """
+    shots_done={}
+    calls=[]
+    failing=set()
+
+    def __init__(self, **kwargs):
+        pass
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    @staticmethod
+    def outcome(index, n):
+        return ("0"*n,"1","1"*n)[index%3]
+
+    def run(self, circuit, shots, repetition_period=None, res_format="binary_count"):
+        if circuit in self.failing:
+            return {"Exception":"Emulated failure"}
+        self.calls.append(shots)
+        start=self.shots_done.get(circuit,0)
+        self.shots_done[circuit]=start+shots
+        n=circuit.count("measure")
+        return {"results":{"c":dict(Counter(self.outcome(i,n) for i in range(start,start+shots)))}}
+
+
+@pytest.fixture
+def emulated(monkeypatch):
+    backend=Qmio()
+    monkeypatch.setattr(tkqmio,"QPUBackend",_EmulatedQPU)
+    monkeypatch.setattr(_EmulatedQPU,"shots_done",{})
+    monkeypatch.setattr(_EmulatedQPU,"calls",[])
+    monkeypatch.setattr(_EmulatedQPU,"failing",set())
+    backend._max_shots=4
+    return backend
+
+
+def _expected_counts(shots, n):
+    return Counter(tuple(int(b) for b in _EmulatedQPU.outcome(i,n).zfill(n)) for i in range(shots))
+
+
+def test_chunked_counts(emulated):
+    circuits=[emulated.get_compiled_circuit(_ghz(n),2) for n in (2,3)]
+    results=emulated.run_circuits(circuits,n_shots=[10,5])
+    assert _EmulatedQPU.calls==[4,4,2,4,1]
+    for result,n,shots in zip(results,(2,3),(10,5)):
+        assert result.get_counts()==_expected_counts(shots,n)
+
+
+def test_results_cached_before_failure(emulated):
+    circuits=[emulated.get_compiled_circuit(_ghz(n),2) for n in (2,3)]
+    _EmulatedQPU.failing.add(tkqmio.circuit_to_qasm_str(circuits[1]).replace("\n",""))
+    cache=ResultCache()
+    with pytest.raises(QPUException):
+        emulated.run_circuits(circuits,n_shots=10,result_cache=cache)
+    assert len(cache)==1
+    # The first circuit is read from the cache, so it does not run again
+    _EmulatedQPU.failing.clear()
+    results=emulated.run_circuits(circuits,n_shots=10,result_cache=cache)
+    assert _EmulatedQPU.calls==[4,4,2,4,4,2]
+    assert [r.get_counts() for r in results]==[_expected_counts(10,2),_expected_counts(10,3)]
@@ -0,0 +1,40 @@
+import sys
+
+import pytest
+
+from qmiotools.exceptions import QmioException
+from qmiotools.integrations.utils import Calibrations, draw_coupling_map
+from qmiotools.integrations.utils import visualization
+
+
+@pytest.fixture
+def calibrations():
+    visualization._drawings.clear()
+    return Calibrations.import_last_calibration()
+
+
+def test_svg(calibrations):
+    svg=draw_coupling_map(calibrations,qubit_metric="t1")
+    assert svg.startswith("<svg")
+    assert draw_coupling_map(calibrations,qubit_metric="t1") is svg
+
+
+def test_png(calibrations, tmp_path):
+    pytest.importorskip("matplotlib")
+    filename=tmp_path/"qmio.png"
+    png=draw_coupling_map(calibrations,output="png",filename=str(filename))
+    assert png.startswith(b"\x89PNG")
+    assert filename.read_bytes()==png
+
+
+def test_png_without_matplotlib(calibrations, monkeypatch):
+    monkeypatch.setitem(sys.modules,"matplotlib.figure",None)
+    with pytest.raises(QmioException,match="pip install matplotlib"):
+        draw_coupling_map(calibrations,output="png")
+
+
+def test_tket_draw_graph(calibrations):
+    from qmiotools.integrations.tkbackend import Qmio
+    backend=Qmio()
+    assert backend.draw_graph()==draw_coupling_map(calibrations)
+    assert backend.backend_info.architecture is backend._architecture